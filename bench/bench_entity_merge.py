@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# bench_entity_merge.py
+# 实体消歧的合并步骤：对比原页面的逐标签扫描 + entity_ids.index（O(n²)）与 entity_cluster.merge_clusters
+# （argsort / bincount 分组 + 分段均值）。原实现在 --entities 规模下太慢，只在 --baseline-entities 规模下计时，
+# 并在该规模下校验两者合并结果一致（原实现的组顺序取决于 set 的迭代顺序，按成员列表比较）。
+#
+#   python bench/bench_entity_merge.py --entities 100000
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from entity_cluster import merge_clusters  # noqa: E402
+
+
+def loop_merge(entity_ids: list, entities: dict, labels, points):
+    """原实现（streamlit_entity_cluster.py）。"""
+    merged = {}
+    centroids = []
+    next_mid = 1
+    for label in set(labels):
+        members = [entity_ids[i] for i, lab in enumerate(labels) if lab == label]
+        if label == -1:
+            for eid in members:
+                info = entities[eid]
+                merged[next_mid] = {"name": info["name"], "type": info["type"], "attributes": info["attributes"], "cluster": [eid]}
+                centroids.append(points[entity_ids.index(eid)])
+                next_mid += 1
+        else:
+            main = entities[members[0]]
+            merged_attrs = {}
+            coords = []
+            for eid in members:
+                merged_attrs.update(entities[eid].get("attributes", {}))
+                coords.append(points[entity_ids.index(eid)])
+            merged[next_mid] = {"name": main["name"], "type": main["type"], "attributes": merged_attrs, "cluster": members}
+            centroids.append(np.mean(coords, axis=0))
+            next_mid += 1
+    return merged, np.array(centroids)
+
+
+def synthetic(n: int, noise_ratio: float, cluster_size: int, rng):
+    """约 noise_ratio 的噪声点，其余平均每簇 cluster_size 个实体，标签与 DBSCAN 一样从 0 连续编号。"""
+    n_clusters = max(1, int(n * (1 - noise_ratio)) // cluster_size)
+    labels = rng.integers(0, n_clusters, n)
+    labels[rng.random(n) < noise_ratio] = -1
+    _, labels[labels >= 0] = np.unique(labels[labels >= 0], return_inverse=True)
+    entity_ids = list(range(1, n + 1))
+    entities = {
+        eid: {"name": f"实体{eid}", "type": "building", "attributes": {"height": f"{eid % 500} meters", f"k{eid % 7}": "v"}}
+        for eid in entity_ids
+    }
+    return entity_ids, entities, labels, rng.standard_normal((n, 2))
+
+
+def canonical(merged: dict, centroids: np.ndarray) -> dict:
+    return {tuple(m["cluster"]): (m["name"], m["attributes"], tuple(np.round(c, 9))) for m, c in zip(merged.values(), centroids)}
+
+
+def time_ms(fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t0) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Entity merge step: per-label scans vs vectorized grouping")
+    parser.add_argument("--entities", type=int, default=100000)
+    parser.add_argument("--baseline-entities", type=int, default=5000)
+    parser.add_argument("--noise-ratio", type=float, default=0.3)
+    parser.add_argument("--cluster-size", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    small = synthetic(args.baseline_entities, args.noise_ratio, args.cluster_size, rng)
+    same = canonical(*loop_merge(*small)) == canonical(*merge_clusters(*small))
+    large = synthetic(args.entities, args.noise_ratio, args.cluster_size, rng)
+    report = {
+        "baseline_entities": args.baseline_entities,
+        "same_merge": same,
+        "loop_ms": time_ms(lambda: loop_merge(*small)),
+        "vectorized_ms": time_ms(lambda: merge_clusters(*small)),
+        "entities": args.entities,
+        "groups": int(len(set(large[2][large[2] >= 0].tolist())) + (large[2] < 0).sum()),
+        "vectorized_large_ms": time_ms(lambda: merge_clusters(*large)),
+    }
+    report["speedup_at_baseline"] = report["loop_ms"] / report["vectorized_ms"]
+    print(json.dumps(report, indent=2))
+    if not same:
+        print("MISMATCH between loop and vectorized merge", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# bench_filter_latency.py
+# 对比带标量过滤（filename / path 前缀 / date 范围）与不带过滤时 dense / sparse / hybrid 检索的延迟
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from api_search_milvus import (  # noqa: E402
+    SearchFilter,
+    get_store,
+    get_dense_embedding,
+    get_sparse_embedding,
+    dense_search,
+    sparse_search,
+    hybrid_search,
+)
+
+DEFAULT_QUERIES = [
+    "混沌未分天地乱，茫茫渺渺无人见。",
+    "施工现场临时用电安全技术规范",
+    "建筑设计防火规范",
+    "混凝土结构工程施工质量验收",
+]
+
+
+def percentile_ms(samples: list, q: float) -> float:
+    return float(np.percentile(np.array(samples) * 1000.0, q))
+
+
+def time_search(fn, repeat: int) -> dict:
+    samples = []
+    hits = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        results = fn()
+        samples.append(time.perf_counter() - t0)
+        hits = len(results)
+    return {"p50_ms": percentile_ms(samples, 50), "p99_ms": percentile_ms(samples, 99), "hits": hits}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Filtered vs. unfiltered search latency")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--filename", action="append", help="filename filter, may repeat")
+    parser.add_argument("--path-prefix", default=None)
+    parser.add_argument("--date-from", default=None)
+    parser.add_argument("--date-to", default=None)
+    parser.add_argument("--query", action="append", help="query text, may repeat")
+    args = parser.parse_args()
+
+    search_filter = SearchFilter(
+        filenames=args.filename or ["guifan1.txt"],
+        path_prefix=args.path_prefix,
+        date_from=args.date_from,
+        date_to=args.date_to,
+    )
+
+    # 后端由 VECTOR_STORE 环境变量选择（milvus / memory）
+    store = get_store()
+
+    report = {"limit": args.limit, "repeat": args.repeat, "filter": search_filter.dict(), "queries": []}
+    for query in args.query or DEFAULT_QUERIES:
+        dense_emb = get_dense_embedding(query)
+        sparse_emb = get_sparse_embedding(query)
+        entry = {"query": query}
+        for label, f in (("unfiltered", None), ("filtered", search_filter)):
+            entry[label] = {
+                "dense": time_search(lambda: dense_search(store, dense_emb, args.limit, search_filter=f), args.repeat),
+                "sparse": time_search(lambda: sparse_search(store, sparse_emb, args.limit, search_filter=f), args.repeat),
+                "hybrid": time_search(
+                    lambda: hybrid_search(store, dense_emb, sparse_emb, limit=args.limit, search_filter=f), args.repeat
+                ),
+            }
+        report["queries"].append(entry)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
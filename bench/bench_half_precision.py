@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# bench_half_precision.py
+# 对比 fp32 collection 与半精度（FLOAT16 / BFLOAT16）collection 的内存占用和 recall@k。
+#
+# 先用迁移脚本生成半精度副本：
+#   python src/milvus_migrate.py --source hybrid_demo --target hybrid_demo_fp16 --dense-dtype FLOAT16_VECTOR
+# 再运行：
+#   python bench/bench_half_precision.py --fp32 hybrid_demo --half hybrid_demo_fp16
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+from pymilvus import connections, utility, Collection
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from milvus_ingest import (  # noqa: E402
+    COLLECTION_NAME,
+    MILVUS_URI,
+    dense_vector_dtype,
+    to_dense_payload,
+    from_dense_output,
+)
+from bench_index_sweep import exact_topk  # noqa: E402
+
+# 两个 collection 的 pk 均为 auto_id，用 (path, text) 作为 chunk 的稳定标识
+KEY_FIELDS = ["path", "text"]
+
+
+def export_rows(col: Collection, batch_size: int = 1000):
+    dtype = dense_vector_dtype(col)
+    it = col.query_iterator(batch_size=batch_size, expr="", output_fields=KEY_FIELDS + ["dense_vector"])
+    keys, vectors = [], []
+    try:
+        while True:
+            rows = it.next()
+            if not rows:
+                break
+            for r in rows:
+                keys.append(tuple(r[f] for f in KEY_FIELDS))
+                vectors.append(from_dense_output(r["dense_vector"], dtype))
+    finally:
+        it.close()
+    return keys, np.asarray(vectors, dtype=np.float32)
+
+
+def search_keys(col: Collection, queries: np.ndarray, k: int) -> list:
+    payload = to_dense_payload(list(queries), dense_vector_dtype(col))
+    results = []
+    for q in payload:
+        hits = col.search([q], anns_field="dense_vector", param={"metric_type": "IP", "params": {}},
+                          limit=k, output_fields=KEY_FIELDS)[0]
+        results.append({tuple(hit.entity.get(f) for f in KEY_FIELDS) for hit in hits})
+    return results
+
+
+def recall(found: list, truth: list, k: int) -> float:
+    return sum(len(f & t) for f, t in zip(found, truth)) / (len(truth) * k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory and recall of half-precision vs fp32 dense storage")
+    parser.add_argument("--fp32", default=COLLECTION_NAME)
+    parser.add_argument("--half", required=True)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    connections.connect("default", uri=MILVUS_URI)
+    fp32_col, half_col = Collection(args.fp32), Collection(args.half)
+    fp32_col.load()
+    half_col.load()
+
+    keys, base = export_rows(fp32_col)
+    rng = np.random.default_rng(args.seed)
+    picks = rng.choice(len(base), size=min(args.num_queries, len(base)), replace=False)
+    queries = base[picks] + rng.normal(scale=0.01, size=(len(picks), base.shape[1])).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = [{keys[i] for i in row} for row in exact_topk(base, queries, args.k)]
+
+    report = {"k": args.k, "num_queries": len(queries), "num_vectors": len(base)}
+    for label, col in (("fp32", fp32_col), ("half", half_col)):
+        report[label] = {
+            "collection": col.name,
+            "dense_dtype": dense_vector_dtype(col),
+            "memory_bytes": sum(seg.mem_size for seg in utility.get_query_segment_info(col.name)),
+            f"recall@{args.k}": recall(search_keys(col, queries, args.k), truth, args.k),
+        }
+    report["memory_ratio"] = report["half"]["memory_bytes"] / max(1, report["fp32"]["memory_bytes"])
+    report["recall_delta"] = report["half"][f"recall@{args.k}"] - report["fp32"][f"recall@{args.k}"]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
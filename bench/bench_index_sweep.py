@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# bench_index_sweep.py
+# dense_vector 索引参数扫描：以 NumPy 精确 top-k 作为 ground truth，
+# 对 HNSW(M/efConstruction × ef) 与 IVF_FLAT / IVF_SQ8(nlist × nprobe) 统计 recall@k、p50/p99 延迟和内存占用。
+#
+# 用法：python bench/bench_index_sweep.py --k 10 --num-queries 200 > sweep.json
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from pymilvus import (
+    connections,
+    utility,
+    FieldSchema,
+    CollectionSchema,
+    DataType,
+    Collection,
+)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from milvus_ingest import COLLECTION_NAME, MILVUS_URI, dense_vector_dtype, from_dense_output  # noqa: E402
+
+
+def export_dense_vectors(name: str, batch_size: int = 1000) -> np.ndarray:
+    col = Collection(name)
+    col.load()
+    dtype = dense_vector_dtype(col)
+    it = col.query_iterator(batch_size=batch_size, expr="", output_fields=["dense_vector"])
+    vectors = []
+    try:
+        while True:
+            rows = it.next()
+            if not rows:
+                break
+            vectors.extend(from_dense_output(r["dense_vector"], dtype) for r in rows)
+    finally:
+        it.close()
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def exact_topk(base: np.ndarray, queries: np.ndarray, k: int, block: int = 256) -> np.ndarray:
+    """内积精确 top-k（与 Milvus 的 IP 度量一致），按 query 分块避免一次性生成过大的分数矩阵。"""
+    out = np.empty((len(queries), k), dtype=np.int64)
+    for start in range(0, len(queries), block):
+        scores = queries[start:start + block] @ base.T
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1)
+        out[start:start + block] = np.take_along_axis(part, order, axis=1)
+    return out
+
+
+def build_scratch_collection(name: str, base: np.ndarray, batch_size: int = 1000) -> Collection:
+    if utility.has_collection(name):
+        utility.drop_collection(name)
+    fields = [
+        # pk 即 base 中的行号，便于直接与 ground truth 对比
+        FieldSchema(name="pk", dtype=DataType.INT64, is_primary=True, auto_id=False),
+        FieldSchema(name="dense_vector", dtype=DataType.FLOAT_VECTOR, dim=base.shape[1]),
+    ]
+    col = Collection(name, CollectionSchema(fields, description="index sweep scratch"), consistency_level="Strong")
+    for start in range(0, len(base), batch_size):
+        end = min(start + batch_size, len(base))
+        col.insert([list(range(start, end)), base[start:end]])
+    col.flush()
+    return col
+
+
+def loaded_memory_bytes(name: str) -> int:
+    return sum(seg.mem_size for seg in utility.get_query_segment_info(name))
+
+
+def index_configs(args, n: int) -> list:
+    configs = []
+    for m in args.hnsw_m:
+        for efc in args.hnsw_ef_construction:
+            configs.append((
+                {"index_type": "HNSW", "metric_type": "IP", "params": {"M": m, "efConstruction": efc}},
+                # ef 不能小于 k：小于 k 的取值都按 k 计，去重后每个有效 ef 只测一次
+                [{"ef": ef} for ef in sorted({max(ef, args.k) for ef in args.hnsw_ef})],
+            ))
+    for index_type in ("IVF_FLAT", "IVF_SQ8"):
+        for nlist in args.ivf_nlist:
+            # 每个簇至少需要若干向量才能训练，数据量小时跳过过大的 nlist
+            if nlist > max(1, n // 39):
+                continue
+            configs.append((
+                {"index_type": index_type, "metric_type": "IP", "params": {"nlist": nlist}},
+                [{"nprobe": p} for p in args.ivf_nprobe if p <= nlist],
+            ))
+    return configs
+
+
+def run_config(col: Collection, index_params: dict, search_params_list: list,
+               queries: np.ndarray, truth: np.ndarray, k: int) -> list:
+    col.release()
+    # 第一个配置运行时 scratch collection 上还没有索引
+    if col.indexes:
+        col.drop_index()
+    t0 = time.perf_counter()
+    col.create_index("dense_vector", index_params)
+    utility.wait_for_index_building_complete(col.name)
+    build_s = time.perf_counter() - t0
+    col.load()
+    memory = loaded_memory_bytes(col.name)
+
+    rows = []
+    for params in search_params_list:
+        latencies, hits_found = [], 0
+        for qi, q in enumerate(queries):
+            t0 = time.perf_counter()
+            hits = col.search([q], anns_field="dense_vector",
+                              param={"metric_type": "IP", "params": params}, limit=k)[0]
+            latencies.append(time.perf_counter() - t0)
+            hits_found += len(set(hit.id for hit in hits) & set(truth[qi].tolist()))
+        lat_ms = np.array(latencies) * 1000.0
+        rows.append({
+            "index": index_params,
+            "search_params": params,
+            f"recall@{k}": hits_found / (len(queries) * k),
+            "p50_ms": float(np.percentile(lat_ms, 50)),
+            "p99_ms": float(np.percentile(lat_ms, 99)),
+            "memory_bytes": memory,
+            "build_s": build_s,
+        })
+        print(json.dumps(rows[-1]), file=sys.stderr)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep dense index configurations against exact ground truth")
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    parser.add_argument("--scratch", default=None, help="临时 collection 名，默认 <collection>_sweep")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--hnsw-m", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--hnsw-ef-construction", type=int, nargs="+", default=[64, 200])
+    parser.add_argument("--hnsw-ef", type=int, nargs="+", default=[16, 32, 64, 128, 256])
+    parser.add_argument("--ivf-nlist", type=int, nargs="+", default=[16, 64, 256, 1024])
+    parser.add_argument("--ivf-nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--keep-scratch", action="store_true")
+    args = parser.parse_args()
+
+    connections.connect("default", uri=MILVUS_URI)
+    base = export_dense_vectors(args.collection)
+    if len(base) < args.k:
+        raise SystemExit(f"{args.collection} 中只有 {len(base)} 条向量，少于 k={args.k}")
+
+    # 以库内向量加轻微扰动作为查询，模拟与语料同分布的 query
+    rng = np.random.default_rng(args.seed)
+    picks = rng.choice(len(base), size=min(args.num_queries, len(base)), replace=False)
+    queries = base[picks] + rng.normal(scale=0.01, size=(len(picks), base.shape[1])).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = exact_topk(base, queries, args.k)
+
+    scratch_name = args.scratch or f"{args.collection}_sweep"
+    col = build_scratch_collection(scratch_name, base)
+    report = {"collection": args.collection, "num_vectors": len(base), "dim": base.shape[1],
+              "num_queries": len(queries), "k": args.k, "results": []}
+    try:
+        for index_params, search_params_list in index_configs(args, len(base)):
+            report["results"].extend(run_config(col, index_params, search_params_list, queries, truth, args.k))
+    finally:
+        if not args.keep_scratch:
+            utility.drop_collection(scratch_name)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
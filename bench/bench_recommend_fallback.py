@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# bench_recommend_fallback.py
+# 推荐界面本地打分（/recommend/ 不可用时的退路）：对比原先 dict + 逐个 cosine_similarity 的实现
+# 与界面实际使用的 doc_cache.DocCache.top_k（写入时归一化的连续共享矩阵，一次矩阵-向量乘积 + argpartition）。
+#
+#   python bench/bench_recommend_fallback.py --docs 10000
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from doc_cache import DocCache  # noqa: E402
+
+
+def cosine_similarity(a, b):
+    if a is None or b is None:
+        return 0.0
+    denom = np.linalg.norm(a) * np.linalg.norm(b)
+    return float(np.dot(a, b) / denom) if denom > 0 else 0.0
+
+
+def dict_top_k(embeddings: dict, liked: list, excluded: set, top_k: int) -> list:
+    """原实现：每次重新计算每个候选的范数。"""
+    user_vec = np.mean([embeddings[p] for p in liked], axis=0)
+    scored = [(cosine_similarity(user_vec, emb), p) for p, emb in embeddings.items() if p not in excluded]
+    scored.sort(reverse=True, key=lambda x: x[0])
+    return [p for _, p in scored[:top_k]]
+
+
+def matrix_top_k(cache: DocCache, liked: list, candidates: set, excluded: set, top_k: int) -> list:
+    return [p for p, _ in cache.top_k(liked, candidates, top_k, exclude=excluded)]
+
+
+def time_ms(fn, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return {"p50_ms": float(np.percentile(samples, 50)), "p95_ms": float(np.percentile(samples, 95))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session-side recommendation scoring: dict loop vs matrix")
+    parser.add_argument("--docs", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--liked", type=int, default=5)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=20, help="每次增量到达的文档数（一页检索结果）")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vectors = rng.standard_normal((args.docs, args.dim)).astype(np.float32)
+    # 服务端返回的文档向量已归一化（milvus_ingest.doc_vector）
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    paths = [f"./data_corpus/doc{i}.txt" for i in range(args.docs)]
+    embeddings = dict(zip(paths, vectors))
+    liked = paths[:args.liked]
+    excluded = set(liked) | set(paths[args.liked:2 * args.liked])
+
+    candidates = set(paths)
+    # 界面中的文档都在入库清单里，版本取清单中的 md5
+    manifest = os.path.join(tempfile.mkdtemp(), "corpus.jsonl")
+    with open(manifest, "w", encoding="utf-8") as f:
+        for p in paths:
+            f.write(json.dumps({"path": p, "md5": "0"}) + "\n")
+
+    # 增量构建：按页到达，模拟会话中逐次检索
+    t0 = time.perf_counter()
+    cache = DocCache(args.dim, max_embeddings=args.docs, manifest_path=manifest)
+    for start in range(0, args.docs, args.batch):
+        cache.put_embeddings(dict(zip(paths[start:start + args.batch], vectors[start:start + args.batch])))
+    build_ms = (time.perf_counter() - t0) * 1000.0
+
+    expected = dict_top_k(embeddings, liked, excluded, args.top_k)
+    got = matrix_top_k(cache, liked, candidates, excluded, args.top_k)
+    report = {
+        "docs": args.docs,
+        "dim": args.dim,
+        "same_top_k": got == expected,
+        "matrix_build_ms": build_ms,
+        "dict_loop": time_ms(lambda: dict_top_k(embeddings, liked, excluded, args.top_k), max(1, args.repeat // 4)),
+        "matrix": time_ms(lambda: matrix_top_k(cache, liked, candidates, excluded, args.top_k), args.repeat),
+    }
+    report["speedup_p50"] = report["dict_loop"]["p50_ms"] / report["matrix"]["p50_ms"]
+    print(json.dumps(report, indent=2))
+    if not report["same_top_k"]:
+        print(f"MISMATCH dict={expected} matrix={got}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# bench_startup.py
+# 启动耗时：
+#   1. python -X importtime 导入各服务模块的耗时，以及最重的直接依赖；超出导入预算或导入了不应在
+#      模块加载时出现的重依赖（torch / transformers 等）时记为违规；
+#   2. 以 serve.py 启动服务（单 worker），到 /healthz 可访问（开始监听）和 /readyz 返回 200（预热完成）的时间。
+#
+#   python bench/bench_startup.py                                   # 只测导入
+#   python bench/bench_startup.py --ready search embedding          # 同时测启动到就绪
+#   python bench/bench_startup.py --baseline bench/startup_baseline.json   # 退化或违规时退出码为 1
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import requests
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SRC_DIR = os.path.join(ROOT_DIR, "src")
+
+MODULES = ("api_search_milvus", "api_embedding", "milvus_ingest", "vector_store")
+# 导入预算（毫秒）：模块导入只应包含 web 框架和轻量依赖，模型与 Milvus 客户端在启动步骤中加载
+IMPORT_BUDGET_MS = {
+    "api_search_milvus": 1500,
+    "api_embedding": 1500,
+    "milvus_ingest": 500,
+    "vector_store": 300,
+}
+# 模块导入时不应出现的重依赖
+FORBIDDEN_IMPORTS = {
+    "api_search_milvus": ("transformers", "torch", "FlagEmbedding"),
+    "api_embedding": ("transformers", "torch", "FlagEmbedding"),
+    "milvus_ingest": ("pymilvus", "transformers", "torch"),
+    "vector_store": ("pymilvus",),
+}
+READY_PORTS = {"search": 18402, "embedding": 18401}
+
+
+def parse_importtime(stderr: str) -> list:
+    """返回 [(depth, self_us, cumulative_us, name)]。"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, self_us, cumulative_us, name = (part for part in line.replace("import time:", "|", 1).split("|"))
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        rows.append((depth, int(self_us), int(cumulative_us), name.strip()))
+    return rows
+
+
+def measure_import(module: str, top: int) -> dict:
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - t0
+    rows = parse_importtime(proc.stderr)
+    total = next((cum for depth, _, cum, name in rows if depth == 0 and name == module), None)
+    # 直接依赖（depth 1）的累计耗时，定位最重的导入
+    direct = sorted(((cum, name) for depth, _, cum, name in rows if depth == 1), reverse=True)[:top]
+    imported = {name for _, _, _, name in rows}
+    forbidden = [m for m in FORBIDDEN_IMPORTS.get(module, ()) if m in imported]
+    return {
+        "ok": proc.returncode == 0,
+        "error": proc.stderr.strip().splitlines()[-1] if proc.returncode else None,
+        "import_ms": None if total is None else total / 1000.0,
+        "process_wall_ms": wall * 1000.0,
+        "heaviest": [{"module": name, "ms": cum / 1000.0} for cum, name in direct],
+        "forbidden_imports": forbidden,
+    }
+
+
+def wait_for(url: str, deadline: float) -> bool:
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.05)
+    return False
+
+
+def measure_ready(service: str, timeout: float) -> dict:
+    port = READY_PORTS[service]
+    base = f"http://127.0.0.1:{port}"
+    t0 = time.monotonic()
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(SRC_DIR, "serve.py"), service, "--workers", "1", "--port", str(port),
+         "--host", "127.0.0.1"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        listening = wait_for(f"{base}/healthz", t0 + timeout)
+        listen_s = time.monotonic() - t0 if listening else None
+        ready = listening and wait_for(f"{base}/readyz", t0 + timeout)
+        ready_s = time.monotonic() - t0 if ready else None
+        readyz = requests.get(f"{base}/readyz", timeout=1).json() if listening else None
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=40)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return {
+        "listening_s": listen_s,
+        "ready_s": ready_s,
+        "warmup_s": (readyz or {}).get("warmup_seconds"),
+        "last_error": (readyz or {}).get("last_error"),
+    }
+
+
+def check(report: dict, baseline: dict, tolerance: float) -> list:
+    problems = []
+    for module, cur in report["imports"].items():
+        if not cur["ok"]:
+            problems.append(f"{module}: import failed ({cur['error']})")
+            continue
+        if cur["forbidden_imports"]:
+            problems.append(f"{module}: imports {cur['forbidden_imports']} at module load")
+        budget = IMPORT_BUDGET_MS.get(module)
+        if budget is not None and cur["import_ms"] > budget:
+            problems.append(f"{module}: import {cur['import_ms']:.0f}ms > budget {budget}ms")
+        base = baseline.get("imports", {}).get(module)
+        if base and base.get("import_ms") and cur["import_ms"] > base["import_ms"] * (1 + tolerance):
+            problems.append(f"{module}: import {base['import_ms']:.0f}ms -> {cur['import_ms']:.0f}ms")
+    for service, cur in report["ready"].items():
+        if cur["ready_s"] is None:
+            problems.append(f"{service}: not ready within timeout ({cur['last_error']})")
+            continue
+        base = baseline.get("ready", {}).get(service)
+        if base and base.get("ready_s") and cur["ready_s"] > base["ready_s"] * (1 + tolerance):
+            problems.append(f"{service}: time to ready {base['ready_s']:.2f}s -> {cur['ready_s']:.2f}s")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time and time-to-ready of the services")
+    parser.add_argument("--modules", nargs="+", default=list(MODULES))
+    parser.add_argument("--top", type=int, default=8, help="每个模块列出的最重直接依赖数")
+    parser.add_argument("--ready", nargs="*", default=[], choices=sorted(READY_PORTS),
+                        help="以 serve.py 启动这些服务并测量到就绪的时间")
+    parser.add_argument("--ready-timeout", type=float, default=600.0)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--baseline", default=None, help="与该基线报告对比，退化或违规时退出码为 1")
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    args = parser.parse_args()
+
+    report = {"python": sys.version.split()[0], "imports": {}, "ready": {}}
+    for module in args.modules:
+        report["imports"][module] = measure_import(module, args.top)
+        print(f"{module}: {report['imports'][module]['import_ms']}ms", file=sys.stderr)
+    for service in args.ready:
+        report["ready"][service] = measure_ready(service, args.ready_timeout)
+        print(f"{service}: {json.dumps(report['ready'][service])}", file=sys.stderr)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    problems = check(report, baseline, args.tolerance)
+    for p in problems:
+        print(f"REGRESSION {p}", file=sys.stderr)
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# loadtest.py
+# 可复现的压测：从 data_corpus 中按固定种子抽取条文短句作为查询，以给定并发回放到
+# /embed_* 与 /*_search/，输出每个接口的 QPS、p50/p95/p99 延迟和错误率（JSON），并可与基线对比。
+#
+# 在线（真实服务）：
+#   python bench/loadtest.py --concurrency 8 --requests 200
+# 离线（假 embedding + 进程内向量存储上的真实检索服务，见 stub_services.py）：
+#   python bench/loadtest.py --stub --output bench_output.json
+# 保存 / 对比基线：
+#   python bench/loadtest.py --stub --save-baseline bench/baseline.json
+#   python bench/loadtest.py --stub --baseline bench/baseline.json   # 退化时退出码为 1
+
+import argparse
+import atexit
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+DATA_DIR = os.path.join(ROOT_DIR, "data_corpus")
+
+EMBED_TARGETS = ("embed_dense", "embed_sparse")
+SEARCH_TARGETS = ("dense_search", "sparse_search", "hybrid_search")
+
+
+def sample_queries(data_dir: str, n: int, seed: int, min_len: int = 8, max_len: int = 60) -> list:
+    """按中文标点/换行切出条文短句，固定种子抽样，保证每次回放的查询一致。"""
+    clauses = []
+    for fname in sorted(os.listdir(data_dir)):
+        if not fname.endswith(".txt"):
+            continue
+        with open(os.path.join(data_dir, fname), "r", encoding="utf-8") as f:
+            for part in re.split(r"[。；;！？!?\n]", f.read()):
+                part = part.strip()
+                if min_len <= len(part) <= max_len:
+                    clauses.append(part)
+    if not clauses:
+        raise SystemExit(f"{data_dir} 中没有可用的查询短句")
+    rng = random.Random(seed)
+    return [rng.choice(clauses) for _ in range(n)]
+
+
+def build_request(target: str, query: str, embedding_url: str, search_url: str, limit: int):
+    if target in EMBED_TARGETS:
+        return f"{embedding_url}/{target}", {"text": query}
+    return f"{search_url}/{target}/", {"query": query, "limit": limit}
+
+
+def run_target(target: str, queries: list, concurrency: int, args) -> dict:
+    local = threading.local()
+
+    def one(query: str):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        url, payload = build_request(target, query, args.embedding_url, args.search_url, args.limit)
+        t0 = time.perf_counter()
+        try:
+            ok = session.post(url, json=payload, timeout=args.timeout).status_code == 200
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - t0, ok
+
+    # 预热，避免连接建立和首个请求的冷启动进入统计
+    for q in queries[: min(len(queries), args.warmup)]:
+        one(q)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(one, queries))
+    elapsed = time.perf_counter() - t0
+
+    latencies = np.array([lat for lat, _ in samples]) * 1000.0
+    errors = sum(1 for _, ok in samples if not ok)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": errors / len(samples),
+        "qps": len(samples) / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "mean_ms": float(latencies.mean()),
+    }
+
+
+def compare_with_baseline(report: dict, baseline: dict, tolerance: float) -> list:
+    """返回退化项：p95 变慢或 QPS 下降超过 tolerance，或错误率上升。"""
+    regressions = []
+    for target, cur in report["targets"].items():
+        base = baseline.get("targets", {}).get(target)
+        if base is None:
+            continue
+        if cur["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{target}: p95 {base['p95_ms']:.2f}ms -> {cur['p95_ms']:.2f}ms")
+        if cur["qps"] < base["qps"] * (1 - tolerance):
+            regressions.append(f"{target}: qps {base['qps']:.1f} -> {cur['qps']:.1f}")
+        if cur["error_rate"] > base["error_rate"]:
+            regressions.append(f"{target}: error_rate {base['error_rate']:.3f} -> {cur['error_rate']:.3f}")
+    return regressions
+
+
+def start_stubs(args):
+    from stub_services import build_memory_store, create_fake_embedder_app, create_search_app, serve_in_thread
+
+    args.embedding_url = f"http://127.0.0.1:{args.stub_embedding_port}"
+    args.search_url = f"http://127.0.0.1:{args.stub_search_port}"
+    store_dir = tempfile.mkdtemp(prefix="loadtest_store_")
+    atexit.register(shutil.rmtree, store_dir, ignore_errors=True)
+    chunks = build_memory_store(DATA_DIR, store_dir)
+    print(f"memory store: {chunks} chunks in {store_dir}", file=sys.stderr)
+    serve_in_thread(create_fake_embedder_app(), args.stub_embedding_port)
+    serve_in_thread(create_search_app(store_dir, args.embedding_url), args.stub_search_port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay corpus queries against the embedding and search services")
+    parser.add_argument("--embedding-url", default="http://localhost:8001")
+    parser.add_argument("--search-url", default="http://localhost:8002")
+    parser.add_argument("--targets", nargs="+", default=list(EMBED_TARGETS + SEARCH_TARGETS),
+                        choices=EMBED_TARGETS + SEARCH_TARGETS)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="每个接口的请求数")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--stub", action="store_true", help="启动本地替身服务，离线运行")
+    parser.add_argument("--stub-embedding-port", type=int, default=18001)
+    parser.add_argument("--stub-search-port", type=int, default=18002)
+    parser.add_argument("--output", default=None, help="报告写入文件，默认输出到 stdout")
+    parser.add_argument("--baseline", default=None, help="与该基线报告对比，退化时退出码为 1")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--save-baseline", default=None, help="将本次报告保存为基线")
+    args = parser.parse_args()
+
+    if args.stub:
+        start_stubs(args)
+
+    queries = sample_queries(DATA_DIR, args.requests, args.seed)
+    report = {
+        "config": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "limit": args.limit,
+            "seed": args.seed,
+            "stub": args.stub,
+        },
+        "targets": {},
+    }
+    for target in args.targets:
+        report["targets"][target] = run_target(target, queries, args.concurrency, args)
+        print(f"{target}: {json.dumps(report['targets'][target])}", file=sys.stderr)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare_with_baseline(report, json.load(f), args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# stub_services.py
+# 离线压测用的本地服务：
+#   - 假 embedding 服务：接口与 src/api_embedding.py 一致，按字符 bigram 哈希生成确定性的稠密/稀疏向量；
+#   - 检索服务：真实的 src/api_search_milvus.py，后端切换为进程内 MemoryStore，数据由 data_corpus 分块后用假 embedding 写入。
+# 两者都在当前进程的后台线程中运行 uvicorn，无需 GPU、模型或 Milvus。
+
+import os
+import sys
+import threading
+import time
+import zlib
+from typing import Dict, List
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from milvus_ingest import (  # noqa: E402
+    DOC_COLLECTION_NAME,
+    PARTITION_KEY_FIELD,
+    TOKEN_MAP_FIELD,
+    chunk_offsets,
+    chunk_spans,
+    doc_family,
+    doc_row,
+    read_source,
+)
+
+DENSE_DIM = 1024
+SPARSE_VOCAB = 250002  # 与 BGE-M3 词表大小一致
+
+
+# ---------------------------------------------------------------------
+# 假 embedding
+# ---------------------------------------------------------------------
+def _bigrams(text: str) -> list:
+    return [text[i:i + 2] for i in range(max(1, len(text) - 1))]
+
+
+def fake_sparse(text: str) -> Dict[int, float]:
+    weights = {}
+    for gram in _bigrams(text):
+        token = zlib.crc32(gram.encode("utf-8")) % SPARSE_VOCAB
+        weights[token] = weights.get(token, 0.0) + 0.1
+    return {k: min(v, 1.0) for k, v in weights.items()}
+
+
+def fake_tokenize(text: str) -> dict:
+    """与 fake_sparse 一致：第 i 个 token 为 text[i:i+2] 的 bigram。"""
+    grams = _bigrams(text) if text else []
+    spans = []
+    for i, gram in enumerate(grams):
+        spans += [i, i + len(gram)]
+    return {"ids": [zlib.crc32(g.encode("utf-8")) % SPARSE_VOCAB for g in grams], "spans": spans}
+
+
+def fake_dense(text: str) -> np.ndarray:
+    vec = np.zeros(DENSE_DIM, dtype=np.float32)
+    for gram in _bigrams(text):
+        h = zlib.crc32(gram.encode("utf-8"))
+        vec[h % DENSE_DIM] += 1.0 if (h >> 16) & 1 else -1.0
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm > 0 else vec
+
+
+class TextRequest(BaseModel):
+    text: str
+
+
+class BatchRequest(BaseModel):
+    texts: List[str]
+
+
+def create_fake_embedder_app() -> FastAPI:
+    app = FastAPI(title="Fake Embedding Service")
+
+    @app.post("/embed_dense")
+    def embed_dense(req: TextRequest):
+        return {"dense": fake_dense(req.text).tolist()}
+
+    @app.post("/embed_batch_dense")
+    def embed_batch_dense(req: BatchRequest):
+        return {"dense_vectors": [fake_dense(t).tolist() for t in req.texts]}
+
+    @app.post("/embed_sparse")
+    def embed_sparse(req: TextRequest):
+        return {"lexical_weights": fake_sparse(req.text)}
+
+    @app.post("/embed_batch_sparse")
+    def embed_batch_sparse(req: BatchRequest):
+        return {"lexical_weights": [fake_sparse(t) for t in req.texts]}
+
+    @app.post("/tokenize_batch")
+    def tokenize_batch(req: BatchRequest):
+        return {"token_maps": [fake_tokenize(t) for t in req.texts]}
+
+    return app
+
+
+# ---------------------------------------------------------------------
+# 进程内检索
+# ---------------------------------------------------------------------
+def build_memory_store(data_dir: str, store_dir: str, collection_name: str = "hybrid_demo") -> int:
+    """按入库流程对 data_corpus 分块、用假 embedding 编码后写入 MemoryStore（含文档向量），返回 chunk 数。"""
+    import vector_store
+
+    store = vector_store.MemoryStore(os.path.join(store_dir, collection_name), dim=DENSE_DIM)
+    doc_store = vector_store.MemoryStore(os.path.join(store_dir, DOC_COLLECTION_NAME), dim=DENSE_DIM)
+    count = 0
+    for fname in sorted(os.listdir(data_dir)):
+        path = os.path.join(data_dir, fname)
+        if not fname.endswith(".txt") or not os.path.isfile(path):
+            continue
+        text = read_source(path)
+        spans = chunk_spans(text)
+        chunks = [text[start:end] for start, end in spans]
+        dense_list = [fake_dense(chunk) for chunk in chunks]
+        store.insert([
+            {
+                "text": chunk,
+                **offsets,
+                TOKEN_MAP_FIELD: fake_tokenize(chunk),
+                "sparse_vector": fake_sparse(chunk),
+                "dense_vector": dense,
+                "filename": fname,
+                "path": path,
+                "date": 0,
+                PARTITION_KEY_FIELD: doc_family(fname),
+            }
+            for chunk, offsets, dense in zip(chunks, chunk_offsets(text, spans), dense_list)
+        ])
+        doc_store.upsert([doc_row({"filename": fname, "path": path, "date": ""}, dense_list, chunks)])
+        count += len(chunks)
+    store.flush()
+    doc_store.flush()
+    return count
+
+
+def create_search_app(store_dir: str, embedding_url: str) -> FastAPI:
+    """返回真实的检索服务应用，后端为 store_dir 下的 MemoryStore，embedding 指向 embedding_url。"""
+    import vector_store
+
+    vector_store.VECTOR_STORE_BACKEND = "memory"
+    vector_store.MEMORY_STORE_DIR = store_dir
+    import api_search_milvus
+
+    api_search_milvus.BASE_URL = embedding_url
+    return api_search_milvus.app
+
+
+# ---------------------------------------------------------------------
+# 后台运行
+# ---------------------------------------------------------------------
+def serve_in_thread(app: FastAPI, port: int, host: str = "127.0.0.1") -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.time() + 30
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError(f"stub service on port {port} did not start")
+        time.sleep(0.05)
+    return server
@@ -0,0 +1,223 @@
+# admission.py
+# 准入控制：请求截止时间（deadline）、有界并发 + 排队时间上限、过载时快速返回 503（带 Retry-After），
+# 以及客户端断开或超过截止时间时取消请求。
+#
+# 用法：
+#   install_deadlines(app, "search")                       # 每个请求携带 RequestBudget，超时 504、取消 499
+#   admission = AdmissionController("search", max_concurrency=16)
+#   async with admission.admit(): ...                      # 排队过久或队列已满时 503
+#   await run_blocking(fn, *args)                          # 线程池执行，取消时通知线程内的 check_deadline()
+#   await until_done(request, coro, "search")              # 客户端断开或超过截止时间时取消 coro
+
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from metrics import ADMISSION_EVENTS, stage
+
+# 客户端可通过该请求头声明剩余的等待时间（秒），服务间调用时向下游传递
+TIMEOUT_HEADER = "X-Request-Timeout"
+# 未声明时的默认截止时间，与前端 requests.post(..., timeout=10) 一致
+DEFAULT_TIMEOUT = 10.0
+MAX_TIMEOUT = 60.0
+RETRY_AFTER = 1  # seconds
+# nginx 约定的 "client closed request"，客户端已断开，响应不会被读取
+STATUS_CLIENT_CLOSED = 499
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class RequestCancelled(Exception):
+    pass
+
+
+class RequestBudget:
+    """单个请求的截止时间与取消标记，可在事件循环和工作线程之间共享。"""
+
+    def __init__(self, timeout: float):
+        self.deadline = time.monotonic() + timeout
+        self._cancelled = threading.Event()
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def check(self):
+        if self._cancelled.is_set():
+            raise RequestCancelled("request was cancelled")
+        if self.remaining() <= 0:
+            raise DeadlineExceeded("request deadline exceeded")
+
+
+_current_budget: contextvars.ContextVar = contextvars.ContextVar("request_budget", default=None)
+
+
+def current_budget() -> Optional[RequestBudget]:
+    return _current_budget.get()
+
+
+def remaining() -> Optional[float]:
+    """当前请求剩余的秒数（已超时抛 DeadlineExceeded），请求之外调用时为 None。"""
+    budget = current_budget()
+    if budget is None:
+        return None
+    budget.check()
+    return budget.remaining()
+
+
+def check_deadline():
+    """在工作线程的阶段之间调用，请求已取消或超时则放弃后续工作。"""
+    budget = current_budget()
+    if budget is not None:
+        budget.check()
+
+
+def _parse_timeout(value: Optional[str], default: Optional[float]) -> Optional[float]:
+    try:
+        timeout = float(value) if value else default
+    except ValueError:
+        timeout = default
+    return None if timeout is None else min(max(timeout, 0.0), MAX_TIMEOUT)
+
+
+class DeadlineMiddleware:
+    def __init__(self, app, default_timeout: Optional[float]):
+        self.app = app
+        self.default_timeout = default_timeout
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        header = (headers.get(TIMEOUT_HEADER.lower().encode()) or b"").decode()
+        timeout = _parse_timeout(header, self.default_timeout)
+        if timeout is None:  # no deadline for this request
+            await self.app(scope, receive, send)
+            return
+        token = _current_budget.set(RequestBudget(timeout))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_budget.reset(token)
+
+
+def install_deadlines(app: FastAPI, service: str, default_timeout: Optional[float] = DEFAULT_TIMEOUT):
+    """default_timeout 用于未带 X-Request-Timeout 的请求，None 表示这类请求不设截止时间。"""
+    app.add_middleware(DeadlineMiddleware, default_timeout=default_timeout)
+
+    @app.exception_handler(DeadlineExceeded)
+    async def deadline_exceeded(request: Request, exc: DeadlineExceeded):
+        ADMISSION_EVENTS.inc(service, "deadline_exceeded")
+        return JSONResponse({"detail": str(exc)}, status_code=504)
+
+    @app.exception_handler(RequestCancelled)
+    async def request_cancelled(request: Request, exc: RequestCancelled):
+        return JSONResponse({"detail": str(exc)}, status_code=STATUS_CLIENT_CLOSED)
+
+
+class AdmissionController:
+    """
+    最多 max_concurrency 个请求同时执行；其余请求排队，排队超过 max_queue_time（或请求剩余时间）
+    即返回 503，队列中已有 max_queue 个请求时新请求直接返回 503。
+    """
+
+    def __init__(self, service: str, max_concurrency: int, max_queue: int = 64, max_queue_time: float = 1.0):
+        self.service = service
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_queue_time = max_queue_time
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+
+    def _shed(self, reason: str):
+        ADMISSION_EVENTS.inc(self.service, reason)
+        raise HTTPException(
+            status_code=503, detail=f"Server overloaded ({reason})", headers={"Retry-After": str(RETRY_AFTER)}
+        )
+
+    def _abandon(self, acquire: asyncio.Future):
+        # 放弃排队：取消等待中的 acquire；若它已经（或在取消送达前）拿到名额，归还，避免名额泄漏
+        acquire.cancel()
+        acquire.add_done_callback(
+            lambda f: None if f.cancelled() or f.exception() is not None else self._semaphore.release()
+        )
+
+    @asynccontextmanager
+    async def admit(self):
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()  # a slot is free, no waiting
+        else:
+            if self._waiting >= self.max_queue:
+                self._shed("queue_full")
+            budget = current_budget()
+            wait = self.max_queue_time if budget is None else min(self.max_queue_time, budget.remaining())
+            self._waiting += 1
+            acquire = asyncio.ensure_future(self._semaphore.acquire())
+            try:
+                with stage("queue"):
+                    await asyncio.wait({acquire}, timeout=max(wait, 0.0))
+            except asyncio.CancelledError:
+                self._abandon(acquire)
+                raise
+            finally:
+                self._waiting -= 1
+            if not acquire.done() or acquire.cancelled():
+                self._abandon(acquire)
+                self._shed("queue_timeout")
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+
+async def run_blocking(fn, *args):
+    """
+    在线程池中执行 fn（继承当前 contextvars）。与 run_in_threadpool 不同，被取消时立即返回，
+    并通过 RequestBudget 通知线程在下一个 check_deadline() 处放弃。
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    try:
+        return await loop.run_in_executor(None, functools.partial(ctx.run, fn, *args))
+    except asyncio.CancelledError:
+        budget = current_budget()
+        if budget is not None:
+            budget.cancel()
+        raise
+
+
+async def _wait_disconnect(request: Request, interval: float = 0.05):
+    while not await request.is_disconnected():
+        await asyncio.sleep(interval)
+
+
+async def until_done(request: Request, coro, service: str):
+    """运行 coro，客户端断开或超过截止时间时取消它。"""
+    work = asyncio.ensure_future(coro)
+    disconnect = asyncio.ensure_future(_wait_disconnect(request))
+    budget = current_budget()
+    timeout = None if budget is None else max(budget.remaining(), 0.0)
+    try:
+        done, _ = await asyncio.wait({work, disconnect}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        disconnect.cancel()
+        if not work.done():
+            work.cancel()
+    if work in done:
+        return work.result()
+    if disconnect in done:
+        ADMISSION_EVENTS.inc(service, "client_disconnect")
+        raise RequestCancelled("client disconnected")
+    raise DeadlineExceeded("request deadline exceeded")
@@ -1,18 +1,54 @@
 import os
-from fastapi import FastAPI, HTTPException
+import threading
+from fastapi import FastAPI, HTTPException, Request
 from pydantic import BaseModel
 from typing import List, Dict, Any
-from FlagEmbedding import BGEM3FlagModel
+
+from admission import check_deadline, install_deadlines, run_blocking, until_done
+from lifecycle import install_lifecycle
+from log_setup import setup_logging
+from metrics import instrument, stage
+from singleflight import AsyncSingleFlight
 
 # ---------------------------------------------------------------------
 # 模型加载：使用 BGE-M3 多功能模型
 # ---------------------------------------------------------------------
-# 可根据实际情况调整 use_fp16 和 device
-model = BGEM3FlagModel(
-    model_name_or_path="BAAI/bge-m3",
-    use_fp16=False,
-    device="cuda" if (os.getenv("CUDA_VISIBLE_DEVICES") or False) else "cpu"
-)
+# 导入本模块不加载模型（FlagEmbedding 会连带导入 torch / transformers，加上权重加载需要数秒），
+# 由 load_model() 显式加载：serve.py 预加载时在 master 中调用，否则在各 worker 的预热中调用。
+MODEL_NAME = "BAAI/bge-m3"
+# 本地模型快照，可预先下载：huggingface-cli download BAAI/bge-m3 --local-dir models/bge-m3
+MODEL_DIR = os.getenv("BGE_M3_PATH", "./models/bge-m3")
+
+_model = None
+_model_lock = threading.Lock()
+
+def resolve_model_path() -> str:
+    """优先使用本地快照目录，其次是 HuggingFace 缓存中已有的快照（不访问网络），都没有时才从 Hub 下载。"""
+    if os.path.isfile(os.path.join(MODEL_DIR, "config.json")):
+        return MODEL_DIR
+    try:
+        from huggingface_hub import snapshot_download
+        return snapshot_download(MODEL_NAME, local_files_only=True)
+    except Exception:
+        return MODEL_NAME
+
+def load_model():
+    global _model
+    with _model_lock:
+        if _model is None:
+            from FlagEmbedding import BGEM3FlagModel
+            # 可根据实际情况调整 use_fp16 和 device
+            _model = BGEM3FlagModel(
+                model_name_or_path=resolve_model_path(),
+                use_fp16=False,
+                device="cuda" if (os.getenv("CUDA_VISIBLE_DEVICES") or False) else "cpu"
+            )
+    return _model
+
+def get_model():
+    if _model is None:
+        raise HTTPException(status_code=503, detail="模型加载中", headers={"Retry-After": "5"})
+    return _model
 
 # ---------------------------------------------------------------------
 # FastAPI 服务定义
@@ -23,6 +59,19 @@ app = FastAPI(
     version="1.0.0"
 )
 
+
+@app.on_event("startup")
+def start_logging():
+    # 每个 worker 进程各自配置：JSON 行经后台线程写入 logs/api_embedding*.log
+    setup_logging("embedding", "api_embedding")
+
+
+# 分阶段计时（encode 包含 BGE-M3 内部的分词）：Server-Timing 响应头 + /metrics
+instrument(app, "embedding")
+# 截止时间由检索服务通过 X-Request-Timeout 传入，超时（或调用方已断开）的请求不再做前向计算；
+# 未带该请求头的调用（如入库脚本的批量编码）不设截止时间
+install_deadlines(app, "embedding", default_timeout=None)
+
 # 输入模型
 class TextRequest(BaseModel):
     text: str
@@ -44,67 +93,120 @@ class SparseResponse(BaseModel):
 class BatchSparseResponse(BaseModel):
     lexical_weights: List[Dict[int, float]]
 
+# 分词结果：token id 与其在原文中的字符区间（扁平的 [start0, end0, start1, end1, ...]），不含特殊 token
+class TokenMap(BaseModel):
+    ids: List[int]
+    spans: List[int]
+
+class BatchTokenizeResponse(BaseModel):
+    token_maps: List[TokenMap]
+
+# ---------------------------------------------------------------------
+# 编码：在线程池中执行，事件循环只负责请求合并与响应
+# ---------------------------------------------------------------------
+# 并发的相同文本请求只做一次前向计算，其余请求共享结果（计数见 /metrics 的 singleflight_requests_total）
+singleflight = AsyncSingleFlight("embedding")
+
+def encode_dense(texts: List[str]) -> List[List[float]]:
+    check_deadline()
+    with stage("encode"):
+        output = get_model().encode(
+            texts,
+            return_dense=True,
+            return_sparse=False,
+            return_colbert_vecs=False
+        )
+    return [vec.tolist() for vec in output["dense_vecs"]]
+
+def encode_sparse(texts: List[str]) -> List[Dict[int, float]]:
+    check_deadline()
+    with stage("encode"):
+        output = get_model().encode(
+            texts,
+            return_dense=False,
+            return_sparse=True,
+            return_colbert_vecs=False
+        )
+    return output.get("lexical_weights") or []
+
+def tokenize(texts: List[str]) -> List[dict]:
+    check_deadline()
+    with stage("tokenize"):
+        # 与 encode 使用同一个分词器，token id 即 lexical_weights 的 key
+        enc = get_model().tokenizer(
+            texts, add_special_tokens=False, return_offsets_mapping=True, truncation=True, max_length=8192
+        )
+    return [
+        {"ids": ids, "spans": [pos for span in offsets for pos in span]}
+        for ids, offsets in zip(enc["input_ids"], enc["offset_mapping"])
+    ]
+
+async def coalesced_encode(http_request: Request, endpoint: str, encode, texts: List[str]) -> list:
+    # 以原始文本为 key，不做归一化，保证共享的结果与各自单独编码完全一致
+    work = singleflight.do(endpoint, tuple(texts), lambda: run_blocking(encode, texts))
+    return await until_done(http_request, work, "embedding")
+
 @app.post("/embed_dense", response_model=DenseResponse)
-def embed_dense(req: TextRequest):
+async def embed_dense(req: TextRequest, http_request: Request):
     """单条文本的稠密嵌入接口"""
     if not req.text:
         raise HTTPException(status_code=400, detail="文本为空")
     # 只返回稠密向量
-    output = model.encode(
-        [req.text],
-        return_dense=True,
-        return_sparse=False,
-        return_colbert_vecs=False
-    )
-    dense_vec = output["dense_vecs"][0]
-    return DenseResponse(dense=dense_vec.tolist())
+    dense_vecs = await coalesced_encode(http_request, "embed_dense", encode_dense, [req.text])
+    with stage("serialize"):
+        return DenseResponse(dense=dense_vecs[0])
 
 @app.post("/embed_batch_dense", response_model=BatchDenseResponse)
-def embed_batch_dense(req: BatchRequest):
+async def embed_batch_dense(req: BatchRequest, http_request: Request):
     """批量文本的稠密嵌入接口"""
     if not req.texts:
         raise HTTPException(status_code=400, detail="文本列表为空")
-    output = model.encode(
-        req.texts,
-        return_dense=True,
-        return_sparse=False,
-        return_colbert_vecs=False
-    )
-    dense_list = output["dense_vecs"]
-    return BatchDenseResponse(dense_vectors=[vec.tolist() for vec in dense_list])
+    dense_list = await coalesced_encode(http_request, "embed_batch_dense", encode_dense, req.texts)
+    with stage("serialize"):
+        return BatchDenseResponse(dense_vectors=dense_list)
 
 @app.post("/embed_sparse", response_model=SparseResponse)
-def embed_sparse(req: TextRequest):
+async def embed_sparse(req: TextRequest, http_request: Request):
     """单条文本的稀疏嵌入接口"""
     if not req.text:
         raise HTTPException(status_code=400, detail="文本为空")
     # 只返回稀疏权重字典
-    output = model.encode(
-        [req.text],
-        return_dense=False,
-        return_sparse=True,
-        return_colbert_vecs=False
-    )
-    weights = output.get("lexical_weights")
-    if weights is None or len(weights) == 0:
+    weights = await coalesced_encode(http_request, "embed_sparse", encode_sparse, [req.text])
+    if len(weights) == 0:
         raise HTTPException(status_code=500, detail="未能生成稀疏向量")
-    return SparseResponse(lexical_weights=weights[0])
+    with stage("serialize"):
+        return SparseResponse(lexical_weights=weights[0])
 
 @app.post("/embed_batch_sparse", response_model=BatchSparseResponse)
-def embed_batch_sparse(req: BatchRequest):
+async def embed_batch_sparse(req: BatchRequest, http_request: Request):
     """批量文本的稀疏嵌入接口"""
     if not req.texts:
         raise HTTPException(status_code=400, detail="文本列表为空")
-    output = model.encode(
-        req.texts,
-        return_dense=False,
-        return_sparse=True,
-        return_colbert_vecs=False
-    )
-    weights_list = output.get("lexical_weights") or []
+    weights_list = await coalesced_encode(http_request, "embed_batch_sparse", encode_sparse, req.texts)
     if not weights_list:
         raise HTTPException(status_code=500, detail="未能生成稀疏向量列表")
-    return BatchSparseResponse(lexical_weights=weights_list)
+    with stage("serialize"):
+        return BatchSparseResponse(lexical_weights=weights_list)
+
+@app.post("/tokenize_batch", response_model=BatchTokenizeResponse)
+async def tokenize_batch(req: BatchRequest, http_request: Request):
+    """批量分词接口，返回每个 token 的 id 与字符区间（入库时保存，检索服务据此生成摘要高亮）"""
+    if not req.texts:
+        raise HTTPException(status_code=400, detail="文本列表为空")
+    token_maps = await coalesced_encode(http_request, "tokenize_batch", tokenize, req.texts)
+    with stage("serialize"):
+        return BatchTokenizeResponse(token_maps=token_maps)
+
+# ---------------------------------------------------------------------
+# 预热：加载模型（已预加载时直接返回），各长度的文本各编码一次，
+# 首个真实请求不再承担 kernel 初始化等开销；完成后 /readyz 返回 200
+# ---------------------------------------------------------------------
+WARMUP_TEXTS = ["预热", "施工现场临时用电安全技术规范", "混凝土结构工程施工质量验收规范。" * 20]
+
+def warmup():
+    load_model().encode(WARMUP_TEXTS, return_dense=True, return_sparse=True, return_colbert_vecs=False)
+
+lifecycle = install_lifecycle(app, "embedding", warmup)
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,165 +1,703 @@
 # search_milvus_api.py
 
-from fastapi import FastAPI
-from pydantic import BaseModel
-from pymilvus import (
-    connections,
-    Collection,
-    AnnSearchRequest,
-    WeightedRanker,
-)
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
 import requests
-from transformers import AutoTokenizer
+
+from admission import (
+    TIMEOUT_HEADER,
+    AdmissionController,
+    DeadlineExceeded,
+    check_deadline,
+    install_deadlines,
+    remaining,
+    run_blocking,
+    until_done,
+)
+from chunk_store import ChunkStore
+from lifecycle import install_lifecycle
+from log_setup import setup_logging
+from metrics import instrument, stage
+from singleflight import AsyncSingleFlight
+from snippets import make_snippet
+from milvus_ingest import (
+    CHUNK_STORE_PATH,
+    CHUNK_STORE_FIELDS,
+    DATA_DIR,
+    DOC_COLLECTION_NAME,
+    OFFSET_FIELDS,
+    TOKEN_MAP_FIELD,
+    parse_date,
+    format_date,
+)
+from vector_store import ScalarFilter, VectorStore, open_store
 
 app = FastAPI()
 
+
+@app.on_event("startup")
+def start_logging():
+    # Configured per worker process: JSON lines to logs/api_search_milvus*.log via a background thread
+    setup_logging("search", "api_search_milvus")
+
+
+instrument(app, "search")
+# Per-request deadline from the X-Request-Timeout header (default 10s), 504 when exceeded
+install_deadlines(app, "search")
+
 # Configuration
 BASE_URL = "http://localhost:8001"
-MILVUS_URI = "http://localhost:19530"
 COLLECTION_NAME = "hybrid_demo"
 DENSE_DIM = 1024
+# Hydrated chunk payloads served by /chunks/
+CHUNK_CACHE_SIZE = 4096
+CHUNK_CACHE_TTL = 300  # seconds
+# Admission control: concurrent searches, waiting searches, and the longest a search may queue
+MAX_CONCURRENT_SEARCHES = 16
+MAX_QUEUED_SEARCHES = 64
+MAX_QUEUE_TIME = 1.0  # seconds
+# Milvus rejects limit (topk) above 16384
+MAX_SEARCH_LIMIT = 16384
+
+# Vector store (Milvus or in-process, see vector_store.VECTOR_STORE_BACKEND),
+# opened once per process and shared by all requests
+_store = None
+_store_lock = threading.Lock()
 
-# Connect to Milvus
-def connect_milvus(uri: str = MILVUS_URI):
-    connections.connect("default", uri=uri)
+def get_store() -> VectorStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                with stage("open_store"):
+                    _store = open_store(COLLECTION_NAME)
+    # Pick up data flushed by the ingest process (no-op for Milvus)
+    _store.refresh()
+    return _store
 
-def load_collection(name: str = COLLECTION_NAME) -> Collection:
-    col = Collection(name)
-    col.load()
-    return col
+# Document-level vectors written by milvus_ingest (one row per path), used for recommendations
+_doc_store = None
+
+def get_doc_store() -> VectorStore:
+    global _doc_store
+    if _doc_store is None:
+        with _store_lock:
+            if _doc_store is None:
+                try:
+                    with stage("open_store"):
+                        _doc_store = open_store(DOC_COLLECTION_NAME, documents=True)
+                except Exception as e:
+                    # e.g. the Milvus collection does not exist until ingest has run
+                    raise HTTPException(
+                        status_code=503, detail=f"Document vectors are not available, run milvus_ingest.py ({e})"
+                    )
+    _doc_store.refresh()
+    return _doc_store
 
 # Request Models
+class SearchFilter(BaseModel):
+    filenames: Optional[List[str]] = None
+    path_prefix: Optional[str] = None
+    # "YYYY-MM-DD" or "YYYY-MM-DD HH:MM:SS", both bounds inclusive
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    # Partition key values (see milvus_ingest.doc_family); only matching partitions are searched
+    doc_families: Optional[List[str]] = None
+
 class SearchRequest(BaseModel):
     query: str
-    limit: int = 10
+    limit: int = Field(10, gt=0, le=MAX_SEARCH_LIMIT)
     sparse_weight: float = 1.0
     dense_weight: float = 1.0
+    # Return `limit` distinct documents (best chunk per path) instead of `limit` chunks
+    group_by_doc: bool = False
+    filter: Optional[SearchFilter] = None
+    # Dense ANN search params: `ef` for HNSW, `nprobe` for IVF_* indexes
+    ef: Optional[int] = None
+    nprobe: Optional[int] = None
+    # Payload fields to return with each hit (pk and score are always returned);
+    # pass [] to rank only and hydrate later through /chunks/
+    fields: Optional[List[str]] = None
+    # Add a short `snippet` per hit: the window of the chunk with the most query-token weight,
+    # with highlight spans, so clients need not request and scan the full text
+    snippets: bool = False
+
+class ChunksRequest(BaseModel):
+    pks: List[str]
+    fields: Optional[List[str]] = None
+
+class ContextRequest(BaseModel):
+    path: str
+    # Byte range of the hit in the source file (byte_start / byte_end of a search result)
+    byte_start: int
+    byte_end: int
+    # Bytes of surrounding text on each side; the UI grows these to page ("load more")
+    before: int = 1000
+    after: int = 1000
+
+class DocEmbeddingsRequest(BaseModel):
+    paths: List[str]
+
+class RecommendRequest(BaseModel):
+    # Paths the user marked; both are excluded from the recommendations
+    liked: List[str]
+    disliked: List[str] = []
+    limit: int = 5
+    filter: Optional[SearchFilter] = None
 
 # Embedding Methods
-def get_dense_embedding(text: str) -> list:
-    resp = requests.post(f"{BASE_URL}/embed_dense", json={"text": text})
+def post_embedding(endpoint: str, payload: dict) -> dict:
+    """Call the embedding service within the remaining request budget and pass the deadline on."""
+    timeout = remaining()
+    headers = {TIMEOUT_HEADER: f"{timeout:.3f}"} if timeout is not None else {}
+    try:
+        resp = requests.post(f"{BASE_URL}/{endpoint}", json=payload, timeout=timeout, headers=headers)
+    except requests.Timeout:
+        raise DeadlineExceeded(f"{endpoint} did not answer within the request deadline")
+    if resp.status_code == 504:
+        raise DeadlineExceeded(f"{endpoint} gave up at the request deadline")
     resp.raise_for_status()
-    return resp.json()["dense"]
+    return resp.json()
+
+def get_dense_embedding(text: str) -> list:
+    with stage("embed_dense_rpc"):
+        return post_embedding("embed_dense", {"text": text})["dense"]
 
 def get_sparse_embedding(text: str) -> dict:
-    resp = requests.post(f"{BASE_URL}/embed_sparse", json={"text": text})
-    resp.raise_for_status()
-    return resp.json()["lexical_weights"]
+    with stage("embed_sparse_rpc"):
+        return post_embedding("embed_sparse", {"text": text})["lexical_weights"]
 
 # Search Functions
-def dense_search(col: Collection, dense_emb: list, limit: int = 10) -> list:
-    search_params = {"metric_type": "IP", "params": {}}
-    hits = col.search(
-        [dense_emb],
-        anns_field="dense_vector",
-        param=search_params,
-        limit=limit,
-        output_fields=["text", 'filename', 'path', 'date'],
-    )[0]
+# Offsets locate the chunk in its source file (see milvus_ingest.OFFSET_FIELDS), for /context/
+OUTPUT_FIELDS = ["text", "filename", "path", "date", *OFFSET_FIELDS]
+# Chunks of the same source document share a path
+GROUP_BY_FIELD = "path"
+def resolve_fields(fields: Optional[List[str]]) -> List[str]:
+    if fields is None:
+        return OUTPUT_FIELDS
+    unknown = [f for f in fields if f not in OUTPUT_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields {unknown}, expected a subset of {OUTPUT_FIELDS}")
+    return fields
 
-    return [
-        {
-            "text": hit.entity.get("text"),
-            "filename": hit.entity.get("filename"),
-            "path": hit.entity.get("path"),
-            "date": hit.entity.get("date"),
-            "score": hit.score,
-        }
-        for hit in hits
-    ]
+def dense_search_params(ef: Optional[int] = None, nprobe: Optional[int] = None) -> dict:
+    params = {}
+    if ef is not None:
+        params["ef"] = ef
+    if nprobe is not None:
+        params["nprobe"] = nprobe
+    return params
 
-def sparse_search(col: Collection, sparse_emb: dict, limit: int = 10) -> list:
-    search_params = {"metric_type": "IP", "params": {}}
-    hits = col.search(
-        [sparse_emb],
-        anns_field="sparse_vector",
-        param=search_params,
-        limit=limit,
-        output_fields=["text", 'filename', 'path', 'date'],
-    )[0]
+def _filter_timestamp(value: str, end_of_day: bool = False) -> int:
+    ts = parse_date(value.strip())
+    if not ts:
+        raise HTTPException(status_code=400, detail=f"Invalid date in filter: {value!r}")
+    # A bare date as upper bound covers the whole day
+    if end_of_day and len(value.strip()) == 10:
+        ts += 24 * 3600 - 1
+    return ts
 
-    return [
-        {
-            "text": hit.entity.get("text"),
-            "filename": hit.entity.get("filename"),
-            "path": hit.entity.get("path"),
-            "date": hit.entity.get("date"),
-            "score": hit.score,
-        }
-        for hit in hits
-    ]
+def resolve_filter(search_filter: Optional[SearchFilter]) -> Optional[ScalarFilter]:
+    """Validate a SearchFilter and resolve its dates into the store-level ScalarFilter (None when empty)."""
+    if search_filter is None:
+        return None
+    return ScalarFilter(
+        doc_families=search_filter.doc_families,
+        filenames=search_filter.filenames,
+        path_prefix=search_filter.path_prefix,
+        date_min=_filter_timestamp(search_filter.date_from) if search_filter.date_from else None,
+        date_max=_filter_timestamp(search_filter.date_to, end_of_day=True) if search_filter.date_to else None,
+    )
+
+_chunk_store = None
+
+def get_chunk_store() -> ChunkStore:
+    global _chunk_store
+    if _chunk_store is None:
+        if CHUNK_STORE_PATH is None:
+            raise RuntimeError("Collection keeps chunk text in a local chunk store but CHUNK_STORE_PATH is not set")
+        _chunk_store = ChunkStore(CHUNK_STORE_PATH)
+    return _chunk_store
+
+def uses_chunk_store(store: VectorStore) -> bool:
+    return "text_offset" in store.field_names()
+
+def store_output_fields(store: VectorStore, fields: List[str]) -> List[str]:
+    """Map requested payload fields to stored fields (text lives in the chunk store for some collections)."""
+    stored = store.field_names()
+    # Collections ingested before offsets / token maps were stored lack those fields, build_row fills in defaults
+    fields = [f for f in fields if f not in OFFSET_FIELDS + [TOKEN_MAP_FIELD] or f in stored]
+    if "text" in fields and "text_offset" in stored:
+        return [f for f in fields if f != "text"] + CHUNK_STORE_FIELDS
+    return fields
+
+def build_row(store: VectorStore, stored: dict, fields: List[str]) -> dict:
+    row = {}
+    for f in fields:
+        if f == "text" and uses_chunk_store(store):
+            row["text"] = get_chunk_store().read(stored["text_offset"], stored["text_size"])
+        elif f == "date":
+            row["date"] = format_date(stored["date"])
+        elif f in OFFSET_FIELDS:
+            row[f] = stored.get(f, -1)
+        elif f == TOKEN_MAP_FIELD:
+            row[f] = stored.get(f)
+        else:
+            row[f] = stored[f]
+    return row
+
+def hits_to_results(store: VectorStore, hits: List[dict], fields: List[str] = OUTPUT_FIELDS) -> list:
+    with stage("hydrate"):
+        return [{**build_row(store, hit, fields), "pk": hit["pk"], "score": hit["score"]} for hit in hits]
+
+def best_chunk_per_doc(results: list, limit: int) -> list:
+    """Keep the first (highest scoring) chunk of each path, up to `limit` documents."""
+    docs = {}
+    for r in results:
+        if r["path"] not in docs:
+            docs[r["path"]] = r
+            if len(docs) >= limit:
+                break
+    return list(docs.values())
+
+def dense_search(
+    store: VectorStore,
+    dense_emb: list,
+    limit: int = 10,
+    group_by_doc: bool = False,
+    search_filter: Optional[SearchFilter] = None,
+    search_params: Optional[dict] = None,
+    fields: List[str] = OUTPUT_FIELDS,
+) -> list:
+    check_deadline()
+    with stage("vector_search"):
+        hits = store.dense_search(
+            dense_emb,
+            limit,
+            scalar_filter=resolve_filter(search_filter),
+            group_by=GROUP_BY_FIELD if group_by_doc else None,
+            params=search_params,
+            output_fields=store_output_fields(store, fields),
+            timeout=remaining(),
+        )
+    return hits_to_results(store, hits, fields)
+
+def sparse_search(
+    store: VectorStore,
+    sparse_emb: dict,
+    limit: int = 10,
+    group_by_doc: bool = False,
+    search_filter: Optional[SearchFilter] = None,
+    fields: List[str] = OUTPUT_FIELDS,
+) -> list:
+    check_deadline()
+    with stage("vector_search"):
+        hits = store.sparse_search(
+            sparse_emb,
+            limit,
+            scalar_filter=resolve_filter(search_filter),
+            group_by=GROUP_BY_FIELD if group_by_doc else None,
+            output_fields=store_output_fields(store, fields),
+            timeout=remaining(),
+        )
+    return hits_to_results(store, hits, fields)
+
+def _hybrid_search_chunks(
+    store: VectorStore,
+    dense_emb: list,
+    sparse_emb: dict,
+    sparse_weight: float,
+    dense_weight: float,
+    limit: int,
+    scalar_filter: Optional[ScalarFilter],
+    dense_params: Optional[dict],
+    fields: List[str],
+) -> list:
+    check_deadline()
+    with stage("vector_search"):
+        hits = store.hybrid_search(
+            dense_emb,
+            sparse_emb,
+            dense_weight=dense_weight,
+            sparse_weight=sparse_weight,
+            limit=limit,
+            scalar_filter=scalar_filter,
+            params=dense_params,
+            output_fields=store_output_fields(store, fields),
+            timeout=remaining(),
+        )
+    return hits_to_results(store, hits, fields)
 
 def hybrid_search(
-    col: Collection,
+    store: VectorStore,
     dense_emb: list,
     sparse_emb: dict,
     sparse_weight: float = 1.0,
     dense_weight: float = 1.0,
     limit: int = 10,
+    group_by_doc: bool = False,
+    search_filter: Optional[SearchFilter] = None,
+    search_params: Optional[dict] = None,
+    fields: List[str] = OUTPUT_FIELDS,
 ) -> list:
-    dense_req = AnnSearchRequest(
-        data=[dense_emb],
-        anns_field="dense_vector",
-        param={"metric_type": "IP", "params": {}},
-        limit=limit,
-    )
-    sparse_req = AnnSearchRequest(
-        data=[sparse_emb],
-        anns_field="sparse_vector",
-        param={"metric_type": "IP", "params": {}},
-        limit=limit,
-    )
-    rerank = WeightedRanker(sparse_weight, dense_weight)
-    hits = col.hybrid_search(
-        reqs=[dense_req, sparse_req],
-        rerank=rerank,
-        limit=limit,
-        output_fields=["text", 'filename', 'path', 'date'],
-    )[0]
+    scalar_filter = resolve_filter(search_filter)
+    if not group_by_doc:
+        return _hybrid_search_chunks(
+            store, dense_emb, sparse_emb, sparse_weight, dense_weight, limit, scalar_filter, search_params, fields
+        )
+    # Client-side grouping needs the path of every hit; drop it again unless the caller asked for it
+    injected = GROUP_BY_FIELD not in fields
+    if injected:
+        fields = fields + [GROUP_BY_FIELD]
 
-    return [
-        {
-            "text": hit.entity.get("text"),
-            "filename": hit.entity.get("filename"),
-            "path": hit.entity.get("path"),
-            "date": hit.entity.get("date"),
-            "score": hit.score,
-        }
-        for hit in hits
-    ]
+    # Grouping is applied after the reranker, so over-fetch chunks until
+    # `limit` distinct documents are found or the collection is exhausted.
+    fetch = limit
+    while True:
+        results = _hybrid_search_chunks(
+            store, dense_emb, sparse_emb, sparse_weight, dense_weight, fetch, scalar_filter, search_params, fields
+        )
+        docs = best_chunk_per_doc(results, limit)
+        if len(docs) >= limit or len(results) < fetch or fetch >= MAX_SEARCH_LIMIT:
+            if injected:
+                docs = [{k: v for k, v in d.items() if k != GROUP_BY_FIELD} for d in docs]
+            return docs
+        fetch = min(fetch * 4, MAX_SEARCH_LIMIT)
+
+# Chunk Hydration
+class ChunkCache:
+    """Thread-safe LRU of hydrated chunk rows keyed by pk, entries expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int = CHUNK_CACHE_SIZE, ttl: float = CHUNK_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[str]) -> Dict[str, dict]:
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is None:
+                    continue
+                expires, row = entry
+                if expires < now:
+                    del self._data[key]
+                    continue
+                self._data.move_to_end(key)
+                found[key] = row
+        return found
+
+    def put(self, key: str, row: dict):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, row)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+chunk_cache = ChunkCache()
+
+def hydrate_chunks(store: VectorStore, pks: List[str]) -> list:
+    """Fetch full chunk payloads by pk (cache first, then one bulk store query), in request order."""
+    rows = chunk_cache.get_many(pks)
+    missing = [pk for pk in dict.fromkeys(pks) if pk not in rows]
+    if missing:
+        with stage("vector_query"):
+            fetched = store.query(
+                missing, output_fields=store_output_fields(store, OUTPUT_FIELDS), timeout=remaining()
+            )
+        with stage("hydrate"):
+            for entity in fetched:
+                row = {**build_row(store, entity, OUTPUT_FIELDS), "pk": entity["pk"]}
+                chunk_cache.put(row["pk"], row)
+                rows[row["pk"]] = row
+    return [rows[pk] for pk in pks if pk in rows]
 
 # API Endpoints
-@app.post("/dense_search/")
-async def dense_search_api(request: SearchRequest):
-    connect_milvus()
-    col = load_collection()
+def json_response(payload: dict) -> JSONResponse:
+    # Render here rather than in FastAPI so serialization shows up as its own stage
+    with stage("serialize"):
+        return JSONResponse(payload)
+
+# Identical concurrent searches (popular clauses, double clicks) share one embedding + vector search
+singleflight = AsyncSingleFlight("search")
+
+def search_key(request: SearchRequest) -> str:
+    """Normalized request: parsed model with defaults filled in, keys sorted and the query trimmed."""
+    payload = request.model_dump()
+    payload["query"] = " ".join(request.query.split())
+    return json.dumps(payload, sort_keys=True, ensure_ascii=False)
+
+def search_fields(request: SearchRequest) -> List[str]:
+    """Requested payload fields plus what snippet generation reads (dropped again by attach_snippets)."""
+    fields = resolve_fields(request.fields)
+    if request.snippets:
+        fields = fields + [f for f in ("text", TOKEN_MAP_FIELD) if f not in fields]
+    return fields
+
+def attach_snippets(results: list, sparse_emb: dict, request: SearchRequest) -> list:
+    if not request.snippets:
+        return results
+    keep_text = "text" in resolve_fields(request.fields)
+    # Term ids arrive as JSON object keys (strings); token maps hold ints
+    weights = {int(k): float(v) for k, v in sparse_emb.items()}
+    with stage("snippets"):
+        for r in results:
+            r["snippet"] = make_snippet(r["text"], r.pop(TOKEN_MAP_FIELD), weights)
+            if not keep_text:
+                del r["text"]
+    return results
+
+def run_dense_search(request: SearchRequest) -> list:
+    store = get_store()
     dense_emb = get_dense_embedding(request.query)
-    results = dense_search(col, dense_emb, limit=request.limit)
-    return {"results": results}
+    results = dense_search(
+        store,
+        dense_emb,
+        limit=request.limit,
+        group_by_doc=request.group_by_doc,
+        search_filter=request.filter,
+        search_params=dense_search_params(request.ef, request.nprobe),
+        fields=search_fields(request),
+    )
+    if not request.snippets:
+        return results
+    # Snippets score chunk tokens by the query's lexical weights
+    return attach_snippets(results, get_sparse_embedding(request.query), request)
 
-@app.post("/sparse_search/")
-async def sparse_search_api(request: SearchRequest):
-    connect_milvus()
-    col = load_collection()
+def run_sparse_search(request: SearchRequest) -> list:
+    store = get_store()
     sparse_emb = get_sparse_embedding(request.query)
-    results = sparse_search(col, sparse_emb, limit=request.limit)
-    return {"results": results}
+    results = sparse_search(
+        store,
+        sparse_emb,
+        limit=request.limit,
+        group_by_doc=request.group_by_doc,
+        search_filter=request.filter,
+        fields=search_fields(request),
+    )
+    return attach_snippets(results, sparse_emb, request)
 
-@app.post("/hybrid_search/")
-async def hybrid_search_api(request: SearchRequest):
-    connect_milvus()
-    col = load_collection()
+def run_hybrid_search(request: SearchRequest) -> list:
+    store = get_store()
     dense_emb = get_dense_embedding(request.query)
     sparse_emb = get_sparse_embedding(request.query)
     results = hybrid_search(
-        col,
+        store,
         dense_emb,
         sparse_emb,
         sparse_weight=request.sparse_weight,
         dense_weight=request.dense_weight,
         limit=request.limit,
+        group_by_doc=request.group_by_doc,
+        search_filter=request.filter,
+        search_params=dense_search_params(request.ef, request.nprobe),
+        fields=search_fields(request),
     )
-    return {"results": results}
+    return attach_snippets(results, sparse_emb, request)
+
+# Bounded concurrency; requests that would queue too long are shed with 503 + Retry-After
+admission = AdmissionController(
+    "search", max_concurrency=MAX_CONCURRENT_SEARCHES, max_queue=MAX_QUEUED_SEARCHES, max_queue_time=MAX_QUEUE_TIME
+)
+
+async def coalesced_search(endpoint: str, run, request: SearchRequest) -> list:
+    # Only the leader of a coalesced group takes an admission slot; blocking embedding RPCs
+    # and vector search run in the threadpool so the event loop stays free
+    async def work():
+        async with admission.admit():
+            return await run_blocking(run, request)
+    return await singleflight.do(endpoint, search_key(request), work)
+
+@app.post("/dense_search/")
+async def dense_search_api(request: SearchRequest, http_request: Request):
+    results = await until_done(http_request, coalesced_search("dense_search", run_dense_search, request), "search")
+    return json_response({"results": results})
+
+@app.post("/sparse_search/")
+async def sparse_search_api(request: SearchRequest, http_request: Request):
+    results = await until_done(http_request, coalesced_search("sparse_search", run_sparse_search, request), "search")
+    return json_response({"results": results})
+
+@app.post("/hybrid_search/")
+async def hybrid_search_api(request: SearchRequest, http_request: Request):
+    results = await until_done(http_request, coalesced_search("hybrid_search", run_hybrid_search, request), "search")
+    return json_response({"results": results})
+
+@app.post("/chunks/")
+async def chunks_api(request: ChunksRequest, http_request: Request):
+    fields = resolve_fields(request.fields)
+
+    async def work():
+        async with admission.admit():
+            return await run_blocking(lambda: hydrate_chunks(get_store(), request.pks))
+    chunks = await until_done(http_request, work(), "search")
+    return json_response({"chunks": [{**{f: c[f] for f in fields}, "pk": c["pk"]} for c in chunks]})
+
+# Largest window /context/ returns in one call
+MAX_CONTEXT_BYTES = 256 * 1024
+CORPUS_ROOT = os.path.realpath(DATA_DIR)
+
+def corpus_file(path: str) -> str:
+    """Only files inside the ingested corpus directory can be read through /context/."""
+    real = os.path.realpath(path)
+    if os.path.commonpath([real, CORPUS_ROOT]) != CORPUS_ROOT or not os.path.isfile(real):
+        raise HTTPException(status_code=404, detail=f"Not a corpus file: {path}")
+    return real
+
+def utf8_bounds(buf: bytes) -> tuple:
+    """Trim a byte window to whole UTF-8 characters: skip leading continuation bytes, drop a cut-off tail."""
+    lo = 0
+    while lo < min(3, len(buf)) and 0x80 <= buf[lo] < 0xC0:
+        lo += 1
+    hi = len(buf)
+    for back in range(1, min(4, hi - lo) + 1):
+        b = buf[hi - back]
+        if b < 0x80:
+            break
+        if b >= 0xC0:
+            needed = 2 if b < 0xE0 else 3 if b < 0xF0 else 4
+            if needed > back:
+                hi -= back
+            break
+    return lo, hi
+
+def read_context(request: ContextRequest) -> dict:
+    """Seek to the window around the hit and read only those bytes."""
+    if request.byte_start < 0 or request.byte_end < request.byte_start:
+        raise HTTPException(status_code=400, detail="This hit has no source offsets (re-ingest or migrate)")
+    before = max(request.before, 0)
+    after = max(request.after, 0)
+    if request.byte_end - request.byte_start + before + after > MAX_CONTEXT_BYTES:
+        raise HTTPException(status_code=400, detail=f"Context window is limited to {MAX_CONTEXT_BYTES} bytes")
+    path = corpus_file(request.path)
+    with stage("read_context"):
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            start = max(0, request.byte_start - before)
+            end = min(size, request.byte_end + after)
+            f.seek(start)
+            buf = f.read(end - start)
+    lo, hi = utf8_bounds(buf)
+    hit_lo = min(max(request.byte_start - start, lo), hi)
+    hit_hi = min(max(request.byte_end - start, hit_lo), hi)
+    return {
+        "path": request.path,
+        "text": buf[lo:hi].decode("utf-8", errors="replace"),
+        "byte_start": start + lo,
+        "byte_end": start + hi,
+        "file_size": size,
+        # Character range of the hit inside `text`, for highlighting
+        "hit_start": len(buf[lo:hit_lo].decode("utf-8", errors="replace")),
+        "hit_end": len(buf[lo:hit_hi].decode("utf-8", errors="replace")),
+        "has_before": start + lo > 0,
+        "has_after": start + hi < size,
+    }
+
+@app.post("/context/")
+def context_api(request: ContextRequest):
+    # A bounded seek + read, cheap enough to skip admission control
+    return json_response(read_context(request))
+
+# At most this many paths per /doc_embeddings/ call (one pk lookup each)
+MAX_DOC_EMBEDDINGS = 1000
+
+def lookup_doc_embeddings(paths: List[str]) -> Dict[str, list]:
+    with stage("vector_query"):
+        rows = get_doc_store().query(list(dict.fromkeys(paths)), ["dense_vector"], timeout=remaining())
+    return {r["pk"]: r["dense_vector"] for r in rows}
+
+@app.post("/doc_embeddings/")
+async def doc_embeddings_api(request: DocEmbeddingsRequest, http_request: Request):
+    if len(request.paths) > MAX_DOC_EMBEDDINGS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_DOC_EMBEDDINGS} paths per request")
+
+    async def work():
+        async with admission.admit():
+            return await run_blocking(lookup_doc_embeddings, request.paths)
+    embeddings = await until_done(http_request, work(), "search")
+    missing = [p for p in request.paths if p not in embeddings]
+    return json_response({"embeddings": embeddings, "missing": missing})
+
+# Rocchio profile: LIKED_WEIGHT * mean(liked) - DISLIKED_WEIGHT * mean(disliked), normalized
+ROCCHIO_LIKED_WEIGHT = 1.0
+ROCCHIO_DISLIKED_WEIGHT = 0.5
+RECOMMEND_FIELDS = ["filename", "path", "date"]
+
+def rocchio_profile(liked: List[list], disliked: List[list]) -> Optional[np.ndarray]:
+    if not liked:
+        return None
+    profile = ROCCHIO_LIKED_WEIGHT * np.mean(np.asarray(liked, dtype=np.float32), axis=0)
+    if disliked:
+        profile -= ROCCHIO_DISLIKED_WEIGHT * np.mean(np.asarray(disliked, dtype=np.float32), axis=0)
+    norm = float(np.linalg.norm(profile))
+    return profile / norm if norm > 0 else None
+
+def run_recommend(request: RecommendRequest) -> list:
+    """One ANN search over the document vectors with the marked documents filtered out."""
+    store = get_doc_store()
+    marked = list(dict.fromkeys(request.liked + request.disliked))
+    with stage("vector_query"):
+        vectors = {r["pk"]: r["dense_vector"] for r in store.query(marked, ["dense_vector"], timeout=remaining())}
+    profile = rocchio_profile(
+        [vectors[p] for p in request.liked if p in vectors],
+        [vectors[p] for p in request.disliked if p in vectors],
+    )
+    if profile is None:
+        return []
+    scalar_filter = resolve_filter(request.filter) or ScalarFilter()
+    scalar_filter.exclude_paths = marked
+    check_deadline()
+    with stage("vector_search"):
+        hits = store.dense_search(
+            profile.tolist(), request.limit, scalar_filter=scalar_filter, output_fields=RECOMMEND_FIELDS,
+            timeout=remaining(),
+        )
+    return [
+        {"path": h["path"], "filename": h["filename"], "date": format_date(h["date"]), "score": h["score"]}
+        for h in hits
+    ]
+
+@app.post("/recommend/")
+async def recommend_api(request: RecommendRequest, http_request: Request):
+    if len(request.liked) + len(request.disliked) > MAX_DOC_EMBEDDINGS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_DOC_EMBEDDINGS} liked and disliked paths")
+    if not 0 < request.limit <= MAX_SEARCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_SEARCH_LIMIT}")
+
+    async def work():
+        async with admission.admit():
+            return await run_blocking(run_recommend, request)
+    results = await until_done(http_request, work(), "search")
+    return json_response({"results": results})
+
+# Warm-up: open the store (Milvus connect + load), then run each search type once so the
+# first real requests don't pay for segment loading and index caches. Gates /readyz.
+WARMUP_QUERIES = 3
+
+def warmup():
+    store = get_store()
+    rng = np.random.default_rng(0)
+    for _ in range(WARMUP_QUERIES):
+        dense = rng.standard_normal(DENSE_DIM).astype(np.float32)
+        dense = (dense / np.linalg.norm(dense)).tolist()
+        sparse = {int(t): 1.0 for t in rng.integers(1000, 30000, size=8)}
+        store.dense_search(dense, 10, output_fields=store_output_fields(store, OUTPUT_FIELDS))
+        store.sparse_search(sparse, 10, output_fields=store_output_fields(store, OUTPUT_FIELDS))
+        store.hybrid_search(dense, sparse, 1.0, 1.0, 10, output_fields=store_output_fields(store, OUTPUT_FIELDS))
+
+lifecycle = install_lifecycle(app, "search", warmup)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,93 @@
+# chunk_store.py
+# 本地 chunk 原文存储：追加写、每条记录单独 zstd 压缩、读取时通过 mmap 直接解压，
+# Milvus 中只保存记录的 (text_offset, text_size)。
+
+import os
+import mmap
+import threading
+
+try:
+    import zstandard
+except ImportError:  # 仅在启用 chunk store 时需要
+    zstandard = None
+
+
+class ChunkStore:
+    def __init__(self, path: str, level: int = 3):
+        if zstandard is None:
+            raise RuntimeError("chunk store 需要安装 zstandard：pip install zstandard")
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        open(path, "ab").close()
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writer = None
+        self._mm = None
+
+    # -----------------------------------------------------------------
+    # 写入（入库进程）
+    # -----------------------------------------------------------------
+    def append(self, text: str) -> tuple:
+        """追加一条 chunk 原文，返回 (offset, size)。"""
+        with self._lock:
+            data = self._compressor.compress(text.encode("utf-8"))
+            if self._writer is None:
+                self._writer = open(self.path, "ab")
+            offset = self._writer.seek(0, os.SEEK_END)
+            self._writer.write(data)
+        return offset, len(data)
+
+    def flush(self):
+        with self._lock:
+            if self._writer is not None:
+                self._writer.flush()
+                os.fsync(self._writer.fileno())
+
+    def close(self):
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            self._mm = None
+
+    # -----------------------------------------------------------------
+    # 读取（检索服务）
+    # -----------------------------------------------------------------
+    def _mapping(self, end: int):
+        mm = self._mm
+        if mm is None or len(mm) < end:
+            # 文件只会追加，映射不足时重新映射整个文件；旧映射由仍在使用的 memoryview 持有至释放
+            with self._lock:
+                if self._mm is None or len(self._mm) < end:
+                    if os.path.getsize(self.path) == 0:
+                        # 尚未写入任何记录（mmap 不能映射空文件），按空存储处理，写入后再映射
+                        mm = b""
+                    else:
+                        with open(self.path, "rb") as f:
+                            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                        mm = self._mm
+                else:
+                    mm = self._mm
+            if len(mm) < end:
+                raise ValueError(f"chunk record [{end}) 超出 {self.path} 的长度 {len(mm)}")
+        return mm
+
+    def _decompressor(self):
+        # ZstdDecompressor 不能被多个线程同时使用
+        d = getattr(self._local, "decompressor", None)
+        if d is None:
+            d = self._local.decompressor = zstandard.ZstdDecompressor()
+        return d
+
+    def read(self, offset: int, size: int) -> str:
+        if size == 0:
+            return ""
+        view = memoryview(self._mapping(offset + size))[offset:offset + size]
+        try:
+            return self._decompressor().decompress(view).decode("utf-8")
+        finally:
+            view.release()
+
+    def read_many(self, locations: list) -> list:
+        return [self.read(offset, size) for offset, size in locations]
@@ -0,0 +1,118 @@
+# context_viewer.py
+# 检索界面的原文查看：通过检索服务的 /context/ 只读取命中 chunk 附近的一段原文（按字节偏移 seek），
+# 点击“加载更多”时向前/向后扩展窗口，不再把整篇文档渲染到页面。
+# 没有偏移信息的结果（旧 collection）退回显示整篇原文。
+# 结果摘要由检索服务生成（snippets=True），界面只按返回的高亮区间渲染，不再请求和扫描整段 chunk 原文。
+#
+# 用法：
+#   payload = {..., "fields": RESULT_FIELDS, "snippets": True}
+#   st.markdown(snippet_html(doc["snippet"]), unsafe_allow_html=True)
+#   render_context(api_url, doc, key, load_file)   # doc 为检索结果，key 在页面内唯一
+#   # 或在工作线程中预先读取（见 fetch_pool.py），再渲染；load_file 在工作线程中执行，
+#   # 应在脚本线程中先取得共享缓存再传入其方法（如 shared_cache().read_file），不能调用 st.*：
+#   ctx = load_context(api_url, doc, context_window(key), load_file)
+#   render_context(api_url, doc, key, load_file, ctx=ctx)
+
+import html
+import os
+
+import requests
+import streamlit as st
+
+from milvus_ingest import OFFSET_FIELDS
+
+# 初始窗口在命中位置前后各取的字节数，以及每次“加载更多”扩展的字节数
+CONTEXT_BYTES = 1000
+CONTEXT_STEP = 4000
+# 与检索服务的 MAX_CONTEXT_BYTES 一致
+MAX_CONTEXT_BYTES = 256 * 1024
+# 检索结果需要的字段：摘要单独返回，不取 chunk 原文
+RESULT_FIELDS = ["filename", "path", "date", *OFFSET_FIELDS]
+
+
+def snippet_html(snippet: dict) -> str:
+    """按高亮区间拼接 HTML，原文部分转义。"""
+    text, parts, pos = snippet["text"], [], 0
+    for start, end in snippet["highlights"]:
+        parts.append(html.escape(text[pos:start]))
+        parts.append(f"<span style='color:red'>{html.escape(text[start:end])}</span>")
+        pos = end
+    parts.append(html.escape(text[pos:]))
+    prefix = "…" if snippet["start"] > 0 else ""
+    return prefix + "".join(parts).replace("\n", "<br>")
+
+
+def fetch_context(api_url: str, doc: dict, before: int, after: int) -> dict:
+    payload = {
+        "path": doc["path"],
+        "byte_start": doc["byte_start"],
+        "byte_end": doc["byte_end"],
+        "before": before,
+        "after": after,
+    }
+    resp = requests.post(f"{api_url}/context/", json=payload, timeout=10)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def context_window(key: str) -> dict:
+    """本条结果当前的窗口大小 {"before", "after"}，保存在 session_state 中（主线程调用）。"""
+    state_key = f"context_{key}"
+    if state_key not in st.session_state:
+        st.session_state[state_key] = {"before": CONTEXT_BYTES, "after": CONTEXT_BYTES}
+    return st.session_state[state_key]
+
+
+def load_context(api_url: str, doc: dict, window: dict, load_file=None) -> dict:
+    """
+    读取要显示的原文，不调用 st.*，可在工作线程中执行。
+    有偏移时返回 /context/ 的结果；旧 collection 返回 {"full_text": 整篇原文}（文件不存在时为 None），
+    未提供 load_file 时为空。
+    """
+    if doc.get("byte_start", -1) >= 0:
+        return fetch_context(api_url, doc, window["before"], window["after"])
+    if load_file is None:
+        return {}
+    return {"full_text": load_file(doc["path"]) if os.path.isfile(doc["path"]) else None}
+
+
+def _grow(state_key: str, side: str, hit_bytes: int):
+    window = st.session_state[state_key]
+    other = window["after" if side == "before" else "before"]
+    window[side] = min(window[side] + CONTEXT_STEP, MAX_CONTEXT_BYTES - hit_bytes - other)
+
+
+def render_context(api_url: str, doc: dict, key: str, load_file=None, ctx: dict = None, error: Exception = None):
+    """ctx / error 为 load_context 预先读取的结果或异常；都为 None 时在此同步读取。"""
+    window = context_window(key)
+    if ctx is None and error is None:
+        try:
+            ctx = load_context(api_url, doc, window, load_file)
+        except Exception as e:
+            error = e
+    if error is not None:
+        st.warning(f"读取原文片段失败：{error}")
+        return
+    if not ctx:
+        return
+    if "full_text" in ctx:
+        # 旧 collection 没有偏移字段
+        if ctx["full_text"] is None:
+            st.warning("原文文件不存在或路径无效")
+        else:
+            st.text_area("原文内容", ctx["full_text"], height=300, key=f"full_{key}")
+        return
+
+    state_key = f"context_{key}"
+    hit_bytes = doc["byte_end"] - doc["byte_start"]
+    if ctx["has_before"]:
+        st.button("⬆ 加载更多（前文）", key=f"more_before_{key}", on_click=_grow,
+                  args=(state_key, "before", hit_bytes))
+    # key 随窗口变化，窗口扩展后重新创建控件以显示新内容
+    st.text_area(
+        "原文片段", ctx["text"], height=300, key=f"text_{key}_{window['before']}_{window['after']}"
+    )
+    if ctx["has_after"]:
+        st.button("⬇ 加载更多（后文）", key=f"more_after_{key}", on_click=_grow,
+                  args=(state_key, "after", hit_bytes))
+    st.caption(f"字节 {ctx['byte_start']}–{ctx['byte_end']} / {ctx['file_size']}")
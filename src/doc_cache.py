@@ -0,0 +1,168 @@
+# doc_cache.py
+# Streamlit 界面的进程级共享缓存（通过 st.cache_resource 在所有会话间共享一份）：
+#   - 文档向量：固定容量的连续 float32 矩阵，写入时 L2 归一化，按 LRU 复用行，不随会话数复制；
+#     本地推荐打分为一次矩阵-向量乘积（top_k）；
+#   - 原文：每个文件只保存一份字符串，按总字节数 LRU 淘汰（st.cache_data 每次调用都会反序列化出一份副本）。
+# 条目记录入库清单（corpus.jsonl）中文件的 md5，清单变化后 md5 不一致的条目失效；
+# 不在清单中的文件以 (mtime, size) 代替 md5。
+#
+# 用法：
+#   @st.cache_resource
+#   def shared_cache(): return DocCache()
+#   cache.get_embeddings(paths) / cache.put_embeddings({path: vec}) / cache.read_file(path)
+#   cache.top_k(liked, candidates, 5, exclude=...)   # 直接在共享矩阵的行上打分，会话只需保存候选 path
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from milvus_ingest import METADATA_PATH
+
+MAX_CACHED_EMBEDDINGS = 20000  # 约 80MB（dim 1024）
+MAX_CACHED_FILE_BYTES = 256 * 1024 * 1024
+
+
+class DocCache:
+    def __init__(self, dim: int = 1024, max_embeddings: int = MAX_CACHED_EMBEDDINGS,
+                 max_file_bytes: int = MAX_CACHED_FILE_BYTES, manifest_path: str = METADATA_PATH):
+        self.dim = dim
+        self.max_file_bytes = max_file_bytes
+        self.manifest_path = manifest_path
+        # Streamlit 的每个会话在各自的线程中运行脚本
+        self._lock = threading.Lock()
+        self._matrix = np.zeros((max_embeddings, dim), dtype=np.float32)
+        self._rows: "OrderedDict[str, tuple]" = OrderedDict()  # path -> (version, row)
+        self._free = list(range(max_embeddings - 1, -1, -1))  # 从小到大分配，已用行集中在矩阵前部
+        self._used = 0  # 曾分配过的最大行号 + 1，打分只乘这一前缀
+        self._files: "OrderedDict[str, tuple]" = OrderedDict()  # path -> (version, text, utf-8 size)
+        self._file_bytes = 0
+        self._manifest_mtime = None
+        self._md5: Dict[str, str] = {}
+
+    # ---------------- 失效 ----------------
+    def _refresh_manifest(self):
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._manifest_mtime:
+            return
+        self._manifest_mtime = mtime
+        self._md5 = {}
+        if mtime is None:
+            return
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self._md5[entry.get("path")] = entry.get("md5")
+
+    def _version(self, path: str) -> Optional[str]:
+        md5 = self._md5.get(path)
+        if md5:
+            return md5
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return f"{st.st_mtime_ns}:{st.st_size}"
+
+    # ---------------- 文档向量 ----------------
+    def _valid_rows(self, paths: Iterable[str]) -> Tuple[List[str], List[int]]:
+        # 调用方持有锁；失效的条目释放其行，命中的条目更新 LRU 顺序
+        self._refresh_manifest()
+        found, rows = [], []
+        for p in dict.fromkeys(paths):
+            entry = self._rows.get(p)
+            if entry is None:
+                continue
+            if entry[0] != self._version(p):
+                self._free.append(self._rows.pop(p)[1])
+                continue
+            self._rows.move_to_end(p)
+            found.append(p)
+            rows.append(entry[1])
+        return found, rows
+
+    def get_embeddings(self, paths: List[str]) -> Dict[str, np.ndarray]:
+        """已缓存且未失效的向量（归一化后的副本），缺失的路径不在结果中。"""
+        with self._lock:
+            found, rows = self._valid_rows(paths)
+            return {p: self._matrix[r].copy() for p, r in zip(found, rows)}
+
+    def missing(self, paths: List[str]) -> List[str]:
+        """没有有效向量（未获取、已淘汰或已失效）的路径，保持顺序、去重。"""
+        with self._lock:
+            found, _ = self._valid_rows(paths)
+        found = set(found)
+        return [p for p in dict.fromkeys(paths) if p not in found]
+
+    def top_k(self, liked: Iterable[str], candidates: Iterable[str], k: int,
+              exclude: Iterable[str] = ()) -> List[Tuple[str, float]]:
+        """
+        以 liked 归一化向量的均值为画像，在 candidates（排除 exclude）中按余弦相似度取 top-k，按得分降序。
+        只使用共享矩阵中仍有效的行，已淘汰的文档不参与；liked 都不在缓存中时返回空列表。
+        """
+        exclude = set(exclude)
+        with self._lock:
+            _, liked_rows = self._valid_rows(liked)
+            paths, rows = self._valid_rows(p for p in candidates if p not in exclude)
+            if not liked_rows or not paths or k <= 0:
+                return []
+            q = self._matrix[liked_rows].mean(axis=0)
+            norm = float(np.linalg.norm(q))
+            if norm == 0:
+                return []
+            # 行已归一化：对已用前缀做一次矩阵-向量乘积即为余弦相似度；持有锁，避免行被其他会话复用
+            scores = (self._matrix[:self._used] @ (q / norm))[rows]
+        k = min(k, len(paths))
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(paths) else np.arange(len(paths))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(paths[i], float(scores[i])) for i in top]
+
+    def put_embeddings(self, vectors: Dict[str, list]):
+        with self._lock:
+            self._refresh_manifest()
+            for p, vec in vectors.items():
+                if p in self._rows:
+                    row = self._rows.pop(p)[1]
+                elif self._free:
+                    row = self._free.pop()
+                else:
+                    _, (_, row) = self._rows.popitem(last=False)  # 最久未使用
+                vec = np.asarray(vec, dtype=np.float32)
+                norm = float(np.linalg.norm(vec))
+                self._matrix[row] = vec / norm if norm > 0 else vec
+                self._used = max(self._used, row + 1)
+                self._rows[p] = (self._version(p), row)
+
+    # ---------------- 原文 ----------------
+    def read_file(self, path: str) -> str:
+        with self._lock:
+            self._refresh_manifest()
+            version = self._version(path)
+            entry = self._files.get(path)
+            if entry is not None and entry[0] == version:
+                self._files.move_to_end(path)
+                return entry[1]
+        # 读文件不持有锁，其他会话的命中不受影响
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        size = len(text.encode("utf-8"))
+        with self._lock:
+            old = self._files.pop(path, None)
+            if old is not None:
+                self._file_bytes -= old[2]
+            if size <= self.max_file_bytes:
+                self._files[path] = (version, text, size)
+                self._file_bytes += size
+                while self._file_bytes > self.max_file_bytes:
+                    _, (_, _, evicted) = self._files.popitem(last=False)
+                    self._file_bytes -= evicted
+        return text
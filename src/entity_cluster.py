@@ -0,0 +1,108 @@
+# entity_cluster.py
+# 实体消歧的聚类：DBSCAN(metric="precomputed") 的输入由稠密 n×n 余弦距离矩阵（50k 实体约 20GB float64）
+# 换成只保存 eps 邻居的稀疏半径图。向量 L2 归一化为 float32 后按行分块做矩阵乘法（精确，非近似），
+# 每块只保留余弦距离 <= eps 的邻居，内存约为 O(n·k)（k 为平均邻居数）加一个分块的 block × n 相似度矩阵。
+# DBSCAN 对稀疏预计算距离只把存储的元素视为邻居，结果与稠密距离矩阵一致
+# （float32 计算，恰好落在 eps 边界上、相差 1e-6 量级的点对可能与 float64 的判定不同）。
+#
+# 合并（merge_clusters）按标签分组用 argsort / bincount，不再对每个标签扫描全部标签、逐个 list.index 查位置，
+# 各组坐标均值为一次分段求和（np.add.reduceat），属性在一遍遍历中合并，整体 O(n log n)。
+#
+# 用法：
+#   labels = cluster_entities(embeddings, eps=0.1, min_samples=2)   # -1 为噪声点，与 DBSCAN.fit_predict 相同
+#   merged, centroids = merge_clusters(entity_ids, entities, labels, emb_2d)
+
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+from scipy import sparse
+from sklearn.cluster import DBSCAN
+
+# 每个分块相似度矩阵的内存上限
+BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def normalize_rows(embeddings) -> np.ndarray:
+    x = np.ascontiguousarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.where(norms > 0, norms, 1.0)
+
+
+def radius_graph(embeddings, eps: float, block_bytes: int = BLOCK_BYTES) -> sparse.csr_matrix:
+    """余弦距离 <= eps 的邻居图（含自身），值为距离；距离为 0 的邻居以显式 0 保存。"""
+    x = normalize_rows(embeddings)
+    n = len(x)
+    block = max(1, block_bytes // max(1, n * x.itemsize))
+    indptr = [np.zeros(1, dtype=np.int64)]
+    indices, data = [], []
+    nnz = 0
+    for start in range(0, n, block):
+        # 与 sklearn 的 cosine_distances 一致：1 - cos，截断到 [0, 2]
+        dist = 1.0 - x[start:start + block] @ x.T
+        np.clip(dist, 0.0, 2.0, out=dist)
+        rows, cols = np.nonzero(dist <= eps)  # 按行、列有序
+        indices.append(cols.astype(np.int32))
+        data.append(dist[rows, cols])
+        counts = np.bincount(rows, minlength=len(dist))
+        indptr.append(nnz + np.cumsum(counts))
+        nnz += len(cols)
+    graph = sparse.csr_matrix(
+        (np.concatenate(data) if data else np.zeros(0, dtype=np.float32),
+         np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32),
+         np.concatenate(indptr)),
+        shape=(n, n),
+    )
+    graph.setdiag(0.0)  # 自身距离按 0 计（float32 误差下可能为 1e-7）
+    return graph
+
+
+def cluster_entities(embeddings, eps: float, min_samples: int = 2, block_bytes: int = BLOCK_BYTES) -> np.ndarray:
+    """与 DBSCAN(eps, min_samples, metric="precomputed").fit_predict(cosine_distances(embeddings)) 的标签一致。"""
+    if len(embeddings) == 0:
+        return np.zeros(0, dtype=np.int64)
+    graph = radius_graph(embeddings, eps, block_bytes)
+    return DBSCAN(eps=eps, min_samples=min_samples, metric="precomputed").fit_predict(graph)
+
+
+def group_order(labels) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    合并后的分组：非噪声簇按标签升序，其后每个噪声点各自一组（按输入顺序）。
+    返回 (order, bounds)：第 g 组的成员下标为 order[bounds[g]:bounds[g + 1]]，组内保持输入顺序。
+    """
+    labels = np.asarray(labels)
+    noise = labels < 0
+    group = np.empty(len(labels), dtype=np.int64)
+    _, group[~noise] = np.unique(labels[~noise], return_inverse=True)
+    n_clusters = int(group[~noise].max()) + 1 if (~noise).any() else 0
+    group[noise] = n_clusters + np.arange(int(noise.sum()))
+    order = np.argsort(group, kind="stable")
+    counts = np.bincount(group, minlength=n_clusters + int(noise.sum()))
+    return order, np.concatenate([[0], np.cumsum(counts)])
+
+
+def iter_merged(entity_ids: List, entities: Dict, order: np.ndarray, bounds: np.ndarray) -> Iterator[dict]:
+    """
+    按 group_order 的分组依次产出合并后的实体：name / type 取第一个成员，attributes 按成员顺序依次覆盖，
+    cluster 为成员 id 列表。逐组产出，可边合并边写出。
+    """
+    sorted_ids = [entity_ids[i] for i in order.tolist()]
+    for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        members = sorted_ids[start:end]
+        main = entities[members[0]]
+        attrs = {}
+        for eid in members:
+            attrs.update(entities[eid].get("attributes", {}))
+        yield {"name": main["name"], "type": main["type"], "attributes": attrs, "cluster": members}
+
+
+def merge_clusters(entity_ids: List, entities: Dict, labels, points) -> Tuple[Dict[int, dict], np.ndarray]:
+    """
+    每组合并为一个实体（编号从 1 开始，见 iter_merged）；centroids[g] 为第 g 组成员在 points（如 PCA 二维坐标）中的均值。
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if len(entity_ids) == 0:
+        return {}, np.zeros((0,) + points.shape[1:])
+    order, bounds = group_order(labels)
+    centroids = np.add.reduceat(points[order], bounds[:-1], axis=0) / np.diff(bounds)[:, None]
+    merged = dict(enumerate(iter_merged(entity_ids, entities, order, bounds), start=1))
+    return merged, centroids
@@ -0,0 +1,260 @@
+# entity_resolve.py
+# 无界面的批量实体消歧：流式读取实体 → 按大批调用 embedding 服务 → 聚类（entity_cluster）→ 逐组写出合并结果（JSONL）。
+# Streamlit 页面（streamlit_entity_cluster.py）复用这里的函数，只负责输入、参数与可视化。
+#
+# 输入（按扩展名区分）：
+#   - .json：与 data_entity/entities_input.json 相同的 {"id": {name, type, attributes, ...}, ...}，
+#     按块增量解析，不一次性读入整个文件；
+#   - .jsonl / .ndjson：每行一个实体，{"id": 1, "name": ...} 或 {"1": {"name": ...}}。
+# 输出：每行一个合并后的实体 {"id", "name", "type", "attributes", "cluster"}，编号与页面一致（簇在前，噪声点在后）。
+# 进度与各阶段耗时写入日志（logs/entity_resolve.log，同时输出到终端）。
+#
+# 用法：
+#   python src/entity_resolve.py data_entity/entities_input.json -o data_entity/entities_output.jsonl --eps 0.1 --min-samples 2
+
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+import numpy as np
+import requests
+
+from entity_cluster import cluster_entities, group_order, iter_merged
+from log_setup import setup_logging
+from metrics import StageTimer
+from milvus_ingest import BASE_EMBEDDING_URL
+
+logger = logging.getLogger("entity_resolve")
+
+# 每次请求 embedding 服务的实体数（服务端按 GPU 批次再拆分）
+EMBED_BATCH_SIZE = 256
+# 每读取 / 写出多少个实体记录一次进度
+PROGRESS_EVERY = 10000
+READ_CHUNK_CHARS = 1 << 20
+# BGE-M3 稠密向量维度（没有实体时返回的空矩阵也保持该列数）
+EMBEDDING_DIM = 1024
+
+
+# ---------------------------------------------------------------------
+# 输入
+# ---------------------------------------------------------------------
+def entity_id(key):
+    # 页面与样例数据中的 id 为数字字符串
+    return int(key) if isinstance(key, str) and key.isdigit() else key
+
+
+def _iter_json_object(f: TextIO, chunk_chars: int = READ_CHUNK_CHARS) -> Iterator[Tuple[str, dict]]:
+    """增量解析顶层 JSON 对象，逐个产出 (key, value)，内存中只保留未解析完的部分。"""
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+
+    def fill():
+        nonlocal buf, pos, eof
+        more = f.read(chunk_chars)
+        eof = not more
+        buf, pos = buf[pos:] + more, 0
+
+    def peek() -> str:
+        # 跳过空白，返回下一个字符（文件结束时为 ""），块边界处继续读入
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos].isspace():
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if eof:
+                return ""
+            fill()
+
+    def expect(chars: str) -> str:
+        # 下一个非空白字符必须是 chars 之一，且只消耗这一个字符
+        nonlocal pos
+        c = peek()
+        if not c or c not in chars:
+            raise json.JSONDecodeError(f"Expecting one of {chars!r}", buf, pos)
+        pos += 1
+        return c
+
+    def decode():
+        # 解析 buf[pos:] 开头的一个完整 JSON 值，数据不够时继续读入
+        nonlocal pos
+        while True:
+            peek()
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # 数字等标量可能恰好被块边界截断，未到文件末尾时要求其后还有字符
+                if end < len(buf) or eof:
+                    pos = end
+                    return value
+            fill()
+
+    if peek() != "{":
+        raise ValueError("输入应为 JSON 对象 {id: entity, ...}")
+    expect("{")
+    if peek() == "}":
+        return
+    while True:
+        if peek() != '"':
+            raise json.JSONDecodeError("Expecting property name enclosed in double quotes", buf, pos)
+        key = decode()
+        expect(":")
+        yield key, decode()
+        if expect(",}") == "}":
+            return
+
+
+def iter_entities(path: str) -> Iterator[Tuple[object, dict]]:
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line in f:
+                if not line.strip():
+                    continue
+                obj = json.loads(line)
+                if "id" in obj:
+                    eid = obj.pop("id")
+                    yield entity_id(eid), obj
+                else:
+                    (eid, info), = obj.items()
+                    yield entity_id(eid), info
+        else:
+            for eid, info in _iter_json_object(f):
+                yield entity_id(eid), info
+
+
+def entity_text(info: dict) -> str:
+    attrs = "; ".join([f"{k}:{v}" for k, v in info.get("attributes", {}).items()])
+    return f"Name: {info.get('name', '')}; Type: {info.get('type', '')}; Attributes: {attrs}"
+
+
+# ---------------------------------------------------------------------
+# 向量
+# ---------------------------------------------------------------------
+def embed_texts(texts: List[str], url: str = BASE_EMBEDDING_URL, batch_size: int = EMBED_BATCH_SIZE,
+                session: Optional[requests.Session] = None) -> np.ndarray:
+    if not texts:
+        return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+    http = session or requests
+    vectors = []
+    for i in range(0, len(texts), batch_size):
+        resp = http.post(f"{url}/embed_batch_dense", json={"texts": texts[i:i + batch_size]}, timeout=120)
+        resp.raise_for_status()
+        vectors.extend(resp.json()["dense_vectors"])
+    return np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+
+
+def load_and_embed(path: str, url: str = BASE_EMBEDDING_URL, batch_size: int = EMBED_BATCH_SIZE,
+                   timer: Optional[StageTimer] = None) -> Tuple[List, Dict, np.ndarray]:
+    """边读边按批编码，返回 (entity_ids, entities, embeddings)；向量写入按需扩容的 float32 矩阵。"""
+    timer = timer or StageTimer("entity_resolve", "cli")
+    entity_ids, entities = [], {}
+    embeddings = np.zeros((0, 0), dtype=np.float32)
+    pending: List[str] = []
+    count = 0
+    session = requests.Session()
+
+    def flush():
+        nonlocal embeddings
+        with timer.stage("embed"):
+            vecs = embed_texts(pending, url, batch_size, session)
+        if count > len(embeddings):
+            grown = np.zeros((max(count, 2 * len(embeddings)), vecs.shape[1]), dtype=np.float32)
+            if len(embeddings):
+                grown[:len(embeddings)] = embeddings
+            embeddings = grown
+        embeddings[count - len(pending):count] = vecs
+        pending.clear()
+
+    it = iter_entities(path)
+    while True:
+        with timer.stage("read"):
+            item = next(it, None)
+        if item is None:
+            break
+        eid, info = item
+        if eid in entities:
+            raise ValueError(f"实体 id 重复：{eid}")
+        entity_ids.append(eid)
+        entities[eid] = info
+        pending.append(entity_text(info))
+        count += 1
+        if len(pending) >= batch_size:
+            flush()
+        if count % PROGRESS_EVERY == 0:
+            logger.info("Read and embedded %d entities...", count)
+    if pending:
+        flush()
+    return entity_ids, entities, embeddings[:count]
+
+
+# ---------------------------------------------------------------------
+# 聚类与输出
+# ---------------------------------------------------------------------
+def resolve(entity_ids: List, entities: Dict, embeddings: np.ndarray, eps: float, min_samples: int,
+            timer: Optional[StageTimer] = None) -> Tuple[np.ndarray, Iterator[dict]]:
+    """返回 (labels, 合并后实体的迭代器)；实体编号从 1 开始，簇在前、噪声点在后。"""
+    timer = timer or StageTimer("entity_resolve", "cli")
+    with timer.stage("cluster"):
+        labels = cluster_entities(embeddings, eps=eps, min_samples=min_samples)
+    if len(entity_ids) == 0:
+        return labels, iter(())
+    order, bounds = group_order(labels)
+    return labels, iter_merged(entity_ids, entities, order, bounds)
+
+
+def write_jsonl(path: str, merged: Iterator[dict], timer: Optional[StageTimer] = None) -> int:
+    """逐组写出；先写临时文件，完成后替换，中断时不留下半个输出文件。"""
+    timer = timer or StageTimer("entity_resolve", "cli")
+    tmp = f"{path}.tmp"
+    count = 0
+    with open(tmp, "w", encoding="utf-8") as f:
+        it = iter(merged)
+        while True:
+            with timer.stage("merge"):
+                entity = next(it, None)
+            if entity is None:
+                break
+            count += 1
+            with timer.stage("write"):
+                f.write(json.dumps({"id": count, **entity}, ensure_ascii=False) + "\n")
+            if count % PROGRESS_EVERY == 0:
+                logger.info("Wrote %d merged entities...", count)
+    os.replace(tmp, path)
+    return count
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Batch entity disambiguation: stream, embed, cluster, merge")
+    parser.add_argument("input", help="实体 JSON（{id: entity}）或 JSONL 文件")
+    parser.add_argument("-o", "--output", required=True, help="合并结果 JSONL")
+    parser.add_argument("--eps", type=float, default=0.1, help="DBSCAN eps（余弦距离）")
+    parser.add_argument("--min-samples", type=int, default=2)
+    parser.add_argument("--embedding-url", default=BASE_EMBEDDING_URL)
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    # 命令行运行，进度同时输出到终端
+    setup_logging("entity_resolve", "entity_resolve", console=True)
+    timer = StageTimer("entity_resolve", "cli")
+    logger.info("Reading %s...", args.input)
+    entity_ids, entities, embeddings = load_and_embed(args.input, args.embedding_url, args.batch_size, timer)
+    logger.info("Embedded %d entities. Clustering (eps=%s, min_samples=%d)...",
+                len(entity_ids), args.eps, args.min_samples)
+    labels, merged = resolve(entity_ids, entities, embeddings, args.eps, args.min_samples, timer)
+    written = write_jsonl(args.output, merged, timer)
+    timer.total = time.perf_counter() - timer.start
+    logger.info("Merged %d entities into %d (%d clusters, %d noise). Output: %s",
+                len(entity_ids), written, int(labels.max()) + 1 if len(labels) else 0, int((labels < 0).sum()),
+                args.output,
+                extra={"fields": {**timer.log_fields(), "entities": len(entity_ids), "merged": written}})
+    logger.info("Stage timings: %s", ", ".join(f"{k}={v:.2f}s" for k, v in timer.stages.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# fetch_pool.py
+# Streamlit 界面中每条检索结果的附加数据（原文窗口、文档向量等）并发获取：
+#   - 进程内共享一个有界线程池（通过 st.cache_resource 在所有会话间共享），合计并发不超过 MAX_FETCH_WORKERS，
+#     页面等待时间约为最慢一次请求，而不是所有请求之和；
+#   - 每次脚本运行对应一个 FetchBatch，页面先渲染结果骨架，再按完成顺序填充各条结果；
+#   - 新的检索（或任何重新运行）开始时取消上一批：尚未开始的任务直接取消，已在执行的任务结果被丢弃。
+# 任务在工作线程中执行，不能调用 st.*。
+#
+# 用法：
+#   @st.cache_resource
+#   def shared_pool(): return new_pool()
+#   batch = FetchBatch(shared_pool())
+#   batch.submit(key, fn, *args)
+#   for key, result, error in batch.as_completed(): ...
+#   batch.cancel()
+
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor, TimeoutError, as_completed
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+MAX_FETCH_WORKERS = 8
+# 整批等待的上限，超时的任务以 TimeoutError 返回
+FETCH_TIMEOUT = 15
+
+
+def new_pool(max_workers: int = MAX_FETCH_WORKERS) -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ui-fetch")
+
+
+class FetchBatch:
+    def __init__(self, pool: ThreadPoolExecutor):
+        self._pool = pool
+        self._cancelled = threading.Event()
+        self._futures = {}  # future -> key
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def submit(self, key: Any, fn: Callable, *args):
+        def run():
+            # 排队期间批次已被取消（共享线程池被其他会话占满时可能发生）
+            if self._cancelled.is_set():
+                raise CancelledError()
+            return fn(*args)
+
+        self._futures[self._pool.submit(run)] = key
+
+    def cancel(self):
+        self._cancelled.set()
+        for f in self._futures:
+            f.cancel()
+
+    def as_completed(self, timeout: Optional[float] = FETCH_TIMEOUT) -> Iterator[Tuple[Any, Any, Optional[Exception]]]:
+        """按完成顺序产出 (key, result, error)；已取消的任务不产出。"""
+        pending = dict(self._futures)
+        try:
+            for f in as_completed(list(pending), timeout=timeout):
+                key = pending.pop(f)
+                if f.cancelled() or self.cancelled:
+                    continue
+                error = f.exception()
+                if isinstance(error, CancelledError):
+                    continue
+                yield key, (None if error else f.result()), error
+        except TimeoutError:
+            for f, key in pending.items():
+                f.cancel()
+                yield key, None, TimeoutError(f"{timeout}s 内未完成")
@@ -0,0 +1,116 @@
+# lifecycle.py
+# 服务生命周期：进程启动后在后台执行预热（加载模型 / 打开 collection，并做几次推理或检索），
+# 预热完成前 /readyz 返回 503，/healthz 只表示进程存活。
+# 收到 SIGTERM 后先进入 draining：/readyz 返回 503 并继续正常处理请求 DRAIN_DELAY 秒，让负载均衡摘除本实例，
+# 之后才交给 uvicorn 停止监听并排空在途请求（见 serve.py）；draining 期间再次收到 SIGTERM 立即开始关闭。
+#
+# 就绪状态是每个 worker 进程各自的：多 worker 共享同一个端口时，/readyz 由接到连接的那个 worker 回答，
+# 返回 200 只说明该 worker 已预热（返回中带 pid），其余 worker 可能仍在预热。未预热的 worker 照常处理请求，
+# 只是首个请求较慢（加载模型 / 连接 Milvus），不会出错。
+#
+# 用法：
+#   install_lifecycle(app, "search", warmup)   # warmup 为阻塞函数，在线程池中执行，失败后重试
+
+import asyncio
+import logging
+import os
+import signal
+import threading
+import time
+from typing import Callable, Optional
+
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger("lifecycle")
+
+WARMUP_RETRY_INTERVAL = 2.0  # seconds
+# SIGTERM 后 /readyz 先返回 503 多久再开始关闭
+DRAIN_DELAY = float(os.getenv("DRAIN_DELAY", "5"))
+
+
+class Lifecycle:
+    def __init__(self, service: str):
+        self.service = service
+        self.ready = False
+        self.draining = False
+        self.last_error: Optional[str] = None
+        self.warmup_seconds: Optional[float] = None
+        self._task = None
+
+    def status(self) -> str:
+        if self.draining:
+            return "draining"
+        return "ready" if self.ready else "warming_up"
+
+    async def warm_up(self, warmup: Callable[[], None]):
+        t0 = time.perf_counter()
+        attempt = 0
+        while not self.draining:
+            attempt += 1
+            try:
+                await run_in_threadpool(warmup)
+            except Exception as e:  # 依赖（如 Milvus）尚未就绪时重试
+                self.last_error = repr(e)
+                logger.warning("%s warm-up attempt %d failed: %r", self.service, attempt, e)
+                await asyncio.sleep(WARMUP_RETRY_INTERVAL)
+                continue
+            self.warmup_seconds = time.perf_counter() - t0
+            self.last_error = None
+            self.ready = True
+            logger.info("%s ready after %.2fs warm-up", self.service, self.warmup_seconds)
+            return
+
+
+def install_drain_signal(state: Lifecycle, delay: float = DRAIN_DELAY):
+    """
+    在 uvicorn 的 SIGTERM 处理函数之前插入一步：先标记 draining，delay 秒后再调用原处理函数开始关闭。
+    需在 uvicorn 安装信号处理之后调用（lifespan startup 时已安装），且只能在主线程中设置信号处理。
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    previous = signal.getsignal(signal.SIGTERM)
+    if not callable(previous):
+        return
+    loop = asyncio.get_running_loop()
+
+    def on_sigterm(signum, frame):
+        if state.draining:
+            previous(signum, frame)
+            return
+        state.draining = True
+        logger.info("%s draining: /readyz returns 503, shutting down in %.1fs", state.service, delay)
+        loop.call_soon_threadsafe(loop.call_later, delay, previous, signum, frame)
+
+    signal.signal(signal.SIGTERM, on_sigterm)
+
+
+def install_lifecycle(app: FastAPI, service: str, warmup: Callable[[], None]) -> Lifecycle:
+    state = Lifecycle(service)
+
+    @app.on_event("startup")
+    async def start_warmup():
+        # 不阻塞启动：服务先开始监听，/healthz 可用，预热完成后 /readyz 才返回 200
+        state._task = asyncio.ensure_future(state.warm_up(warmup))
+        install_drain_signal(state)
+
+    @app.on_event("shutdown")
+    async def start_draining():
+        state.draining = True
+        if state._task is not None and not state._task.done():
+            state._task.cancel()
+
+    @app.get("/healthz")
+    def healthz():
+        return {"status": "ok"}
+
+    @app.get("/readyz")
+    def readyz():
+        # 就绪状态按 worker 进程区分，见文件头
+        payload = {"status": state.status(), "warmup_seconds": state.warmup_seconds, "pid": os.getpid()}
+        if state.last_error:
+            payload["last_error"] = state.last_error
+        return JSONResponse(payload, status_code=200 if state.status() == "ready" else 503)
+
+    return state
@@ -0,0 +1,177 @@
+# log_setup.py
+# 进程内日志：调用方线程只把记录放入有界队列（满时丢弃并计数，不阻塞请求），
+# 后台 QueueListener 线程格式化为带时间戳的 JSON 行，写入 logs/ 下按大小轮转的文件。
+# 每个请求的 timing 日志和 uvicorn 访问日志按比例采样，错误和慢请求总是保留。
+#
+# 用法：
+#   setup_logging("search", "api_search_milvus")    # 服务启动时（每个 worker 进程内）调用一次，写 logs/api_search_milvus.log
+#   logger.info("request", extra={"fields": {...}}) # fields 合并到 JSON 顶层
+
+import atexit
+import copy
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_MAX_BYTES = 50 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+LOG_QUEUE_SIZE = 10000
+# 访问日志采样率；状态码 >= 400 或耗时超过 ACCESS_LOG_SLOW_MS 的请求总是记录
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "0.1"))
+ACCESS_LOG_SLOW_MS = 1000.0
+ACCESS_LOGGERS = ("timing", "uvicorn.access")
+
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+
+    def format(self, record: logging.LogRecord) -> str:
+        ts = datetime.datetime.fromtimestamp(record.created).astimezone()
+        payload = {
+            "ts": ts.isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "service": self.service,
+            "pid": record.process,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            payload.update(fields)
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """队列满时丢弃记录而不是阻塞调用方，丢弃数量随下一条成功写入的记录输出。"""
+
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 在调用方线程中渲染消息和异常，保留 fields 等结构化属性，由监听线程统一格式化
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if self.dropped:
+            record.fields = {**(getattr(record, "fields", None) or {}), "log_dropped": self.dropped}
+            self.dropped = 0
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class AccessSampler(logging.Filter):
+    def __init__(self, rate: float, slow_ms: float):
+        super().__init__()
+        self.rate = rate
+        self.slow_ms = slow_ms
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.name not in ACCESS_LOGGERS:
+            return True
+        fields = getattr(record, "fields", None) or {}
+        status = fields.get("status")
+        if status is None and record.name == "uvicorn.access" and isinstance(record.args, tuple) and len(record.args) >= 5:
+            status = record.args[4]  # (client_addr, method, path, http_version, status_code)
+        if (status or 0) >= 400 or fields.get("total_ms", 0) >= self.slow_ms:
+            return True
+        if random.random() >= self.rate:
+            return False
+        record.fields = {**fields, "sample_rate": self.rate}
+        return True
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_slot_lock = None
+
+
+def _claim_slot(name: str) -> str:
+    """
+    多 worker 时每个进程占用编号最小的空闲槽位 i，写 {name}.{i}.log。槽位由 {name}.{i}.lock 上的文件锁标记，
+    进程退出（包括被杀死）时锁自动释放，重启的 worker 复用同一个文件，文件数不超过同时存活的进程数。
+    """
+    global _slot_lock
+    if fcntl is None:
+        return f"{name}.{os.getpid()}"
+    i = 0
+    while True:
+        f = open(os.path.join(LOG_DIR, f"{name}.{i}.lock"), "a")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            i += 1
+            continue
+        _slot_lock = f  # 保持打开直到进程退出
+        return f"{name}.{i}"
+
+
+def setup_logging(service: str, filename: Optional[str] = None, console: Optional[bool] = None,
+                  level: str = LOG_LEVEL, access_sample_rate: float = ACCESS_LOG_SAMPLE_RATE) -> logging.Logger:
+    """
+    为当前进程配置根日志器，重复调用无副作用。service 写入每行 JSON，与 metrics 中的服务名一致；
+    filename 为日志文件名（不含扩展名），默认同 service。多 worker 运行时（serve.py 设置 LOG_PER_PROCESS=1）
+    每个进程写各自的文件（按 worker 槽位编号，见 _claim_slot），避免多个进程轮转同一个文件。
+    console 默认仅在 stderr 为终端时输出。
+    """
+    global _listener
+    root = logging.getLogger()
+    if _listener is not None:
+        return root
+
+    os.makedirs(LOG_DIR, exist_ok=True)
+    name = filename or service
+    if os.getenv("LOG_PER_PROCESS") == "1":
+        name = _claim_slot(name)
+    file_handler = logging.handlers.RotatingFileHandler(
+        os.path.join(LOG_DIR, f"{name}.log"), maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT,
+        encoding="utf-8",
+    )
+    handlers = [file_handler]
+    if console if console is not None else sys.stderr.isatty():
+        handlers.append(logging.StreamHandler(sys.stderr))
+    formatter = JsonFormatter(service)
+    for h in handlers:
+        h.setFormatter(formatter)
+
+    queue_handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    queue_handler.addFilter(AccessSampler(access_sample_rate, ACCESS_LOG_SLOW_MS))
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    # uvicorn 的日志器默认自带 handler 且不向上传递，这里统一交给根日志器
+    for logger_name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        lg = logging.getLogger(logger_name)
+        lg.handlers = []
+        lg.propagate = True
+
+    _listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return root
@@ -0,0 +1,204 @@
+# metrics.py
+# 请求分阶段计时：Server-Timing 响应头、结构化 timing 日志，以及 /metrics 上的 Prometheus 文本格式直方图。
+#
+# 用法：
+#   instrument(app, "search")            # 为 FastAPI 应用挂载计时中间件和 /metrics
+#   with stage("milvus_search"): ...     # 在请求处理代码中标记阶段，无活动请求时为空操作
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger("timing")
+
+# Scrapes and health probes are frequent and uninteresting, keep them out of timings and logs
+UNTIMED_PATHS = ("/metrics", "/healthz", "/readyz")
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames: tuple, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            counts, total = self._series.get(labels, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self._series[labels] = (counts, total + value)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: (list(c), s) for k, (c, s) in self._series.items()}
+        for labels, (counts, total) in sorted(series.items()):
+            base = ",".join(f'{n}="{v}"' for n, v in zip(self.labelnames, labels))
+            sep = "," if base else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {total}")
+            lines.append(f"{self.name}_count{{{base}}} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        with self._lock:
+            return self._series.get(labels, 0)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            series = dict(self._series)
+        for labels, value in sorted(series.items()):
+            base = ",".join(f'{n}="{v}"' for n, v in zip(self.labelnames, labels))
+            lines.append(f"{self.name}{{{base}}} {value}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "request_duration_seconds", "End-to-end request latency", ("service", "endpoint", "status")
+)
+STAGE_SECONDS = Histogram(
+    "request_stage_duration_seconds", "Latency of one stage within a request", ("service", "endpoint", "stage")
+)
+SINGLEFLIGHT_REQUESTS = Counter(
+    "singleflight_requests_total",
+    "Requests passed through single-flight; role is leader (did the work) or coalesced (shared its result)",
+    ("service", "endpoint", "role"),
+)
+ADMISSION_EVENTS = Counter(
+    "admission_events_total",
+    "Requests shed (queue_full, queue_timeout), past their deadline (deadline_exceeded) or abandoned (client_disconnect)",
+    ("service", "event"),
+)
+REGISTRY = [REQUEST_SECONDS, STAGE_SECONDS, SINGLEFLIGHT_REQUESTS, ADMISSION_EVENTS]
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class StageTimer:
+    """Accumulates named stage durations for one request."""
+
+    def __init__(self, service: str, endpoint: str):
+        self.service = service
+        self.endpoint = endpoint
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.total = None
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - t0
+
+    def finish(self, status: int):
+        self.total = time.perf_counter() - self.start
+        REQUEST_SECONDS.observe(self.total, self.service, self.endpoint, str(status))
+        for name, seconds in self.stages.items():
+            STAGE_SECONDS.observe(seconds, self.service, self.endpoint, name)
+
+    def server_timing(self) -> str:
+        parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.stages.items()]
+        parts.append(f"total;dur={self.total * 1000:.2f}")
+        return ", ".join(parts)
+
+    def log_fields(self) -> dict:
+        return {
+            "service": self.service,
+            "endpoint": self.endpoint,
+            "total_ms": round(self.total * 1000, 2),
+            **{f"{name}_ms": round(seconds * 1000, 2) for name, seconds in self.stages.items()},
+        }
+
+
+_current_timer: ContextVar = ContextVar("stage_timer", default=None)
+
+
+@contextmanager
+def stage(name: str):
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+    with timer.stage(name):
+        yield
+
+
+class TimingMiddleware:
+    """
+    Pure ASGI middleware (unlike @app.middleware("http") it passes the client's
+    receive channel through untouched, so handlers can still see disconnects).
+    """
+
+    def __init__(self, app, service: str):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in UNTIMED_PATHS:
+            await self.app(scope, receive, send)
+            return
+        timer = StageTimer(self.service, scope["path"])
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timer.finish(status)
+                MutableHeaders(scope=message).append("Server-Timing", timer.server_timing())
+            await send(message)
+
+        token = _current_timer.set(timer)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_timer.reset(token)
+            if timer.total is None:  # no response was started (error or client gone)
+                timer.finish(status)
+            # log_setup.JsonFormatter merges fields into the JSON line and samples these records
+            logger.info("request", extra={"fields": {**timer.log_fields(), "status": status}})
+
+
+def instrument(app: FastAPI, service: str):
+    app.add_middleware(TimingMiddleware, service=service)
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    def metrics():
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
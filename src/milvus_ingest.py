@@ -1,16 +1,23 @@
+from __future__ import annotations
+
 import os
+import re
 import json
 import hashlib
+import logging
 import datetime
 import requests
-from pymilvus import (
-    connections,
-    utility,
-    FieldSchema,
-    CollectionSchema,
-    DataType,
-    Collection,
-)
+import numpy as np
+from chunk_store import ChunkStore
+from log_setup import setup_logging
+from typing import TYPE_CHECKING
+
+# pymilvus 导入较慢（约 0.35s），只在真正访问 Milvus 的函数中导入；
+# 检索服务只用到本模块的日期与 chunk store 配置，使用内存后端时完全不加载 pymilvus
+if TYPE_CHECKING:
+    from pymilvus import Collection, CollectionSchema
+
+logger = logging.getLogger("milvus_ingest")
 
 # ---------------------------------------------------------------------
 # 配置项
@@ -27,6 +34,38 @@ CHUNK_OVERLAP = 50
 COLLECTION_NAME = "hybrid_demo"
 MILVUS_URI = "http://localhost:19530"
 
+# 分区键设置：按文档族（文件名去掉序号）划分，带 doc_family 过滤的检索只扫描对应分区
+PARTITION_KEY_FIELD = "doc_family"
+NUM_PARTITIONS = 16
+
+# dense_vector 索引参数，可参考 bench/bench_index_sweep.py 的 recall/延迟结果调整，
+# 例如 {"index_type": "HNSW", "metric_type": "IP", "params": {"M": 16, "efConstruction": 200}}
+DENSE_INDEX_PARAMS = {"index_type": "AUTOINDEX", "metric_type": "IP"}
+
+# dense_vector 存储精度：FLOAT_VECTOR（4KB/条）或半精度 FLOAT16_VECTOR / BFLOAT16_VECTOR（2KB/条），
+# 半精度时入库与查询向量均在客户端转换，见 to_dense_payload
+DENSE_VECTOR_DTYPE = "FLOAT_VECTOR"
+DENSE_VECTOR_DTYPES = ("FLOAT_VECTOR", "FLOAT16_VECTOR", "BFLOAT16_VECTOR")
+
+# chunk 原文存储位置：为 None 时原文存于 Milvus 的 text 字段；设为文件路径（如 "./chunk_store/chunks.zst"）时，
+# 原文写入本地 zstd 压缩的 chunk store，Milvus 只保存向量、标量字段和 text_offset / text_size
+CHUNK_STORE_PATH = None
+CHUNK_STORE_FIELDS = ["text_offset", "text_size"]
+
+# chunk 在源文件中的位置：[char_start, char_end) 为字符偏移，[byte_start, byte_end) 为 UTF-8 字节偏移，
+# 检索服务的 /context/ 按字节 seek 读取命中位置附近的原文。源文件以 newline="" 读取，换行符不做转换，
+# 偏移与文件内容一一对应
+OFFSET_FIELDS = ["char_start", "char_end", "byte_start", "byte_end"]
+
+# chunk 的分词结果 {"ids": [token id...], "spans": [start0, end0, start1, end1, ...]}（相对 chunk 的字符偏移），
+# 由 embedding 服务的 /tokenize_batch 生成。检索服务按稀疏查询向量的 token 权重从中选出摘要与高亮区间（见 snippets.py），
+# 不必把整段原文返回给界面再做匹配
+TOKEN_MAP_FIELD = "token_map"
+
+# 文档级向量：每篇文档一行，主键为 path，dense_vector 为各 chunk 稠密向量按 chunk 长度加权的均值（再归一化），
+# 推荐界面通过检索服务的 /doc_embeddings/ 批量读取，无需再对整篇原文做 embedding
+DOC_COLLECTION_NAME = "documents"
+
 # ---------------------------------------------------------------------
 # 工具函数
 # ---------------------------------------------------------------------
@@ -58,8 +97,9 @@ def save_metadata(metadata: dict):
         p = e.get("path")
         if p in metadata:
             e.update({"md5": metadata[p]["md5"], "inserted": metadata[p]["inserted"]})
-            if "chunks" in metadata[p]:
-                e["chunks"] = metadata[p]["chunks"]
+            for key in ("chunks", "doc_vector"):
+                if key in metadata[p]:
+                    e[key] = metadata[p][key]
             seen.add(p)
         updated.append(e)
     for p, m in metadata.items():
@@ -78,12 +118,54 @@ def file_md5(path: str) -> str:
     return md5.hexdigest()
 
 
+DATE_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d")
+
+
+def parse_date(date_str: str) -> int:
+    """
+    将元数据中的日期字符串转换为 Unix 时间戳（秒），用于 Milvus 中可排序、可范围过滤的 INT64 date 字段。
+    空字符串或无法解析的日期记为 0。
+    """
+    for fmt in DATE_FORMATS:
+        try:
+            return int(datetime.datetime.strptime(date_str, fmt).timestamp())
+        except (TypeError, ValueError):
+            continue
+    return 0
+
+
+def format_date(ts: int) -> str:
+    """parse_date 的逆操作，0 表示无日期。"""
+    if not ts:
+        return ""
+    return datetime.datetime.fromtimestamp(ts).strftime(DATE_FORMATS[0])
+
+
+def doc_family(filename: str) -> str:
+    """
+    由文件名推导文档族，作为分区键：去掉扩展名及末尾的序号/分隔符，例如 guifan1.txt -> guifan。
+    """
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return re.sub(r"[\s_\-.]*\d+$", "", stem) or stem
+
+
+def read_source(path: str) -> str:
+    """读取源文件，不转换换行符，使字符偏移与文件内容一致。"""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return f.read()
+
+
 def chunk_text(text: str) -> list:
+    return [text[start:end] for start, end in chunk_spans(text)]
+
+
+def chunk_spans(text: str) -> list:
     """
     将文本分块，每块最多 CHUNK_SIZE 字符，且每块间重叠 CHUNK_OVERLAP 字符，同时确保每块字节数不超过 max_bytes。
+    返回每块的 [start, end) 字符区间。
     """
     max_bytes = 1024
-    chunks = []
+    spans = []
     start = 0
     L = len(text)
     while start < L:
@@ -92,37 +174,231 @@ def chunk_text(text: str) -> list:
         # 如果块字节数超过限制，则逐步缩减 end
         while end > start and len(text[start:end].encode("utf-8")) > max_bytes:
             end -= 1
-        chunk = text[start:end]
-        chunks.append(chunk)
+        spans.append((start, end))
         # 如果已到达文本末尾，则退出
         if end >= L:
             break
         # 下一个块起始位置：在 end 之上回退 overlap，保证重叠覆盖
         start = max(0, end - CHUNK_OVERLAP)
-    return chunks
+    return spans
+
+
+def chunk_offsets(text: str, spans: list) -> list:
+    """每个 chunk 的 OFFSET_FIELDS。字节偏移按相邻边界之间的片段逐段累加，整篇文本只编码一次。"""
+    bounds = sorted({pos for span in spans for pos in span})
+    byte_pos = {}
+    prev, acc = 0, 0
+    for pos in bounds:
+        acc += len(text[prev:pos].encode("utf-8"))
+        byte_pos[pos] = acc
+        prev = pos
+    return [
+        {"char_start": s, "char_end": e, "byte_start": byte_pos[s], "byte_end": byte_pos[e]}
+        for s, e in spans
+    ]
+
+
+def doc_vector(dense_list: list, chunks: list) -> list:
+    """
+    文档向量：chunk 向量按 chunk 字符数加权平均后 L2 归一化（BGE-M3 的稠密向量已归一化，检索用内积）。
+    末尾较短的 chunk 权重较小，重叠部分的影响可以忽略。
+    """
+    dense = np.asarray(dense_list, dtype=np.float32)
+    weights = np.array([len(c) for c in chunks], dtype=np.float32)
+    vec = weights @ dense / max(float(weights.sum()), 1.0)
+    norm = float(np.linalg.norm(vec))
+    return (vec / norm if norm > 0 else vec).tolist()
+
+
+def embed_chunks(chunks: list, sparse: bool = True, batch_size: int = 50) -> tuple:
+    """按批调用 embedding 服务，返回 (dense_list, sparse_list)，sparse=False 时 sparse_list 为空。"""
+    dense_list = []
+    sparse_list = []
+    for i in range(0, len(chunks), batch_size):
+        batch = chunks[i : i + batch_size]
+        # 获取稠密向量
+        resp_d = requests.post(f"{BASE_EMBEDDING_URL}/embed_batch_dense", json={"texts": batch})
+        resp_d.raise_for_status()
+        dense_list.extend(resp_d.json()["dense_vectors"])
+        if sparse:
+            # 获取稀疏权重
+            resp_s = requests.post(f"{BASE_EMBEDDING_URL}/embed_batch_sparse", json={"texts": batch})
+            resp_s.raise_for_status()
+            sparse_list.extend(resp_s.json()["lexical_weights"])
+    return dense_list, sparse_list
+
+
+def tokenize_chunks(chunks: list, batch_size: int = 50) -> list:
+    """按批调用 embedding 服务的 /tokenize_batch，返回每个 chunk 的 token map。"""
+    token_maps = []
+    for i in range(0, len(chunks), batch_size):
+        resp = requests.post(f"{BASE_EMBEDDING_URL}/tokenize_batch", json={"texts": chunks[i : i + batch_size]})
+        resp.raise_for_status()
+        token_maps.extend(resp.json()["token_maps"])
+    return token_maps
+
+
+def doc_row(meta: dict, dense_list: list, chunks: list) -> dict:
+    return {
+        "pk": meta["path"],
+        "dense_vector": doc_vector(dense_list, chunks),
+        "filename": meta["filename"],
+        "path": meta["path"],
+        "date": parse_date(meta["date"]),
+        PARTITION_KEY_FIELD: doc_family(meta["filename"]),
+        "chunks": len(chunks),
+    }
 
 # ---------------------------------------------------------------------
 # 初始化 Milvus Collection
 # ---------------------------------------------------------------------
-def init_collection():
-    connections.connect("default", uri=MILVUS_URI)
+def _bfloat16():
+    # numpy 没有原生 bfloat16，pymilvus 识别 ml_dtypes 提供的 dtype
+    try:
+        from ml_dtypes import bfloat16
+    except ImportError as e:
+        raise RuntimeError("BFLOAT16_VECTOR 需要安装 ml_dtypes：pip install ml_dtypes") from e
+    return bfloat16
+
+
+def check_dense_dtype(dense_dtype: str):
+    """在建表 / 打开 collection 时检查精度所需的依赖，而不是在第一次写入或查询时才失败。"""
+    if dense_dtype == "BFLOAT16_VECTOR":
+        _bfloat16()
+
+
+def to_dense_payload(vectors: list, dense_dtype: str) -> list:
+    """将 float32 稠密向量转换为与 dense_vector 字段精度一致的格式，入库和查询共用。"""
+    if dense_dtype == "FLOAT16_VECTOR":
+        return list(np.asarray(vectors, dtype=np.float32).astype(np.float16))
+    if dense_dtype == "BFLOAT16_VECTOR":
+        return list(np.asarray(vectors, dtype=np.float32).astype(_bfloat16()))
+    return vectors
+
+
+def from_dense_output(value, dense_dtype: str) -> np.ndarray:
+    """query 返回的半精度向量为原始字节，转换回 float32。"""
+    if dense_dtype == "FLOAT16_VECTOR" and isinstance(value, bytes):
+        return np.frombuffer(value, dtype=np.float16).astype(np.float32)
+    if dense_dtype == "BFLOAT16_VECTOR" and isinstance(value, bytes):
+        return np.frombuffer(value, dtype=_bfloat16()).astype(np.float32)
+    return np.asarray(value, dtype=np.float32)
+
+
+def dense_vector_dtype(col: Collection) -> str:
+    return next(f for f in col.schema.fields if f.name == "dense_vector").dtype.name
+
+
+def uses_chunk_store(col: Collection) -> bool:
+    return any(f.name == "text_offset" for f in col.schema.fields)
+
+
+def build_schema(dense_dtype: str = DENSE_VECTOR_DTYPE, chunk_store: bool = False) -> CollectionSchema:
+    from pymilvus import CollectionSchema, DataType, FieldSchema
+
     EMBEDDING_DIM = 1024
-    if not utility.has_collection(COLLECTION_NAME):
-        fields = [
-            FieldSchema(name="pk", dtype=DataType.VARCHAR, is_primary=True, auto_id=True, max_length=100),
-            FieldSchema(name="text", dtype=DataType.VARCHAR, max_length=2048),
-            FieldSchema(name="sparse_vector", dtype=DataType.SPARSE_FLOAT_VECTOR),
-            FieldSchema(name="dense_vector", dtype=DataType.FLOAT_VECTOR, dim=EMBEDDING_DIM),
-            FieldSchema(name="filename", dtype=DataType.VARCHAR, max_length=255),
-            FieldSchema(name="path", dtype=DataType.VARCHAR, max_length=1024),
-            FieldSchema(name="date", dtype=DataType.VARCHAR, max_length=20),
+    check_dense_dtype(dense_dtype)
+    if chunk_store:
+        # 原文在本地 chunk store 中的位置，见 chunk_store.ChunkStore
+        text_fields = [
+            FieldSchema(name="text_offset", dtype=DataType.INT64),
+            FieldSchema(name="text_size", dtype=DataType.INT64),
         ]
-        schema = CollectionSchema(fields, description="Hybrid demo collection with sparse and dense vectors")
-        col = Collection(COLLECTION_NAME, schema, consistency_level="Strong")
-        col.create_index("sparse_vector", {"index_type": "SPARSE_INVERTED_INDEX", "metric_type": "IP"})
-        col.create_index("dense_vector", {"index_type": "AUTOINDEX", "metric_type": "IP"})
     else:
-        col = Collection(COLLECTION_NAME)
+        text_fields = [FieldSchema(name="text", dtype=DataType.VARCHAR, max_length=2048)]
+    fields = [
+        FieldSchema(name="pk", dtype=DataType.VARCHAR, is_primary=True, auto_id=True, max_length=100),
+        *text_fields,
+        # 源文件中的位置，见 OFFSET_FIELDS
+        *[FieldSchema(name=name, dtype=DataType.INT64) for name in OFFSET_FIELDS],
+        # 分词结果，见 TOKEN_MAP_FIELD
+        FieldSchema(name=TOKEN_MAP_FIELD, dtype=DataType.JSON),
+        FieldSchema(name="sparse_vector", dtype=DataType.SPARSE_FLOAT_VECTOR),
+        FieldSchema(name="dense_vector", dtype=DataType[dense_dtype], dim=EMBEDDING_DIM),
+        FieldSchema(name="filename", dtype=DataType.VARCHAR, max_length=255),
+        FieldSchema(name="path", dtype=DataType.VARCHAR, max_length=1024),
+        # Unix 时间戳（秒），见 parse_date
+        FieldSchema(name="date", dtype=DataType.INT64),
+        # 分区键：同一文档族的 chunk 落在同一分区，见 doc_family
+        FieldSchema(name=PARTITION_KEY_FIELD, dtype=DataType.VARCHAR, max_length=255, is_partition_key=True),
+    ]
+    return CollectionSchema(
+        fields,
+        description="Hybrid demo collection with sparse and dense vectors",
+        num_partitions=NUM_PARTITIONS,
+    )
+
+
+def build_doc_schema(dense_dtype: str = DENSE_VECTOR_DTYPE) -> CollectionSchema:
+    from pymilvus import CollectionSchema, DataType, FieldSchema
+
+    EMBEDDING_DIM = 1024
+    check_dense_dtype(dense_dtype)
+    fields = [
+        # 主键即文档路径，重新入库时 upsert 覆盖
+        FieldSchema(name="pk", dtype=DataType.VARCHAR, is_primary=True, auto_id=False, max_length=1024),
+        FieldSchema(name="dense_vector", dtype=DataType[dense_dtype], dim=EMBEDDING_DIM),
+        FieldSchema(name="filename", dtype=DataType.VARCHAR, max_length=255),
+        FieldSchema(name="path", dtype=DataType.VARCHAR, max_length=1024),
+        FieldSchema(name="date", dtype=DataType.INT64),
+        FieldSchema(name=PARTITION_KEY_FIELD, dtype=DataType.VARCHAR, max_length=255),
+        FieldSchema(name="chunks", dtype=DataType.INT64),
+    ]
+    return CollectionSchema(fields, description="Document-level dense vectors (length-weighted mean of chunks)")
+
+
+def create_indexes(col: Collection):
+    col.create_index("sparse_vector", {"index_type": "SPARSE_INVERTED_INDEX", "metric_type": "IP"})
+    col.create_index("dense_vector", DENSE_INDEX_PARAMS)
+    # 标量索引：filename 等值/in 过滤、path 前缀匹配、date 范围过滤
+    col.create_index("filename", {"index_type": "INVERTED"}, index_name="filename_idx")
+    col.create_index("path", {"index_type": "Trie"}, index_name="path_idx")
+    col.create_index("date", {"index_type": "STL_SORT"}, index_name="date_idx")
+
+
+def check_schema(col: Collection):
+    """已有 collection 的字段与 build_schema 不一致时拒绝写入，提示使用 milvus_migrate.py 重建。"""
+    dense_dtype = dense_vector_dtype(col)
+    if dense_dtype not in DENSE_VECTOR_DTYPES:
+        dense_dtype = DENSE_VECTOR_DTYPE
+    expected = {f.name: f.dtype for f in build_schema(dense_dtype, uses_chunk_store(col)).fields}
+    actual = {f.name: f.dtype for f in col.schema.fields}
+    mismatched = [name for name, dtype in expected.items() if actual.get(name) != dtype]
+    if mismatched:
+        raise RuntimeError(
+            f"Collection {col.name} 的字段 {mismatched} 与当前 schema 不一致，"
+            f"请先运行 python src/milvus_migrate.py --source {col.name} --swap 重建"
+        )
+
+
+def init_collection(
+    name: str = COLLECTION_NAME,
+    dense_dtype: str = DENSE_VECTOR_DTYPE,
+    chunk_store: bool = CHUNK_STORE_PATH is not None,
+):
+    from pymilvus import Collection, connections, utility
+
+    connections.connect("default", uri=MILVUS_URI)
+    if not utility.has_collection(name):
+        col = Collection(name, build_schema(dense_dtype, chunk_store), consistency_level="Strong")
+        create_indexes(col)
+    else:
+        col = Collection(name)
+        check_schema(col)
+    col.load()
+    return col
+
+
+def init_doc_collection(name: str = DOC_COLLECTION_NAME, dense_dtype: str = DENSE_VECTOR_DTYPE):
+    from pymilvus import Collection, connections, utility
+
+    connections.connect("default", uri=MILVUS_URI)
+    if not utility.has_collection(name):
+        col = Collection(name, build_doc_schema(dense_dtype), consistency_level="Strong")
+        col.create_index("dense_vector", DENSE_INDEX_PARAMS)
+        col.create_index("path", {"index_type": "Trie"}, index_name="path_idx")
+    else:
+        col = Collection(name)
     col.load()
     return col
 
@@ -130,8 +406,25 @@ def init_collection():
 # 主流程
 # ---------------------------------------------------------------------
 def main():
+    # 与 vector_store 互相引用（其 Milvus 后端使用本模块的 schema），在此处导入
+    from vector_store import open_store
+
+    # 命令行运行，进度同时输出到终端
+    setup_logging("ingest", "milvus_ingest", console=True)
     metadata = load_metadata()
-    col = init_collection()
+    vstore = open_store(COLLECTION_NAME, create=True)
+    doc_store = open_store(DOC_COLLECTION_NAME, create=True, documents=True)
+    fields = vstore.field_names()
+    if "text" in fields or "text_offset" in fields:
+        text_in_chunk_store = "text_offset" in fields
+    else:
+        # 空的进程内存储没有固定 schema，按配置决定
+        text_in_chunk_store = CHUNK_STORE_PATH is not None
+    chunk_store = None
+    if text_in_chunk_store:
+        if CHUNK_STORE_PATH is None:
+            raise RuntimeError(f"Collection {COLLECTION_NAME} 的原文存放在 chunk store 中，请设置 CHUNK_STORE_PATH")
+        chunk_store = ChunkStore(CHUNK_STORE_PATH)
 
     to_ingest = []
     for fname in os.listdir(DATA_DIR):
@@ -145,58 +438,71 @@ def main():
             metadata[path] = {"filename": fname, "path": path, "date": date_str, "md5": m, "inserted": False}
             to_ingest.append(path)
 
+    # 在文档向量功能之前入库的文件：只重新计算稠密向量写入 documents，不重复插入 chunk
+    backfill = [p for p, m in metadata.items()
+                if m.get("inserted") and not m.get("doc_vector") and p not in to_ingest and os.path.isfile(p)]
+    if backfill:
+        logger.info("Computing document vectors for %d previously ingested files...", len(backfill))
+        for path in backfill:
+            chunks = chunk_text(read_source(path))
+            dense_list, _ = embed_chunks(chunks, sparse=False)
+            doc_store.upsert([doc_row(metadata[path], dense_list, chunks)])
+            metadata[path]["doc_vector"] = True
+        doc_store.flush()
+        save_metadata(metadata)
+
     if not to_ingest:
-        print("No new or updated files to ingest.")
+        logger.info("No new or updated files to ingest.")
         return
 
     for path in to_ingest:
         fname = os.path.basename(path)
-        print(f"Processing {fname}...")
-        with open(path, "r", encoding="utf-8") as f:
-            text = f.read()
-        chunks = chunk_text(text)
-
-        dense_list = []
-        sparse_list = []
-        batch_size = 50
-
-        for i in range(0, len(chunks), batch_size):
-            batch = chunks[i : i + batch_size]
-            # 获取稠密向量
-            resp_d = requests.post(f"{BASE_EMBEDDING_URL}/embed_batch_dense", json={"texts": batch})
-            resp_d.raise_for_status()
-            dens = resp_d.json()["dense_vectors"]
-            # 获取稀疏权重
-            resp_s = requests.post(f"{BASE_EMBEDDING_URL}/embed_batch_sparse", json={"texts": batch})
-            resp_s.raise_for_status()
-            sparse_weights = resp_s.json()["lexical_weights"]
-
-            for idx in range(len(batch)):
-                dense_list.append(dens[idx])
-                sparse_list.append(sparse_weights[idx])
-
-        filenames = [metadata[path]["filename"]] * len(chunks)
-        paths = [metadata[path]["path"]] * len(chunks)
-        dates = [metadata[path]["date"]] * len(chunks)
-
-        # 插入 Milvus：text, sparse_vector, dense_vector, filename, path, date
-        entities = [
-            chunks,
-            sparse_list,
-            dense_list,
-            filenames,
-            paths,
-            dates,
+        logger.info("Processing %s...", fname)
+        text = read_source(path)
+        spans = chunk_spans(text)
+        chunks = [text[start:end] for start, end in spans]
+        offsets = chunk_offsets(text, spans)
+        dense_list, sparse_list = embed_chunks(chunks)
+        token_maps = tokenize_chunks(chunks)
+
+        meta = metadata[path]
+        base_row = {
+            "filename": meta["filename"],
+            "path": meta["path"],
+            "date": parse_date(meta["date"]),
+            PARTITION_KEY_FIELD: doc_family(meta["filename"]),
+        }
+
+        if chunk_store is not None:
+            # 先写 chunk store 并落盘，向量存储中只记录位置
+            locations = [chunk_store.append(c) for c in chunks]
+            chunk_store.flush()
+            text_fields = [{"text_offset": o, "text_size": n} for o, n in locations]
+        else:
+            text_fields = [{"text": c} for c in chunks]
+
+        # 每个 chunk 一行：text（或 text_offset, text_size）, 源文件偏移, token_map, sparse_vector, dense_vector,
+        # filename, path, date, doc_family
+        rows = [
+            {**text_fields[i], **offsets[i], TOKEN_MAP_FIELD: token_maps[i], "sparse_vector": sparse_list[i], "dense_vector": dense_list[i],
+             **base_row}
+            for i in range(len(chunks))
         ]
-        col.insert(entities)
+        vstore.insert(rows)
+        vstore.flush()
+        # 文档向量复用上面 chunk 的稠密向量，按 path upsert
+        doc_store.upsert([doc_row(meta, dense_list, chunks)])
+        doc_store.flush()
 
         # 插入完成后立即更新元数据并保存
         metadata[path]["inserted"] = True
         metadata[path]["chunks"] = len(chunks)
+        metadata[path]["doc_vector"] = True
         save_metadata(metadata)
-        print(f"Inserted {len(chunks)} chunks for {fname}. Metadata updated.")
+        logger.info("Inserted %d chunks for %s. Metadata updated.", len(chunks), fname,
+                    extra={"fields": {"file": fname, "chunks": len(chunks)}})
 
-    print("Ingestion complete.")
+    logger.info("Ingestion complete.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,193 @@
+# milvus_migrate.py
+# 将已有 collection 重建为当前 schema（INT64 date、doc_family 分区键、源文件偏移、token map 等），也可借此转换 dense_vector 精度。
+#
+# 用法：python src/milvus_migrate.py --source hybrid_demo --swap
+#
+# 按批 query_iterator 读出旧 collection 的全部字段（含向量），补齐/转换新字段后写入新 collection；
+# 指定 --swap 时，旧 collection 重命名为备份，新 collection 接管原名称。
+
+import argparse
+import functools
+import logging
+import os
+import time
+
+from pymilvus import connections, utility, Collection
+
+from chunk_store import ChunkStore
+from log_setup import setup_logging
+from milvus_ingest import (
+    COLLECTION_NAME,
+    MILVUS_URI,
+    PARTITION_KEY_FIELD,
+    CHUNK_STORE_PATH,
+    CHUNK_STORE_FIELDS,
+    OFFSET_FIELDS,
+    TOKEN_MAP_FIELD,
+    uses_chunk_store,
+    DENSE_VECTOR_DTYPE,
+    DENSE_VECTOR_DTYPES,
+    init_collection,
+    chunk_offsets,
+    chunk_spans,
+    read_source,
+    tokenize_chunks,
+    parse_date,
+    doc_family,
+    dense_vector_dtype,
+    to_dense_payload,
+    from_dense_output,
+)
+
+logger = logging.getLogger("milvus_migrate")
+
+# 旧 collection 中需要搬运的字段（pk 为 auto_id，由新 collection 重新生成；原文字段视两侧布局而定）
+COPY_FIELDS = ["sparse_vector", "dense_vector", "filename", "path", "date"]
+
+
+def convert_text(row: dict, src_in_store: bool, dst_in_store: bool, store) -> dict:
+    """在 Milvus text 字段与本地 chunk store 两种原文布局之间转换。"""
+    if src_in_store and dst_in_store:
+        return {f: row[f] for f in CHUNK_STORE_FIELDS}
+    text = store.read(row["text_offset"], row["text_size"]) if src_in_store else row["text"]
+    if dst_in_store:
+        offset, size = store.append(text)
+        return {"text_offset": offset, "text_size": size}
+    return {"text": text}
+
+
+@functools.lru_cache(maxsize=64)
+def source_offsets(path: str) -> dict:
+    """
+    旧版入库以默认换行模式读取源文件（\r\n 转为 \n），按同样方式重新分块得到 chunk 原文 -> 源文件偏移，
+    字符位置映射回未转换换行符的原始文本。源文件不存在时为空。
+    """
+    if not os.path.isfile(path):
+        return {}
+    raw = read_source(path)
+    # 转换后文本的第 i 个字符对应原始文本的 raw_pos[i]
+    raw_pos = []
+    i = 0
+    while i < len(raw):
+        raw_pos.append(i)
+        i += 2 if raw.startswith("\r\n", i) else 1
+    raw_pos.append(len(raw))
+    text = raw.replace("\r\n", "\n").replace("\r", "\n")
+    spans = chunk_spans(text)
+    offsets = chunk_offsets(raw, [(raw_pos[s], raw_pos[e]) for s, e in spans])
+    out = {}
+    for (s, e), off in zip(spans, offsets):
+        out.setdefault(text[s:e], off)
+    return out
+
+
+def row_text(row: dict, store) -> str:
+    return row["text"] if "text" in row else store.read(row["text_offset"], row["text_size"])
+
+
+def convert_row(row: dict, src_dtype: str, dst_dtype: str, src_in_store: bool, dst_in_store: bool, store) -> dict:
+    new_row = {name: row[name] for name in COPY_FIELDS}
+    new_row.update(convert_text(row, src_in_store, dst_in_store, store))
+    if all(f in row for f in OFFSET_FIELDS):
+        new_row.update({f: row[f] for f in OFFSET_FIELDS})
+    else:
+        # 旧 schema 没有偏移字段：在源文件中定位，找不到（文件已修改或删除）记为 -1
+        new_row.update(source_offsets(row["path"]).get(row_text(row, store), dict.fromkeys(OFFSET_FIELDS, -1)))
+    if TOKEN_MAP_FIELD in row:
+        new_row[TOKEN_MAP_FIELD] = row[TOKEN_MAP_FIELD]
+    if src_dtype != dst_dtype:
+        dense = from_dense_output(row["dense_vector"], src_dtype)
+        new_row["dense_vector"] = to_dense_payload([dense], dst_dtype)[0]
+    # 旧 schema 中 date 为 VARCHAR(20)
+    if isinstance(new_row["date"], str):
+        new_row["date"] = parse_date(new_row["date"])
+    new_row[PARTITION_KEY_FIELD] = row.get(PARTITION_KEY_FIELD) or doc_family(row["filename"])
+    return new_row
+
+
+def migrate(
+    source: str,
+    target: str,
+    batch_size: int = 500,
+    dense_dtype: str = DENSE_VECTOR_DTYPE,
+    chunk_store: bool = CHUNK_STORE_PATH is not None,
+) -> int:
+    src = Collection(source)
+    src.load()
+    src_dtype = dense_vector_dtype(src)
+    src_in_store = uses_chunk_store(src)
+    dst = init_collection(target, dense_dtype, chunk_store)
+    dst_in_store = uses_chunk_store(dst)
+    store = None
+    if src_in_store or dst_in_store:
+        if CHUNK_STORE_PATH is None:
+            raise RuntimeError("迁移涉及 chunk store 布局，请先设置 milvus_ingest.CHUNK_STORE_PATH")
+        store = ChunkStore(CHUNK_STORE_PATH)
+
+    text_fields = CHUNK_STORE_FIELDS if src_in_store else ["text"]
+    src_fields = {f.name for f in src.schema.fields}
+    extra_fields = [f for f in OFFSET_FIELDS + [TOKEN_MAP_FIELD] if f in src_fields]
+    it = src.query_iterator(batch_size=batch_size, expr="", output_fields=COPY_FIELDS + text_fields + extra_fields)
+    total = 0
+    try:
+        while True:
+            rows = it.next()
+            if not rows:
+                break
+            new_rows = [convert_row(r, src_dtype, dense_dtype, src_in_store, dst_in_store, store) for r in rows]
+            if TOKEN_MAP_FIELD not in src_fields:
+                # 旧 schema 没有 token map：按批调用 embedding 服务的 /tokenize_batch 补齐
+                token_maps = tokenize_chunks([row_text(r, store) for r in rows])
+                for new_row, token_map in zip(new_rows, token_maps):
+                    new_row[TOKEN_MAP_FIELD] = token_map
+            dst.insert(new_rows)
+            total += len(rows)
+            logger.info("Copied %d rows...", total)
+    finally:
+        it.close()
+        if store is not None:
+            store.flush()
+    dst.flush()
+
+    # num_entities 包含已删除但尚未 compaction 的行，按实际可查询的行数校验
+    copied = row_count(dst)
+    if copied != total:
+        raise RuntimeError(f"行数不一致：从 {source} 读取 {total} 行，{target} 中为 {copied} 行")
+    return total
+
+
+def row_count(col: Collection) -> int:
+    return col.query(expr="", output_fields=["count(*)"])[0]["count(*)"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild a Milvus collection into the current (partitioned) schema")
+    parser.add_argument("--source", default=COLLECTION_NAME)
+    parser.add_argument("--target", default=None, help="默认 <source>_migrated")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dense-dtype", default=DENSE_VECTOR_DTYPE, choices=DENSE_VECTOR_DTYPES,
+                        help="新 collection 的 dense_vector 精度，例如 FLOAT16_VECTOR")
+    parser.add_argument("--chunk-store", action=argparse.BooleanOptionalAction, default=CHUNK_STORE_PATH is not None,
+                        help="新 collection 是否将原文放入本地 chunk store（路径见 CHUNK_STORE_PATH）")
+    parser.add_argument("--swap", action="store_true", help="迁移完成后用新 collection 替换原名称，旧 collection 保留为备份")
+    args = parser.parse_args()
+
+    setup_logging("migrate", "milvus_migrate", console=True)
+    target = args.target or f"{args.source}_migrated"
+    connections.connect("default", uri=MILVUS_URI)
+    if utility.has_collection(target):
+        raise SystemExit(f"目标 collection {target} 已存在，请先删除或换一个名称")
+
+    total = migrate(args.source, target, args.batch_size, args.dense_dtype, args.chunk_store)
+    logger.info("Migrated %d rows from %s to %s.", total, args.source, target)
+
+    if args.swap:
+        backup = f"{args.source}_backup_{time.strftime('%Y%m%d%H%M%S')}"
+        Collection(args.source).release()
+        utility.rename_collection(args.source, backup)
+        utility.rename_collection(target, args.source)
+        logger.info("Renamed %s -> %s, %s -> %s.", args.source, backup, target, args.source)
+
+
+if __name__ == "__main__":
+    main()
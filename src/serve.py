@@ -0,0 +1,122 @@
+# serve.py
+# 生产模式启动：多 worker、预热完成后才就绪（/readyz）、收到 SIGTERM 后排空在途请求再退出。
+#
+#   python src/serve.py embedding --workers 2      # 端口 8001
+#   python src/serve.py search --workers 4         # 端口 8002
+#
+# 安装了 gunicorn 时以 gunicorn + UvicornWorker 运行：
+#   - embedding 默认 --preload：模型在 master 中加载一次，fork 后各 worker 以写时复制共享权重，
+#     并按 worker 数划分 torch 线程，避免 CPU 超卖；CUDA 无法跨 fork 使用，GPU 上自动改为各 worker 自行加载；
+#   - search 不预加载：Milvus 的 gRPC 连接不能跨 fork 共享，各 worker 在预热时自行连接。
+# 未安装 gunicorn 时退回 uvicorn 自带的多进程模式（不支持预加载）。
+# 开发时仍可直接运行 python src/api_*.py（单进程 + reload）。
+
+import argparse
+import os
+import sys
+
+# startup：预加载时在 master 中 fork 之前调用的模块函数（如加载模型）
+SERVICES = {
+    "embedding": {"app": "api_embedding:app", "port": 8001, "workers": 2, "preload": True, "startup": "load_model"},
+    "search": {"app": "api_search_milvus:app", "port": 8002, "workers": 4, "preload": False, "startup": None},
+}
+# SIGTERM 后等待在途请求完成的最长时间（gunicorn 下包含 lifecycle.DRAIN_DELAY 的 draining 阶段）
+GRACEFUL_TIMEOUT = 30
+# 单个 worker 无响应多久后被 gunicorn 重启；embedding 的批量编码可能较慢
+WORKER_TIMEOUT = 120
+
+
+def uvicorn_worker_class() -> str:
+    try:
+        import uvicorn_worker  # noqa: F401  # uvicorn 0.30+ 将 worker 拆分到独立的包中
+
+        return "uvicorn_worker.UvicornWorker"
+    except ImportError:
+        return "uvicorn.workers.UvicornWorker"
+
+
+def split_torch_threads(workers: int):
+    """多个 worker 共享 CPU 时，每个 worker 只使用 cpu_count / workers 个 intra-op 线程。"""
+    def post_fork(server, worker):
+        import torch
+
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+
+    return post_fork
+
+
+def run_gunicorn(app_uri: str, options: dict, startup: str = None):
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            module_name, attr = app_uri.split(":")
+            module = __import__(module_name)
+            if startup and options.get("preload_app"):
+                getattr(module, startup)()
+            return getattr(module, attr)
+
+    Application().run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a service with multiple workers, warm-up and graceful drain")
+    parser.add_argument("service", choices=sorted(SERVICES))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--preload", action=argparse.BooleanOptionalAction, default=None,
+                        help="在 master 中加载应用后再 fork（仅 gunicorn）")
+    parser.add_argument("--graceful-timeout", type=int, default=GRACEFUL_TIMEOUT)
+    args = parser.parse_args()
+
+    spec = SERVICES[args.service]
+    port = args.port or spec["port"]
+    workers = args.workers or spec["workers"]
+    preload = spec["preload"] if args.preload is None else args.preload
+    if args.service == "embedding" and preload and os.getenv("CUDA_VISIBLE_DEVICES"):
+        print("CUDA 不能在 fork 之后使用，GPU 模式下关闭 --preload", file=sys.stderr)
+        preload = False
+
+    if workers > 1:
+        # 各 worker 写各自的日志文件（见 log_setup.py），避免多个进程同时轮转同一个文件
+        os.environ["LOG_PER_PROCESS"] = "1"
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        gunicorn = None
+
+    if gunicorn is None:
+        import uvicorn
+
+        print("未安装 gunicorn，使用 uvicorn 多进程模式（无预加载）", file=sys.stderr)
+        uvicorn.run(
+            spec["app"],
+            host=args.host,
+            port=port,
+            workers=workers,
+            timeout_graceful_shutdown=args.graceful_timeout,
+            access_log=False,  # 每个请求已由 metrics.TimingMiddleware 记录（采样后的 JSON 行）
+        )
+        return
+
+    options = {
+        "bind": f"{args.host}:{port}",
+        "workers": workers,
+        "worker_class": uvicorn_worker_class(),
+        "preload_app": preload,
+        "graceful_timeout": args.graceful_timeout,
+        "timeout": WORKER_TIMEOUT,
+    }
+    if args.service == "embedding":
+        options["post_fork"] = split_torch_threads(workers)
+    run_gunicorn(spec["app"], options, spec["startup"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# singleflight.py
+# 相同请求合并（single-flight）：同一 key 的并发请求只执行一次，其余请求等待并共享第一个请求的结果。
+#
+# 用法：
+#   singleflight = AsyncSingleFlight("search")
+#   results = await singleflight.do("dense_search", key, lambda: run_in_threadpool(work))
+#
+# 共享的结果对象会返回给多个请求，调用方不得原地修改。
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from metrics import SINGLEFLIGHT_REQUESTS, stage
+
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class AsyncSingleFlight:
+    def __init__(self, service: str):
+        self.service = service
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def inflight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, endpoint: str, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        full_key = (endpoint, key)
+        call = self._calls.get(full_key)
+        if call is not None:
+            SINGLEFLIGHT_REQUESTS.inc(self.service, endpoint, "coalesced")
+            with stage("singleflight_wait"):
+                return await self._wait(call)
+
+        SINGLEFLIGHT_REQUESTS.inc(self.service, endpoint, "leader")
+        # 工作在独立的 task 中执行，发起请求被取消时不影响仍在等待的其他请求
+        call = _Call(asyncio.ensure_future(fn()))
+        self._calls[full_key] = call
+
+        def forget(_task):
+            if self._calls.get(full_key) is call:
+                del self._calls[full_key]
+
+        call.task.add_done_callback(forget)
+        return await self._wait(call)
+
+    @staticmethod
+    async def _wait(call: _Call) -> Any:
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            # 最后一个等待者离开时取消工作
+            if call.waiters == 1 and not call.task.done():
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
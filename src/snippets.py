@@ -0,0 +1,53 @@
+# snippets.py
+# 检索结果摘要：入库时为每个 chunk 保存分词结果（token id 与字符区间，见 milvus_ingest.TOKEN_MAP_FIELD），
+# 查询时用稀疏查询向量（BGE-M3 lexical weights，token id -> 权重）给 chunk 中的 token 打分，
+# 选出命中权重之和最大的定长窗口作为摘要，并返回其中命中 token 的高亮区间。
+#
+# 用法：
+#   make_snippet(chunk_text, token_map, {token_id: weight})
+#   -> {"text": ..., "start": 摘要在 chunk 中的字符偏移, "highlights": [[s, e], ...]（相对摘要）}
+
+from typing import Dict, Optional
+
+import numpy as np
+
+SNIPPET_CHARS = 120
+# 摘要在第一个命中 token 之前保留的上下文比例
+SNIPPET_LEAD = 0.2
+
+
+def _leading(text: str, width: int) -> dict:
+    return {"text": text[:width], "start": 0, "highlights": []}
+
+
+def make_snippet(text: str, token_map: Optional[dict], weights: Dict[int, float], width: int = SNIPPET_CHARS) -> dict:
+    """没有分词结果（旧数据）或没有命中 token 时返回 chunk 开头的一段，不带高亮。"""
+    if not token_map or not token_map.get("ids") or not weights:
+        return _leading(text, width)
+    ids = token_map["ids"]
+    spans = np.asarray(token_map["spans"], dtype=np.int64).reshape(-1, 2)
+    w = np.fromiter((weights.get(i, 0.0) for i in ids), dtype=np.float64, count=len(ids))
+    hit = np.flatnonzero(w > 0)
+    if not hit.size:
+        return _leading(text, width)
+
+    starts, ends, hw = spans[hit, 0], spans[hit, 1], w[hit]
+    # 候选窗口：在第 i 个命中 token 之前留出 lead 个字符，与最终展示的窗口相同（含首尾截断）；
+    # 打分为窗口内完整包含的命中权重之和（token 按位置有序，起止位置均单调）
+    lead = int(width * SNIPPET_LEAD)
+    win = np.clip(starts - lead, 0, max(0, len(text) - width))
+    cum = np.concatenate([[0.0], np.cumsum(hw)])
+    first = np.searchsorted(starts, win, side="left")
+    last = np.searchsorted(ends, win + width, side="right")
+    best = int(np.argmax(cum[last] - cum[first]))
+
+    start = int(win[best])
+    end = min(len(text), start + width)
+    inside = (starts >= start) & (ends <= end)
+    highlights = []
+    for s, e in zip(starts[inside] - start, ends[inside] - start):
+        if highlights and s <= highlights[-1][1]:  # 相邻或重叠的 token 合并为一段
+            highlights[-1][1] = max(highlights[-1][1], int(e))
+        else:
+            highlights.append([int(s), int(e)])
+    return {"text": text[start:end], "start": start, "highlights": highlights}
@@ -1,13 +1,15 @@
+# 实体消歧页面：粘贴实体 JSON、调整参数并查看聚类可视化。
+# 编码、聚类与合并与命令行批处理共用同一套实现（entity_resolve.py），大文件请直接运行：
+#   python src/entity_resolve.py data_entity/entities_input.json -o data_entity/entities_output.jsonl
 import streamlit as st
 import json
-import requests
-import numpy as np
-from sklearn.cluster import DBSCAN
-from sklearn.metrics.pairwise import cosine_distances
 from sklearn.decomposition import PCA
 import matplotlib
 import matplotlib.pyplot as plt
 
+from entity_cluster import cluster_entities, merge_clusters
+from entity_resolve import embed_texts, entity_id, entity_text
+
 # 设置中文字体，解决中文显示问题
 matplotlib.rcParams['font.sans-serif'] = ['SimHei']
 matplotlib.rcParams['axes.unicode_minus'] = False
@@ -44,32 +46,14 @@ input_text = st.text_area(
 if st.button("实体消歧"):
     try:
         raw = json.loads(input_text)
-        input_data = {int(k): v for k, v in raw.items()}
-
-        # 构建待嵌入文本
-        def build_texts(entities):
-            texts, ids = [], []
-            for eid, info in entities.items():
-                name = info.get("name", "")
-                etype = info.get("type", "")
-                attrs = "; ".join([f"{k}:{v}" for k, v in info.get("attributes", {}).items()])
-                texts.append(f"Name: {name}; Type: {etype}; Attributes: {attrs}")
-                ids.append(eid)
-            return ids, texts
-
-        entity_ids, texts = build_texts(input_data)
+        input_data = {entity_id(k): v for k, v in raw.items()}
+        entity_ids = list(input_data)
+        texts = [entity_text(input_data[eid]) for eid in entity_ids]
 
         # 缓存获取嵌入向量
         @st.cache_data(show_spinner=False)
         def get_dense_embeddings(text_list):
-            BASE_URL = "http://localhost:8001"
-            all_embeds = []
-            for i in range(0, len(text_list), 20):
-                batch = text_list[i:i+20]
-                resp = requests.post(f"{BASE_URL}/embed_batch_dense", json={"texts": batch})
-                resp.raise_for_status()
-                all_embeds.extend(resp.json().get("dense_vectors"))
-            return np.array(all_embeds)
+            return embed_texts(text_list)
 
         embeddings = get_dense_embeddings(texts)
 
@@ -80,35 +64,11 @@ if st.button("实体消歧"):
 
         emb_2d = compute_pca(embeddings)
 
-        # 聚类
-        dist_matrix = cosine_distances(embeddings)
-        clusterer = DBSCAN(eps=eps, min_samples=min_samples, metric="precomputed")
-        labels = clusterer.fit_predict(dist_matrix)
-
-        # 合并实体
-        merged = {}
-        centroids = []
-        next_mid = 1
-        for label in set(labels):
-            members = [entity_ids[i] for i, lab in enumerate(labels) if lab == label]
-            if label == -1:
-                for eid in members:
-                    info = input_data[eid]
-                    merged[next_mid] = {"name": info["name"], "type": info["type"], "attributes": info["attributes"], "cluster": [eid]}
-                    centroids.append(emb_2d[entity_ids.index(eid)])
-                    next_mid += 1
-            else:
-                main = input_data[members[0]]
-                merged_attrs = {}
-                coords = []
-                for eid in members:
-                    merged_attrs.update(input_data[eid].get("attributes", {}))
-                    coords.append(emb_2d[entity_ids.index(eid)])
-                centroid = np.mean(coords, axis=0)
-                merged[next_mid] = {"name": main["name"], "type": main["type"], "attributes": merged_attrs, "cluster": members}
-                centroids.append(centroid)
-                next_mid += 1
-        centroids = np.array(centroids)
+        # 聚类：稀疏 eps 邻居图上的 DBSCAN，不构造 n×n 距离矩阵
+        labels = cluster_entities(embeddings, eps=eps, min_samples=min_samples)
+
+        # 合并实体：按标签向量化分组，簇在前、噪声点在后
+        merged, centroids = merge_clusters(entity_ids, input_data, labels, emb_2d)
 
         # 可视化
         fig_before, ax_before = plt.subplots()
@@ -140,6 +100,13 @@ if st.button("实体消歧"):
         with col2:
             st.markdown("**合并后实体 JSON**")
             st.json({str(k): v for k, v in merged.items()})
+        # 与命令行批处理的输出格式相同
+        st.download_button(
+            "下载合并结果（JSONL）",
+            "".join(json.dumps({"id": k, **v}, ensure_ascii=False) + "\n" for k, v in merged.items()),
+            file_name="entities_output.jsonl",
+            mime="application/jsonl",
+        )
 
     except Exception as e:
         st.error(f"错误: {e}")
\ No newline at end of file
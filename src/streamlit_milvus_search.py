@@ -4,6 +4,9 @@ import streamlit as st
 import requests
 import os
 
+from context_viewer import RESULT_FIELDS, render_context, snippet_html
+from doc_cache import DocCache
+
 st.title("Milvus Text Search Demo")
 
 # FastAPI 服务地址输入框
@@ -26,6 +29,11 @@ def search_milvus(query, search_type, limit, sparse_weight, dense_weight):
         "limit": limit,
         "sparse_weight": sparse_weight,
         "dense_weight": dense_weight,
+        # 服务端按文档分组，每篇文档只返回得分最高的 chunk
+        "group_by_doc": True,
+        # 服务端按查询词权重截取摘要并给出高亮区间，不返回整段原文
+        "fields": RESULT_FIELDS,
+        "snippets": True,
     }
     endpoint_map = {
         "dense": f"{api_url}/dense_search/",
@@ -39,73 +47,38 @@ def search_milvus(query, search_type, limit, sparse_weight, dense_weight):
     except Exception as e:
         return {"error": str(e)}
 
-def aggregate_results(results):
-    agg = {}
-    for r in results:
-        p = r["path"]
-        if p not in agg or r["score"] > agg[p]["score"]:
-            agg[p] = r
-    return list(agg.values())
-
-def highlight_text(query, text):
-    h = text
-    idx = h.lower().find(query.lower())
-    if idx == -1:
-        return h
-    # 只做一次高亮，为了性能
-    before, match, after = h[:idx], h[idx:idx+len(query)], h[idx+len(query):]
-    return f"{before}<span style='color:red'>{match}</span>{after}"
+@st.cache_resource(show_spinner=False)
+def shared_cache():
+    # 所有会话共享一份原文（LRU，入库清单中 md5 变化时失效），不像 st.cache_data 每次返回副本
+    return DocCache()
 
-@st.cache_data(show_spinner=False)
 def load_file(path):
-    with open(path, "r", encoding="utf-8") as f:
-        return f.read()
+    return shared_cache().read_file(path)
+
 
+# 结果保存在 session_state 中，点击“加载更多”等按钮重新运行脚本时仍然显示
+if "search_res" not in st.session_state:
+    st.session_state.search_res = None
 
 if st.button("Search"):
     if not query:
         st.error("请输入查询文本后再检索。")
     else:
-        res = search_milvus(query, search_type, limit, sparse_weight, dense_weight)
-        if "error" in res:
-            st.error(f"接口调用失败: {res['error']}")
-        else:
-            docs = aggregate_results(res["results"])
-            st.success(f"共命中 {len(docs)} 篇文档")
-            for i, doc in enumerate(docs, 1):
-                with st.expander(f"Result {i} — {os.path.basename(doc['path'])} (score: {doc['score']:.4f})"):
-                    snippet = highlight_text(query, doc["text"])
-                    st.markdown(snippet, unsafe_allow_html=True)
-                    st.write(f"**Filename:** {doc.get('filename','N/A')}")
-                    st.write(f"**Path:** {doc['path']}")
-                    st.write(f"**Date:** {doc.get('date','N/A')}")
+        st.session_state.search_res = search_milvus(query, search_type, limit, sparse_weight, dense_weight)
+
+res = st.session_state.search_res
+if res is not None:
+    if "error" in res:
+        st.error(f"接口调用失败: {res['error']}")
+    else:
+        docs = res["results"]
+        st.success(f"共命中 {len(docs)} 篇文档")
+        for i, doc in enumerate(docs, 1):
+            with st.expander(f"Result {i} — {os.path.basename(doc['path'])} (score: {doc['score']:.4f})"):
+                st.markdown(snippet_html(doc["snippet"]), unsafe_allow_html=True)
+                st.write(f"**Filename:** {doc.get('filename','N/A')}")
+                st.write(f"**Path:** {doc['path']}")
+                st.write(f"**Date:** {doc.get('date','N/A')}")
 
-                    # 如果文件存在，使用 checkbox 来显示原文
-                    file_path = doc.get("path")
-                    if os.path.isfile(file_path):
-                        try:
-                            content = load_file(file_path)
-                            st.text_area("原文内容", content, height=300)
-                        except Exception as e:
-                            st.error(f"读取原文失败：{e}")
-                    else:
-                        st.warning("原文文件不存在或路径无效")
-                # with st.expander(f"Result {i} — {os.path.basename(doc['path'])} (score: {doc['score']:.4f})"):
-                #     # 高亮片段
-                #     snippet = highlight_text(query, doc["text"])
-                #     st.markdown(snippet, unsafe_allow_html=True)
-                #     st.write(f"**Filename:** {doc.get('filename','N/A')}")
-                #     st.write(f"**Path:** {doc['path']}")
-                #     st.write(f"**Date:** {doc.get('date','N/A')}")
-                    
-                #     # 原文嵌套 Expander
-                #     if doc.get("path") and os.path.isfile(doc["path"]):
-                #         with st.expander("查看原文"):
-                #             try:
-                #                 content = open(doc["path"], "r", encoding="utf-8").read()
-                #             except Exception as e:
-                #                 st.error(f"读取文件失败：{e}")
-                #             else:
-                #                 st.text_area("原文内容", content, height=300)
-                #     else:
-                #         st.warning("原文文件不存在或路径无效")
+                # 原文：只读取命中位置附近的窗口，按需加载更多
+                render_context(api_url, doc, f"result_{doc['pk']}", load_file)
@@ -1,7 +1,10 @@
 import streamlit as st
 import requests
 import os
-import numpy as np
+
+from context_viewer import RESULT_FIELDS, context_window, load_context, render_context, snippet_html
+from doc_cache import DocCache
+from fetch_pool import FetchBatch, new_pool
 
 # —— 页面配置 —— 
 st.set_page_config(page_title="Milvus Text Search & Recommend", layout="wide")
@@ -12,26 +15,24 @@ for key, default in [
     ("liked_docs", set()),
     ("disliked_docs", set()),
     ("query_history", []),
-    ("doc_embeddings", {}),
     ("search_results", []),
 ]:
     if key not in st.session_state:
         st.session_state[key] = default
+# 本会话见过的文档（本地推荐的候选）；向量只保存在进程级共享缓存中，打分直接使用共享矩阵的行
+if "doc_paths" not in st.session_state:
+    st.session_state.doc_paths = set()
 
 # —— 工具函数 —— 
-@st.cache_data(show_spinner=False)
-def load_file(path):
-    with open(path, "r", encoding="utf-8") as f:
-        return f.read()
-
-def highlight_text(query, text):
-    idx = text.lower().find(query.lower())
-    if idx == -1:
-        return text
-    before = text[:idx]
-    match = text[idx:idx+len(query)]
-    after = text[idx+len(query):]
-    return f"{before}<span style='color:red'>{match}</span>{after}"
+@st.cache_resource(show_spinner=False)
+def shared_cache():
+    # 所有会话共享：文档向量与原文各保存一份，LRU 淘汰，入库清单中 md5 变化时失效
+    return DocCache()
+
+@st.cache_resource(show_spinner=False)
+def shared_pool():
+    # 所有会话共享的有界线程池，并发获取每条结果的原文窗口与文档向量
+    return new_pool()
 
 def search_milvus(query, search_type, limit, sparse_weight, dense_weight):
     payload = {
@@ -39,6 +40,11 @@ def search_milvus(query, search_type, limit, sparse_weight, dense_weight):
         "limit": limit,
         "sparse_weight": sparse_weight,
         "dense_weight": dense_weight,
+        # 服务端按文档分组，每篇文档只返回得分最高的 chunk
+        "group_by_doc": True,
+        # 服务端按查询词权重截取摘要并给出高亮区间，不返回整段原文
+        "fields": RESULT_FIELDS,
+        "snippets": True,
     }
     endpoints = {
         "dense": f"{api_url}/dense_search/",
@@ -53,83 +59,73 @@ def search_milvus(query, search_type, limit, sparse_weight, dense_weight):
         st.error(f"检索接口调用失败：{e}")
         return []
 
-def aggregate_results(results):
-    agg = {}
-    for r in results:
-        p = r["path"]
-        if p not in agg or r["score"] > agg[p]["score"]:
-            agg[p] = r
-    return list(agg.values())
+def missing_embeddings(paths):
+    """记入本会话的候选文档，返回共享缓存中尚无向量、需请求 /doc_embeddings/ 的路径。"""
+    st.session_state.doc_paths.update(paths)
+    return shared_cache().missing(list(paths))
+
+def request_doc_embeddings(url, paths):
+    # 可在工作线程中执行，不调用 st.*
+    resp = requests.post(f"{url}/doc_embeddings/", json={"paths": paths}, timeout=10)
+    resp.raise_for_status()
+    return resp.json()
 
-def fetch_doc_embedding(path):
+def apply_doc_embeddings(data):
+    shared_cache().put_embeddings(data.get("embeddings", {}))
+    if data.get("missing"):
+        st.warning(f"{len(data['missing'])} 篇文档尚无文档向量，请重新运行入库脚本")
+
+def fetch_doc_embeddings(paths):
     """
-    读取整个文件内容，调用 POST /embed_dense 获取 1024 维稠密向量并缓存在 session_state.doc_embeddings.
+    批量获取文档向量（入库时由 chunk 向量加权平均得到，见 milvus_ingest.doc_vector），
+    先查进程级共享缓存，其余调用 POST /doc_embeddings/，结果放入共享缓存用于本地打分。
     """
-    if path in st.session_state.doc_embeddings:
-        return st.session_state.doc_embeddings[path]
-
-    # 1) 读文本
+    todo = missing_embeddings(paths)
+    if not todo:
+        return
     try:
-        text = load_file(path)
+        data = request_doc_embeddings(api_url, todo)
     except Exception as e:
-        st.warning(f"读取文件失败，无法获取 embedding: {e}")
-        return None
+        st.warning(f"获取文档向量失败: {e}")
+        return
+    apply_doc_embeddings(data)
 
-    # 2) 调用 embed_dense 接口
-    EMBEDDING_API_URL = "http://localhost:8001"
+def get_recommendations(top_k: int = 5):
+    """
+    服务端推荐：POST /recommend/ 由喜欢/不喜欢的文档构造用户画像，在全部文档向量上做一次 ANN 检索。
+    接口不可用时退回仅在本会话见过的文档中排序的 local_recommendations（向量取自共享缓存）。
+    """
+    liked = list(st.session_state.liked_docs)
+    if not liked:
+        return []
     try:
         resp = requests.post(
-            f"{EMBEDDING_API_URL}/embed_dense",
-            json={"text": text},
-            timeout=30
+            f"{api_url}/recommend/",
+            json={"liked": liked, "disliked": list(st.session_state.disliked_docs), "limit": top_k},
+            timeout=10,
         )
         resp.raise_for_status()
-        dense = resp.json().get("dense")
-        if not isinstance(dense, list):
-            st.warning(f"接口返回格式异常: {resp.json()}")
-            return None
-        emb = np.array(dense, dtype=float)
-        if emb.shape[0] != 1024:
-            st.warning(f"向量维度异常: {emb.shape[0]}，预期1024")
-        st.session_state.doc_embeddings[path] = emb
-        return emb
+        return [r["path"] for r in resp.json().get("results", [])]
     except Exception as e:
-        st.warning(f"获取 embedding 失败: {e}")
-        return None
-
-def cosine_similarity(a, b):
-    if a is None or b is None:
-        return 0.0
-    denom = np.linalg.norm(a) * np.linalg.norm(b)
-    return float(np.dot(a, b) / denom) if denom > 0 else 0.0
+        st.caption(f"推荐接口不可用，使用本地已缓存文档排序：{e}")
+        return local_recommendations(top_k)
 
-def get_recommendations(top_k: int = 5):
+def local_recommendations(top_k: int = 5):
     liked = list(st.session_state.liked_docs)
     if not liked:
         return []
     # 确保 liked docs 的 embedding 都已经拉取
-    for p in liked:
-        fetch_doc_embedding(p)
-    embs = [st.session_state.doc_embeddings.get(p) for p in liked]
-    embs = [e for e in embs if e is not None]
-    if not embs:
-        return []
-
-    user_vec = np.mean(embs, axis=0)
-    # 候选 = 所有已缓存 embedding - liked - disliked
-    candidates = {
-        p: emb for p, emb in st.session_state.doc_embeddings.items()
-        if p not in st.session_state.liked_docs and p not in st.session_state.disliked_docs
-    }
-    scored = [(cosine_similarity(user_vec, emb), p) for p, emb in candidates.items()]
-    scored.sort(reverse=True, key=lambda x: x[0])
-    return [p for _, p in scored[:top_k]]
+    fetch_doc_embeddings(liked)
+    # 候选 = 本会话见过且共享缓存中有向量的文档 - liked - disliked
+    exclude = st.session_state.liked_docs | st.session_state.disliked_docs
+    recs = shared_cache().top_k(liked, st.session_state.doc_paths, top_k, exclude=exclude)
+    return [p for p, _ in recs]
 
 # —— UI 控件：服务地址 & 检索参数 —— 
 api_url = st.text_input(
     "FastAPI 服务地址（含端口）",
     value="http://localhost:8002",
-    help="同时挂载检索和 /embed_dense 接口"
+    help="检索服务，同时提供 /doc_embeddings/ 文档向量和 /recommend/ 推荐接口"
 ).rstrip("/")
 
 query = st.text_input("查询文本", "")
@@ -143,35 +139,45 @@ if st.button("Search"):
     if not query.strip():
         st.error("请输入查询文本后再检索。")
     else:
-        raw = search_milvus(query, search_type, limit, sparse_weight, dense_weight)
-        docs = aggregate_results(raw)
+        docs = search_milvus(query, search_type, limit, sparse_weight, dense_weight)
         st.session_state.search_results = docs
         if query not in st.session_state.query_history:
             st.session_state.query_history.append(query)
 
-# —— 保证所有搜索结果都有 embedding —— 
-for doc in st.session_state.search_results:
-    fetch_doc_embedding(doc["path"])
+# —— 并发获取每条结果的附加数据 —— 
+# 上一次运行（包括被新检索打断的运行）尚未完成的获取任务不再需要
+if "fetch_batch" in st.session_state:
+    st.session_state.fetch_batch.cancel()
+batch = st.session_state.fetch_batch = FetchBatch(shared_pool())
+# 共享缓存在脚本线程中取得（st.cache_resource 需要 ScriptRunContext），工作线程只调用其方法
+cache = shared_cache()
+EMBEDDINGS_KEY = "__doc_embeddings__"
+# 保证所有搜索结果都有 embedding：一次批量请求，与原文窗口并行
+todo = missing_embeddings([doc["path"] for doc in st.session_state.search_results])
+if todo:
+    batch.submit(EMBEDDINGS_KEY, request_doc_embeddings, api_url, todo)
 
 # —— 主区：展示搜索结果 & 喜好按钮 —— 
+# 先渲染每条结果的骨架，原文窗口的位置用占位符，获取完成后按完成顺序填充
+context_slots = {}
 if st.session_state.search_results:
     st.success(f"共命中 {len(st.session_state.search_results)} 篇文档")
     for doc in st.session_state.search_results:
         title = os.path.basename(doc["path"])
         score = doc.get("score", 0.0)
         with st.expander(f"{title} (score: {score:.4f})"):
-            snippet = highlight_text(query, doc.get("text", ""))
-            st.markdown(snippet, unsafe_allow_html=True)
+            st.markdown(snippet_html(doc["snippet"]), unsafe_allow_html=True)
             st.write(f"**Path:** {doc['path']}")
             st.write(f"**Date:** {doc.get('date','N/A')}")
-            if os.path.isfile(doc["path"]):
-                content = load_file(doc["path"])
-                st.text_area("原文内容", content, height=300)
-            else:
-                st.warning("原文文件不存在或路径无效")
-
-            # 喜好按钮：key 中替换斜杠和点，避免冲突
+            # key 中替换斜杠和点，避免冲突
             safe_key = doc["path"].replace("/", "_").replace(".", "_")
+            # 原文：只读取命中位置附近的窗口，按需加载更多
+            slot = st.empty()
+            slot.caption("原文加载中…")
+            context_slots[safe_key] = (doc, slot)
+            batch.submit(safe_key, load_context, api_url, doc, context_window(safe_key), cache.read_file)
+
+            # 喜好按钮
             c1, c2 = st.columns(2)
             with c1:
                 if st.button("👍 喜欢", key=f"like_{safe_key}"):
@@ -182,6 +188,17 @@ if st.session_state.search_results:
                     st.session_state.disliked_docs.add(doc["path"])
                     st.session_state.liked_docs.discard(doc["path"])
 
+for key, result, error in batch.as_completed():
+    if key == EMBEDDINGS_KEY:
+        if error is not None:
+            st.warning(f"获取文档向量失败: {error}")
+        else:
+            apply_doc_embeddings(result)
+        continue
+    doc, slot = context_slots[key]
+    with slot.container():
+        render_context(api_url, doc, key, cache.read_file, ctx=result, error=error)
+
 # —— 侧边栏：猜你喜欢 + 历史查询 —— 
 with st.sidebar:
     st.subheader("🧠 猜你喜欢")
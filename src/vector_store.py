@@ -0,0 +1,616 @@
+# vector_store.py
+# 向量存储抽象：检索服务与入库脚本通过 VectorStore 接口读写 chunk，提供两种实现：
+#   - MilvusStore：封装 pymilvus Collection（默认）；
+#   - MemoryStore：进程内实现。稠密向量为内存映射的 float32 矩阵，分块矩阵乘后用 argpartition 取 top-k；
+#     稀疏向量按 term 建 CSR 倒排索引，查询时只在命中 term 的 postings 上累加内积。
+#     适合小语料的开发、测试和压测，无需启动 milvus_standalone。
+#
+# 通过环境变量选择后端：VECTOR_STORE=milvus|memory，MEMORY_STORE_DIR 为 MemoryStore 的持久化根目录。
+
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE", "milvus")
+MEMORY_STORE_DIR = os.getenv("MEMORY_STORE_DIR", "./vector_store")
+
+VECTOR_FIELDS = ("dense_vector", "sparse_vector")
+
+
+def _quote(value: str) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+@dataclass
+class ScalarFilter:
+    """已解析的标量过滤条件，Milvus 后端翻译为 expr，内存后端计算为布尔掩码。"""
+
+    doc_families: Optional[List[str]] = None
+    filenames: Optional[List[str]] = None
+    path_prefix: Optional[str] = None
+    date_min: Optional[int] = None
+    date_max: Optional[int] = None
+    # 排除的路径（如推荐时用户已标记过的文档）
+    exclude_paths: Optional[List[str]] = None
+
+    def to_expr(self, partition_key_field: str = "doc_family") -> Optional[str]:
+        clauses = []
+        if self.doc_families:
+            clauses.append(f"{partition_key_field} in [{', '.join(_quote(f) for f in self.doc_families)}]")
+        if self.filenames:
+            clauses.append(f"filename in [{', '.join(_quote(f) for f in self.filenames)}]")
+        if self.path_prefix:
+            # 转义 LIKE 通配符，按字面前缀匹配
+            prefix = self.path_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            clauses.append(f"path like {_quote(prefix + '%')}")
+        if self.date_min is not None:
+            clauses.append(f"date >= {self.date_min}")
+        if self.date_max is not None:
+            clauses.append(f"date <= {self.date_max}")
+        if self.exclude_paths:
+            clauses.append(f"path not in [{', '.join(_quote(p) for p in self.exclude_paths)}]")
+        return " and ".join(clauses) or None
+
+    def mask(self, columns: Dict[str, np.ndarray], partition_key_field: str = "doc_family") -> np.ndarray:
+        n = len(columns["path"])
+        mask = np.ones(n, dtype=bool)
+        if self.doc_families:
+            mask &= np.isin(columns[partition_key_field], self.doc_families)
+        if self.filenames:
+            mask &= np.isin(columns["filename"], self.filenames)
+        if self.path_prefix:
+            mask &= np.char.startswith(columns["path"].astype(str), self.path_prefix)
+        if self.date_min is not None:
+            mask &= columns["date"] >= self.date_min
+        if self.date_max is not None:
+            mask &= columns["date"] <= self.date_max
+        if self.exclude_paths:
+            mask &= ~np.isin(columns["path"], self.exclude_paths)
+        return mask
+
+
+class VectorStore:
+    """
+    检索结果与 query 结果均为 dict：{"pk": ..., "score": ...(仅检索), <output_fields>...}，
+    字段值保持存储格式（date 为时间戳，原文可能是 text_offset / text_size），由调用方负责展示格式。
+    timeout 为本次调用的最长秒数（None 不限），内存实现的检索远小于毫秒级，忽略该参数。
+    """
+
+    def field_names(self) -> List[str]:
+        raise NotImplementedError
+
+    def insert(self, rows: List[dict]) -> List[str]:
+        raise NotImplementedError
+
+    def upsert(self, rows: List[dict]) -> List[str]:
+        raise NotImplementedError
+
+    def delete(self, pks: List[str]) -> int:
+        raise NotImplementedError
+
+    def dense_search(self, vector: list, limit: int, scalar_filter: Optional[ScalarFilter] = None,
+                     group_by: Optional[str] = None, params: Optional[dict] = None,
+                     output_fields: List[str] = (), timeout: Optional[float] = None) -> List[dict]:
+        raise NotImplementedError
+
+    def sparse_search(self, vector: dict, limit: int, scalar_filter: Optional[ScalarFilter] = None,
+                      group_by: Optional[str] = None, output_fields: List[str] = (),
+                      timeout: Optional[float] = None) -> List[dict]:
+        raise NotImplementedError
+
+    def hybrid_search(self, dense: list, sparse: dict, dense_weight: float, sparse_weight: float, limit: int,
+                      scalar_filter: Optional[ScalarFilter] = None, params: Optional[dict] = None,
+                      output_fields: List[str] = (), timeout: Optional[float] = None) -> List[dict]:
+        raise NotImplementedError
+
+    def query(self, pks: List[str], output_fields: List[str], timeout: Optional[float] = None) -> List[dict]:
+        raise NotImplementedError
+
+    def flush(self):
+        """持久化已写入的数据，使其对其他进程可见。"""
+
+    def refresh(self):
+        """重新加载其他进程写入的数据（如入库脚本），默认无操作。"""
+
+
+# ---------------------------------------------------------------------
+# Milvus
+# ---------------------------------------------------------------------
+class MilvusStore(VectorStore):
+    def __init__(self, col):
+        from milvus_ingest import PARTITION_KEY_FIELD, check_dense_dtype, dense_vector_dtype
+
+        self.col = col
+        self.dense_dtype = dense_vector_dtype(col)
+        check_dense_dtype(self.dense_dtype)
+        self.partition_key_field = PARTITION_KEY_FIELD
+
+    def _expr(self, scalar_filter: Optional[ScalarFilter]) -> Optional[str]:
+        return scalar_filter.to_expr(self.partition_key_field) if scalar_filter else None
+
+    def _dense_payload(self, vectors: list) -> list:
+        from milvus_ingest import to_dense_payload
+
+        # 半精度 collection 需要 float16 / bfloat16 的向量
+        return to_dense_payload(vectors, self.dense_dtype)
+
+    def _write_rows(self, rows: List[dict]) -> List[dict]:
+        dense = self._dense_payload([r["dense_vector"] for r in rows])
+        return [{**r, "dense_vector": d} for r, d in zip(rows, dense)]
+
+    @staticmethod
+    def _hits(hits, output_fields: List[str]) -> List[dict]:
+        return [{**{f: hit.entity.get(f) for f in output_fields}, "pk": hit.id, "score": hit.score} for hit in hits]
+
+    def field_names(self) -> List[str]:
+        return [f.name for f in self.col.schema.fields]
+
+    def insert(self, rows: List[dict]) -> List[str]:
+        return list(self.col.insert(self._write_rows(rows)).primary_keys)
+
+    def upsert(self, rows: List[dict]) -> List[str]:
+        return list(self.col.upsert(self._write_rows(rows)).primary_keys)
+
+    def delete(self, pks: List[str]) -> int:
+        if not pks:
+            return 0
+        return self.col.delete(f"pk in [{', '.join(_quote(pk) for pk in pks)}]").delete_count
+
+    def dense_search(self, vector, limit, scalar_filter=None, group_by=None, params=None, output_fields=(),
+                     timeout=None):
+        kwargs = {"group_by_field": group_by} if group_by else {}
+        hits = self.col.search(
+            self._dense_payload([vector]),
+            anns_field="dense_vector",
+            param={"metric_type": "IP", "params": params or {}},
+            limit=limit,
+            expr=self._expr(scalar_filter),
+            output_fields=list(output_fields),
+            timeout=timeout,
+            **kwargs,
+        )[0]
+        return self._hits(hits, output_fields)
+
+    def sparse_search(self, vector, limit, scalar_filter=None, group_by=None, output_fields=(), timeout=None):
+        kwargs = {"group_by_field": group_by} if group_by else {}
+        hits = self.col.search(
+            [vector],
+            anns_field="sparse_vector",
+            param={"metric_type": "IP", "params": {}},
+            limit=limit,
+            expr=self._expr(scalar_filter),
+            output_fields=list(output_fields),
+            timeout=timeout,
+            **kwargs,
+        )[0]
+        return self._hits(hits, output_fields)
+
+    def hybrid_search(self, dense, sparse, dense_weight, sparse_weight, limit, scalar_filter=None, params=None,
+                      output_fields=(), timeout=None):
+        from pymilvus import AnnSearchRequest, WeightedRanker
+
+        expr = self._expr(scalar_filter)
+        dense_req = AnnSearchRequest(
+            data=self._dense_payload([dense]),
+            anns_field="dense_vector",
+            param={"metric_type": "IP", "params": params or {}},
+            limit=limit,
+            expr=expr,
+        )
+        sparse_req = AnnSearchRequest(
+            data=[sparse],
+            anns_field="sparse_vector",
+            param={"metric_type": "IP", "params": {}},
+            limit=limit,
+            expr=expr,
+        )
+        # WeightedRanker 的权重与 reqs 顺序一一对应
+        hits = self.col.hybrid_search(
+            reqs=[dense_req, sparse_req],
+            rerank=WeightedRanker(dense_weight, sparse_weight),
+            limit=limit,
+            output_fields=list(output_fields),
+            timeout=timeout,
+        )[0]
+        return self._hits(hits, output_fields)
+
+    def query(self, pks, output_fields, timeout=None):
+        from milvus_ingest import from_dense_output
+
+        if not pks:
+            return []
+        rows = self.col.query(
+            expr=f"pk in [{', '.join(_quote(pk) for pk in pks)}]",
+            output_fields=list(output_fields),
+            timeout=timeout,
+        )
+        if "dense_vector" in output_fields:
+            # 半精度向量返回原始字节，与内存实现一致转换为 float 列表
+            rows = [{**r, "dense_vector": from_dense_output(r["dense_vector"], self.dense_dtype).tolist()}
+                    for r in rows]
+        return rows
+
+    def flush(self):
+        # insert 返回时数据已写入 Milvus 的日志并对检索可见，不额外 seal segment
+        pass
+
+
+# ---------------------------------------------------------------------
+# 进程内实现
+# ---------------------------------------------------------------------
+class _Snapshot:
+    """MemoryStore 的一份只读数据；写操作生成新快照后整体替换，检索无需加锁。"""
+
+    def __init__(self, dense: np.ndarray, rows: List[dict], sparse: List[tuple], alive: np.ndarray):
+        self.dense = dense  # (n, dim) float32，可能是 np.memmap
+        self.rows = rows  # 标量字段（含 pk），不含向量
+        self.sparse = sparse  # 每行 (term_ids int32, weights float32)
+        self.alive = alive
+        self.pk_index = {r["pk"]: i for i, r in enumerate(rows) if alive[i]}
+        self._columns = None
+        self._inverted = None
+        self._field_names = None
+
+    def field_names(self) -> List[str]:
+        if self._field_names is None:
+            names = {k for r in self.rows for k in r}
+            self._field_names = sorted(names | set(VECTOR_FIELDS))
+        return self._field_names
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        if self._columns is None:
+            names = {k for r in self.rows for k in r}
+            self._columns = {k: np.array([r.get(k) for r in self.rows]) for k in names}
+            self._columns.setdefault("path", np.array([], dtype=str))
+        return self._columns
+
+    def inverted(self):
+        """term -> postings(doc, weight) 的 CSR：indptr 按 term id 索引。"""
+        if self._inverted is None:
+            live = [i for i in range(len(self.rows)) if self.alive[i] and len(self.sparse[i][0])]
+            if live:
+                terms = np.concatenate([self.sparse[i][0] for i in live]).astype(np.int64)
+                weights = np.concatenate([self.sparse[i][1] for i in live])
+                docs = np.concatenate([np.full(len(self.sparse[i][0]), i, dtype=np.int64) for i in live])
+                order = np.argsort(terms, kind="stable")
+                terms, docs, weights = terms[order], docs[order], weights[order]
+                indptr = np.zeros(int(terms[-1]) + 2, dtype=np.int64)
+                np.add.at(indptr, terms + 1, 1)
+                self._inverted = (np.cumsum(indptr), docs, weights)
+            else:
+                self._inverted = (np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64),
+                                  np.zeros(0, dtype=np.float32))
+        return self._inverted
+
+
+def _sparse_arrays(vector: dict) -> tuple:
+    # embedding 服务返回的 JSON 中 term id 为字符串
+    terms = np.fromiter((int(k) for k in vector), dtype=np.int32, count=len(vector))
+    weights = np.fromiter((float(v) for v in vector.values()), dtype=np.float32, count=len(vector))
+    return terms, weights
+
+
+class MemoryStore(VectorStore):
+    # 持久化：dense.f32 为连续的 float32 行，rows.json / sparse.npz 为标量字段与稀疏向量，meta.json 最后写入，
+    # 记录行数并以其 mtime 作为版本。只有新增行时 flush 把新行追加到 dense.f32 末尾（读者按 meta 中的行数映射前缀，
+    # 不受影响），有删除时才整体重写并压缩；内存中的稠密矩阵按容量翻倍扩展，insert 的均摊开销与已有行数无关。
+    # 另一进程 flush 时读取可能跨越两个版本，_load 读完后重新检查 meta.json，变化则重读。
+    META_FILE = "meta.json"
+    DENSE_FILE = "dense.f32"
+    SPARSE_FILE = "sparse.npz"
+    ROWS_FILE = "rows.json"
+
+    def __init__(self, path: Optional[str] = None, dim: int = 1024, block_size: int = 16384,
+                 partition_key_field: str = "doc_family"):
+        self.path = path
+        self.dim = dim
+        self.block_size = block_size
+        self.partition_key_field = partition_key_field
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._dirty = False
+        self._loaded_mtime = None
+        self._buf: Optional[np.ndarray] = None  # 稠密向量的可扩展缓冲区，snap.dense 为其前缀
+        self._persisted = 0  # dense.f32 中与当前快照前缀一致的行数
+        self._snap = _Snapshot(np.empty((0, dim), dtype=np.float32), [], [], np.zeros(0, dtype=bool))
+        if path and os.path.exists(os.path.join(path, self.META_FILE)):
+            self._load()
+
+    # ---------------- 持久化 ----------------
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _read_files(self) -> tuple:
+        with open(self._file(self.META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        count, dim = meta["count"], meta["dim"]
+        if count:
+            dense = np.memmap(self._file(self.DENSE_FILE), dtype=np.float32, mode="r", shape=(count, dim))
+        else:
+            dense = np.empty((0, dim), dtype=np.float32)
+        with open(self._file(self.ROWS_FILE), "r", encoding="utf-8") as f:
+            rows = json.load(f)
+        csr = np.load(self._file(self.SPARSE_FILE))
+        indptr, indices, data = csr["indptr"], csr["indices"], csr["data"]
+        if len(rows) != count or len(indptr) != count + 1:
+            raise ValueError(f"{self.path}: meta.json 记录 {count} 行，rows.json / sparse.npz 不一致")
+        sparse = [(indices[indptr[i]:indptr[i + 1]], data[indptr[i]:indptr[i + 1]]) for i in range(count)]
+        return meta, dense, rows, sparse
+
+    def _load(self, attempts: int = 5):
+        meta_path = self._file(self.META_FILE)
+        for attempt in range(attempts):
+            mtime = os.stat(meta_path).st_mtime_ns
+            try:
+                meta, dense, rows, sparse = self._read_files()
+            except (OSError, ValueError, KeyError):
+                # 读到一半时另一进程替换了文件（行数不一致、dense.f32 变短等）
+                if attempt == attempts - 1:
+                    raise
+                time.sleep(0.05 * (attempt + 1))
+                continue
+            if os.stat(meta_path).st_mtime_ns == mtime:
+                break
+            if attempt == attempts - 1:
+                raise RuntimeError(f"{self.path} 在读取期间被反复改写")
+        self.dim = meta["dim"]
+        self._next_id = meta["next_id"]
+        self._snap = _Snapshot(dense, rows, sparse, np.ones(len(rows), dtype=bool))
+        self._buf = None
+        self._persisted = len(rows)
+        self._loaded_mtime = mtime
+        self._dirty = False
+
+    def _write_atomic(self, name: str, write):
+        tmp = self._file(name + ".tmp")
+        write(tmp)
+        os.replace(tmp, self._file(name))
+
+    def flush(self):
+        if not self.path:
+            return
+        with self._lock:
+            snap = self._snap
+            compact = not snap.alive.all() or not os.path.exists(self._file(self.DENSE_FILE))
+            if compact:
+                keep = np.flatnonzero(snap.alive)
+                dense = np.ascontiguousarray(snap.dense[keep], dtype=np.float32)
+                rows = [snap.rows[i] for i in keep]
+                sparse = [snap.sparse[i] for i in keep]
+            else:
+                dense, rows, sparse = snap.dense, snap.rows, snap.sparse
+            indptr = np.zeros(len(sparse) + 1, dtype=np.int64)
+            indptr[1:] = np.cumsum([len(t) for t, _ in sparse])
+            indices = np.concatenate([t for t, _ in sparse]) if sparse else np.zeros(0, dtype=np.int32)
+            data = np.concatenate([w for _, w in sparse]) if sparse else np.zeros(0, dtype=np.float32)
+
+            os.makedirs(self.path, exist_ok=True)
+            if compact:
+                self._write_atomic(self.DENSE_FILE, lambda p: dense.tofile(p))
+            elif len(dense) > self._persisted:
+                # 只追加新行：写在已持久化的行之后（截掉上次中断时可能残留的尾部），meta 更新前读者看不到
+                with open(self._file(self.DENSE_FILE), "r+b") as f:
+                    f.seek(self._persisted * self.dim * 4)
+                    np.ascontiguousarray(dense[self._persisted:], dtype=np.float32).tofile(f)
+                    f.truncate()
+
+            def write_sparse(p):
+                with open(p, "wb") as f:
+                    np.savez(f, indptr=indptr, indices=indices, data=data)
+
+            def write_rows(p):
+                with open(p, "w", encoding="utf-8") as f:
+                    json.dump(rows, f, ensure_ascii=False)
+
+            def write_meta(p):
+                with open(p, "w", encoding="utf-8") as f:
+                    json.dump({"count": len(rows), "dim": self.dim, "next_id": self._next_id}, f)
+
+            self._write_atomic(self.SPARSE_FILE, write_sparse)
+            self._write_atomic(self.ROWS_FILE, write_rows)
+            # meta 最后替换，读者以它的 mtime 判断是否需要重新加载
+            self._write_atomic(self.META_FILE, write_meta)
+            if compact:
+                self._snap = _Snapshot(dense, rows, sparse, np.ones(len(rows), dtype=bool))
+                self._buf = None
+            self._persisted = len(rows)
+            self._loaded_mtime = os.stat(self._file(self.META_FILE)).st_mtime_ns
+            self._dirty = False
+
+    def refresh(self):
+        if not self.path or self._dirty:
+            return
+        try:
+            mtime = os.stat(self._file(self.META_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._loaded_mtime:
+            with self._lock:
+                self._load()
+
+    # ---------------- 写入 ----------------
+    def field_names(self) -> List[str]:
+        # 每次检索都会调用（判断原文布局、偏移字段），按快照缓存
+        return self._snap.field_names()
+
+    def _append(self, rows: List[dict], pks: List[str]):
+        snap = self._snap
+        dense = np.asarray([r["dense_vector"] for r in rows], dtype=np.float32).reshape(len(rows), self.dim)
+        scalars = [{k: v for k, v in r.items() if k not in VECTOR_FIELDS} | {"pk": pk} for r, pk in zip(rows, pks)]
+        n, m = len(snap.dense), len(dense)
+        if self._buf is None or n + m > len(self._buf):
+            # 容量不足时翻倍；已发布的快照仍引用旧数组的前缀，不受影响
+            buf = np.empty((max(n + m, 2 * n), self.dim), dtype=np.float32)
+            buf[:n] = snap.dense
+            self._buf = buf
+        # 新行写在所有快照可见范围之外
+        self._buf[n:n + m] = dense
+        self._snap = _Snapshot(
+            self._buf[:n + m],
+            snap.rows + scalars,
+            snap.sparse + [_sparse_arrays(r.get("sparse_vector") or {}) for r in rows],
+            np.concatenate([snap.alive, np.ones(len(rows), dtype=bool)]),
+        )
+        self._dirty = True
+
+    def _new_pks(self, n: int) -> List[str]:
+        pks = [str(self._next_id + i) for i in range(n)]
+        self._next_id += n
+        return pks
+
+    def insert(self, rows: List[dict]) -> List[str]:
+        if not rows:
+            return []
+        with self._lock:
+            pks = self._new_pks(len(rows))
+            self._append(rows, pks)
+        return pks
+
+    def upsert(self, rows: List[dict]) -> List[str]:
+        if not rows:
+            return []
+        with self._lock:
+            self._mark_deleted([r["pk"] for r in rows if r.get("pk") is not None])
+            new = self._new_pks(sum(1 for r in rows if r.get("pk") is None))
+            it = iter(new)
+            pks = [r["pk"] if r.get("pk") is not None else next(it) for r in rows]
+            self._append(rows, pks)
+        return pks
+
+    def _mark_deleted(self, pks: List[str]) -> int:
+        snap = self._snap
+        idx = [snap.pk_index[pk] for pk in pks if pk in snap.pk_index]
+        if idx:
+            alive = snap.alive.copy()
+            alive[idx] = False
+            self._snap = _Snapshot(snap.dense, snap.rows, snap.sparse, alive)
+            self._dirty = True
+        return len(idx)
+
+    def delete(self, pks: List[str]) -> int:
+        with self._lock:
+            return self._mark_deleted(pks)
+
+    # ---------------- 检索 ----------------
+    def _valid(self, snap: _Snapshot, scalar_filter: Optional[ScalarFilter]) -> np.ndarray:
+        valid = snap.alive
+        if scalar_filter is not None and len(valid):
+            valid = valid & scalar_filter.mask(snap.columns(), self.partition_key_field)
+        return valid
+
+    def _dense_scores(self, snap: _Snapshot, vector: list) -> np.ndarray:
+        q = np.asarray(vector, dtype=np.float32)
+        scores = np.empty(len(snap.dense), dtype=np.float32)
+        # 分块计算，内存映射的矩阵只需按块换入
+        for start in range(0, len(snap.dense), self.block_size):
+            np.dot(snap.dense[start:start + self.block_size], q, out=scores[start:start + self.block_size])
+        return scores
+
+    def _sparse_scores(self, snap: _Snapshot, vector: dict) -> tuple:
+        indptr, docs, weights = snap.inverted()
+        scores = np.zeros(len(snap.rows), dtype=np.float32)
+        touched = np.zeros(len(snap.rows), dtype=bool)
+        for term, w in zip(*_sparse_arrays(vector)):
+            if term + 1 >= len(indptr):
+                continue
+            s, e = indptr[term], indptr[term + 1]
+            scores[docs[s:e]] += w * weights[s:e]
+            touched[docs[s:e]] = True
+        return scores, touched
+
+    @staticmethod
+    def _select(snap: _Snapshot, scores: np.ndarray, valid: np.ndarray, limit: int,
+                group_by: Optional[str]) -> np.ndarray:
+        candidates = np.flatnonzero(valid)
+        if group_by:
+            order = candidates[np.argsort(-scores[candidates], kind="stable")]
+            # 排序后每组第一次出现的位置即该组得分最高的行
+            _, first = np.unique(snap.columns()[group_by][order], return_index=True)
+            return order[np.sort(first)][:limit]
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+    def _output(self, snap: _Snapshot, idx: int, output_fields: List[str]) -> dict:
+        row = snap.rows[idx]
+        out = {}
+        for f in output_fields:
+            if f == "dense_vector":
+                out[f] = np.asarray(snap.dense[idx]).tolist()
+            elif f == "sparse_vector":
+                terms, weights = snap.sparse[idx]
+                out[f] = dict(zip(terms.tolist(), weights.tolist()))
+            else:
+                out[f] = row.get(f)
+        return out
+
+    def _hits(self, snap, idx, scores, output_fields) -> List[dict]:
+        return [{**self._output(snap, i, output_fields), "pk": snap.rows[i]["pk"], "score": float(scores[i])}
+                for i in idx]
+
+    def dense_search(self, vector, limit, scalar_filter=None, group_by=None, params=None, output_fields=(),
+                     timeout=None):
+        snap = self._snap
+        scores = self._dense_scores(snap, vector)
+        idx = self._select(snap, scores, self._valid(snap, scalar_filter), limit, group_by)
+        return self._hits(snap, idx, scores, output_fields)
+
+    def sparse_search(self, vector, limit, scalar_filter=None, group_by=None, output_fields=(), timeout=None):
+        snap = self._snap
+        scores, touched = self._sparse_scores(snap, vector)
+        idx = self._select(snap, scores, self._valid(snap, scalar_filter) & touched, limit, group_by)
+        return self._hits(snap, idx, scores, output_fields)
+
+    def hybrid_search(self, dense, sparse, dense_weight, sparse_weight, limit, scalar_filter=None, params=None,
+                      output_fields=(), timeout=None):
+        # 与 Milvus WeightedRanker 一致：各路取 top-limit，IP 分数经 arctan 归一化到 (0, 1) 后加权求和
+        snap = self._snap
+        valid = self._valid(snap, scalar_filter)
+        dense_scores = self._dense_scores(snap, dense)
+        sparse_scores, touched = self._sparse_scores(snap, sparse)
+        fused = {}
+        for weight, scores, legal in ((dense_weight, dense_scores, valid), (sparse_weight, sparse_scores,
+                                                                            valid & touched)):
+            for i in self._select(snap, scores, legal, limit, None):
+                fused[i] = fused.get(i, 0.0) + weight * (0.5 + np.arctan(scores[i]) / np.pi)
+        ranked = sorted(fused.items(), key=lambda kv: -kv[1])[:limit]
+        fused_scores = dict(ranked)
+        return [{**self._output(snap, i, output_fields), "pk": snap.rows[i]["pk"], "score": float(fused_scores[i])}
+                for i, _ in ranked]
+
+    def query(self, pks, output_fields, timeout=None):
+        snap = self._snap
+        return [{**self._output(snap, snap.pk_index[pk], output_fields), "pk": pk}
+                for pk in pks if pk in snap.pk_index]
+
+
+# ---------------------------------------------------------------------
+# 工厂
+# ---------------------------------------------------------------------
+def open_store(name: str, backend: Optional[str] = None, create: bool = False,
+               documents: bool = False) -> VectorStore:
+    """
+    按后端打开名为 name 的 chunk 存储。create=True 时（入库）Milvus 后端会按当前 schema 建表并校验。
+    documents=True 时为文档级向量存储（主键为 path，见 milvus_ingest.build_doc_schema）。
+    """
+    backend = backend or VECTOR_STORE_BACKEND
+    if backend == "memory":
+        return MemoryStore(os.path.join(MEMORY_STORE_DIR, name))
+    if backend != "milvus":
+        raise ValueError(f"Unknown vector store backend: {backend!r}")
+
+    # milvus_ingest 定义 schema，且在其 main 中会导入本模块，这里延迟导入避免循环依赖
+    from pymilvus import connections, Collection
+    from milvus_ingest import MILVUS_URI, init_collection, init_doc_collection
+
+    if create:
+        return MilvusStore(init_doc_collection(name) if documents else init_collection(name))
+    connections.connect("default", uri=MILVUS_URI)
+    col = Collection(name)
+    col.load()
+    return MilvusStore(col)
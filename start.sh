@@ -12,6 +12,34 @@ log() {
 LOG_DIR="logs"
 mkdir -p "$LOG_DIR"
 
+# 先 SIGTERM 让服务排空在途请求（lifecycle.py 先 draining 5s，serve.py 的 graceful timeout 为 30s），超时仍未退出再 kill -9
+stop_pids() {
+  local pids="$1"
+  kill -TERM $pids 2>/dev/null || true
+  for _ in $(seq 1 40); do
+    kill -0 $pids 2>/dev/null || return 0
+    sleep 1
+  done
+  log "进程 $pids 未在 40s 内退出，kill -9"
+  kill -9 $pids 2>/dev/null || true
+}
+
+# 轮询 /readyz 直到服务完成预热（模型加载、collection 加载与预热请求）
+# /readyz 按 worker 进程回答（见 src/lifecycle.py）：通过只说明接到请求的 worker 已预热，
+# 其余 worker 可能仍在预热，期间照常处理请求，只是首个请求较慢
+wait_ready() {
+  local name="$1" url="$2" timeout="${3:-600}"
+  local start=$SECONDS
+  until curl -sf -o /dev/null "$url"; do
+    if (( SECONDS - start >= timeout )); then
+      log "$name 在 ${timeout}s 内未就绪：$(curl -s "$url" || echo 无响应)"
+      exit 1
+    fi
+    sleep 2
+  done
+  log "$name 已就绪（$(( SECONDS - start ))s）"
+}
+
 log "===== 1. 启动/重启 Milvus (Docker standalone) ====="
 # stop 会在未运行时返回非零，忽略错误继续
 bash milvus_standalone/standalone_embed.sh stop 2>/dev/null || true
@@ -22,25 +50,30 @@ log "===== 2. 启动 Embedding 服务 (port 8001) ====="
 EMB_PORT=8001
 EMB_PIDS=$(lsof -t -i tcp:$EMB_PORT || true)
 if [ -n "$EMB_PIDS" ]; then
-  log "Port $EMB_PORT 被占用，kill 进程: $EMB_PIDS"
-  kill -9 $EMB_PIDS
+  log "Port $EMB_PORT 被占用，停止进程: $EMB_PIDS"
+  stop_pids "$EMB_PIDS"
 else
   log "Port $EMB_PORT 未被占用"
 fi
-# 后台启动，并将带时间戳的日志写入
-nohup bash -c "python src/api_embedding.py 2>&1 | while IFS= read -r line; do printf '[%s] %s\n' \"\$(date '+%Y-%m-%d %H:%M:%S')\" \"\$line\"; done" >> "$LOG_DIR/api_embedding.log" &
+# 后台启动。服务自身的 JSON 日志（带时间戳、按大小轮转）由 src/log_setup.py 写入 $LOG_DIR/api_embedding*.log，
+# 这里只把启动信息和未捕获的错误输出直接重定向到 .out 文件
+nohup python src/serve.py embedding --port $EMB_PORT >> "$LOG_DIR/api_embedding.out" 2>&1 &
 
 echo
 log "===== 3. 启动 Milvus API 服务 (port 8002) ====="
 API_PORT=8002
 API_PIDS=$(lsof -t -i tcp:$API_PORT || true)
 if [ -n "$API_PIDS" ]; then
-  log "Port $API_PORT 被占用，kill 进程: $API_PIDS"
-  kill -9 $API_PIDS
+  log "Port $API_PORT 被占用，停止进程: $API_PIDS"
+  stop_pids "$API_PIDS"
 else
   log "Port $API_PORT 未被占用"
 fi
-nohup bash -c "python src/api_search_milvus.py 2>&1 | while IFS= read -r line; do printf '[%s] %s\n' \"\$(date '+%Y-%m-%d %H:%M:%S')\" \"\$line\"; done" >> "$LOG_DIR/api_search_milvus.log" &
+nohup python src/serve.py search --port $API_PORT >> "$LOG_DIR/api_search_milvus.out" 2>&1 &
+
+# 两个服务并行预热，界面在两者都就绪后再启动
+wait_ready "Embedding 服务" "http://localhost:$EMB_PORT/readyz"
+wait_ready "Milvus API 服务" "http://localhost:$API_PORT/readyz"
 
 echo
 log "===== 4. 启动 Streamlit 界面 ====="
@@ -51,7 +84,7 @@ if [ -n "$STREAMLIT_PIDS" ]; then
 else
   log "未检测到已有 Streamlit 进程"
 fi
-nohup bash -c "streamlit run src/streamlit_milvus_search.py 2>&1 | while IFS= read -r line; do printf '[%s] %s\n' \"\$(date '+%Y-%m-%d %H:%M:%S')\" \"\$line\"; done" >> "$LOG_DIR/streamlit_milvus_search.log" &
+nohup streamlit run src/streamlit_milvus_search.py >> "$LOG_DIR/streamlit_milvus_search.log" 2>&1 &
 
 echo
 log "===== 5. 启动 Entity Cluster 界面 ====="
@@ -62,7 +95,7 @@ if [ -n "$ENTITY_PIDS" ]; then
 else
   log "未检测到已有 Entity Cluster 进程"
 fi
-nohup bash -c "streamlit run src/streamlit_entity_cluster.py 2>&1 | while IFS= read -r line; do printf '[%s] %s\n' \"\$(date '+%Y-%m-%d %H:%M:%S')\" \"\$line\"; done" >> "$LOG_DIR/streamlit_entity_cluster.log" &
+nohup streamlit run src/streamlit_entity_cluster.py >> "$LOG_DIR/streamlit_entity_cluster.log" 2>&1 &
 
 echo
 log "===== 6. 启动 Milvus Text Search & Recommend 界面 ====="
@@ -73,7 +106,7 @@ if [ -n "$ENTITY_PIDS" ]; then
 else
   log "未检测到已有 streamlit_milvus_search_recommend 进程"
 fi
-nohup bash -c "streamlit run src/streamlit_milvus_search_recommend.py 2>&1 | while IFS= read -r line; do printf '[%s] %s\n' \"\$(date '+%Y-%m-%d %H:%M:%S')\" \"\$line\"; done" >> "$LOG_DIR/streamlit_milvus_search_recommend.log" &
+nohup streamlit run src/streamlit_milvus_search_recommend.py >> "$LOG_DIR/streamlit_milvus_search_recommend.log" 2>&1 &
 
 echo
 log ">>> 全部服务启动完毕！日志目录：$LOG_DIR"
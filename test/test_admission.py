@@ -0,0 +1,92 @@
+# test_admission.py
+# 准入控制（admission.AdmissionController）：排队超时、取消时不泄漏并发名额，不依赖任何外部服务
+
+import asyncio
+import os
+import sys
+
+from fastapi import HTTPException
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from admission import AdmissionController  # noqa: E402
+
+async def hold(admission: AdmissionController, release: asyncio.Event):
+    async with admission.admit():
+        await release.wait()
+
+async def queue_timeout_restores_permits():
+    admission = AdmissionController("test", max_concurrency=1, max_queue_time=0.05)
+    release = asyncio.Event()
+    holder = asyncio.ensure_future(hold(admission, release))
+    await asyncio.sleep(0)
+    try:
+        async with admission.admit():
+            raise AssertionError("slot should be taken")
+    except HTTPException as e:
+        assert e.status_code == 503 and "queue_timeout" in e.detail
+    release.set()
+    await holder
+    await asyncio.sleep(0)
+    assert admission._semaphore._value == 1 and admission._waiting == 0
+
+async def acquire_racing_timeout_restores_permits():
+    # 排队超时的同时 acquire 拿到了名额（取消送达前已成功）：名额必须归还
+    admission = AdmissionController("test", max_concurrency=1, max_queue_time=0.05)
+    semaphore = admission._semaphore
+    real_acquire = semaphore.acquire
+
+    async def late_acquire():
+        await real_acquire()
+        try:
+            await asyncio.sleep(1)  # 超时在拿到名额之后、acquire 返回之前触发
+        except asyncio.CancelledError:
+            pass
+        return True
+
+    release = asyncio.Event()
+    holder = asyncio.ensure_future(hold(admission, release))
+    await asyncio.sleep(0)
+    semaphore.acquire = late_acquire
+    asyncio.get_running_loop().call_later(0.01, release.set)
+    try:
+        async with admission.admit():
+            raise AssertionError("should have timed out")
+    except HTTPException as e:
+        assert e.status_code == 503
+    await holder
+    await asyncio.sleep(0.01)
+    assert semaphore._value == 1, semaphore._value
+
+async def cancelled_waiter_restores_permits():
+    # 排队中的请求被取消（客户端断开）时恰好轮到它：名额转交后必须归还
+    admission = AdmissionController("test", max_concurrency=1, max_queue_time=5)
+    release = asyncio.Event()
+    holder = asyncio.ensure_future(hold(admission, release))
+    await asyncio.sleep(0)
+    waiter = asyncio.ensure_future(hold(admission, asyncio.Event()))
+    await asyncio.sleep(0.01)
+    release.set()
+    await holder  # 释放名额，唤醒 waiter 的 acquire
+    waiter.cancel()
+    try:
+        await waiter
+    except asyncio.CancelledError:
+        pass
+    await asyncio.sleep(0.01)
+    assert admission._semaphore._value == 1 and admission._waiting == 0
+
+def test_queue_timeout_restores_permits():
+    asyncio.run(queue_timeout_restores_permits())
+
+def test_acquire_racing_timeout_restores_permits():
+    asyncio.run(acquire_racing_timeout_restores_permits())
+
+def test_cancelled_waiter_restores_permits():
+    asyncio.run(cancelled_waiter_restores_permits())
+
+if __name__ == "__main__":
+    test_queue_timeout_restores_permits()
+    test_acquire_racing_timeout_restores_permits()
+    test_cancelled_waiter_restores_permits()
+    print("ok")
@@ -0,0 +1,33 @@
+# test_chunk_store.py
+# 本地 chunk 原文存储（chunk_store.ChunkStore）：追加写与 mmap 读取，不依赖任何外部服务
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from chunk_store import ChunkStore  # noqa: E402
+
+def test_empty_store_then_append():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "chunks.zst")
+        reader = ChunkStore(path)  # 新建的空文件，入库前检索服务即可打开
+        assert reader.read_many([]) == []
+        assert reader.read(0, 0) == ""
+        try:
+            reader.read(0, 10)
+            raise AssertionError("read beyond an empty store should fail")
+        except ValueError as e:
+            assert "超出" in str(e)
+
+        writer = ChunkStore(path)
+        locations = [writer.append(t) for t in ["第一段", "second chunk", "第三段" * 100]]
+        writer.flush()
+        # 同一个读取端在写入后重新映射
+        assert reader.read_many(locations) == ["第一段", "second chunk", "第三段" * 100]
+        writer.close()
+
+if __name__ == "__main__":
+    test_empty_store_then_append()
+    print("ok")
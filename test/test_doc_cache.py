@@ -0,0 +1,97 @@
+# test_doc_cache.py
+# Streamlit 界面的共享缓存（doc_cache.DocCache）：LRU 淘汰与按入库清单 md5 失效
+
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from doc_cache import DocCache  # noqa: E402
+
+DIM = 4
+
+def write_manifest(path: str, md5s: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        for p, m in md5s.items():
+            f.write(json.dumps({"path": p, "md5": m}) + "\n")
+    # 同一时间戳粒度内连续写入时也要让 mtime 变化
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+def test_embedding_lru_and_invalidation():
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest = os.path.join(tmp, "corpus.jsonl")
+        write_manifest(manifest, {"a": "1", "b": "1", "c": "1"})
+        cache = DocCache(dim=DIM, max_embeddings=2, manifest_path=manifest)
+        cache.put_embeddings({"a": np.ones(DIM), "b": np.full(DIM, 2.0)})
+        assert set(cache.get_embeddings(["a", "b"])) == {"a", "b"}
+        cache.get_embeddings(["a"])  # b 成为最久未使用
+        cache.put_embeddings({"c": np.full(DIM, 3.0)})
+        got = cache.get_embeddings(["a", "b", "c"])
+        assert set(got) == {"a", "c"} and np.allclose(got["c"], 0.5)  # 写入时归一化
+        write_manifest(manifest, {"a": "2", "c": "1"})  # a 重新入库
+        assert set(cache.get_embeddings(["a", "c"])) == {"c"}
+
+def test_top_k_scores_shared_rows():
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest = os.path.join(tmp, "corpus.jsonl")
+        write_manifest(manifest, {p: "1" for p in "abcde"})
+        cache = DocCache(dim=DIM, max_embeddings=4, manifest_path=manifest)
+        cache.put_embeddings({
+            "a": [1, 0, 0, 0], "b": [0, 5, 0, 0], "c": [3, 1, 0, 0], "d": [0, 0, 1, 0],
+        })
+        assert cache.missing(["a", "e", "a"]) == ["e"]
+        # 画像为 a、b 归一化后的均值，与向量长度无关
+        recs = cache.top_k(["a", "b"], ["a", "b", "c", "d", "e"], 2, exclude={"a", "b"})
+        assert [p for p, _ in recs] == ["c", "d"]
+        assert np.isclose(recs[0][1], (3 + 1) / np.sqrt(10) / np.sqrt(2))
+        assert cache.top_k(["e"], ["c", "d"], 2) == []
+        write_manifest(manifest, {"a": "1", "b": "1", "c": "2", "d": "1"})  # c 重新入库，旧向量不参与
+        assert [p for p, _ in cache.top_k(["a"], ["c", "d"], 2)] == ["d"]
+
+def test_top_k_matches_brute_force():
+    with tempfile.TemporaryDirectory() as tmp:
+        rng = np.random.default_rng(0)
+        vectors = {f"doc{i}": rng.standard_normal(DIM) for i in range(50)}
+        manifest = os.path.join(tmp, "corpus.jsonl")
+        write_manifest(manifest, {p: "1" for p in vectors})
+        cache = DocCache(dim=DIM, max_embeddings=64, manifest_path=manifest)
+        items = list(vectors.items())
+        for start in range(0, len(items), 7):  # 按页增量到达
+            cache.put_embeddings(dict(items[start:start + 7]))
+        liked = ["doc0", "doc3"]
+        unit = {p: v / np.linalg.norm(v) for p, v in vectors.items()}
+        q = (unit["doc0"] + unit["doc3"]) / 2
+        exclude = {"doc0", "doc3", "doc7"}
+        cos = {p: float(v @ q / np.linalg.norm(q)) for p, v in unit.items() if p not in exclude}
+        expected = sorted(cos, key=lambda p: -cos[p])[:5]
+        got = cache.top_k(liked, vectors, 5, exclude=exclude)
+        assert [p for p, _ in got] == expected
+        assert all(abs(s - cos[p]) < 1e-5 for p, s in got)
+
+def test_file_cache_shares_text_and_invalidates():
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest = os.path.join(tmp, "corpus.jsonl")
+        doc = os.path.join(tmp, "doc.txt")
+        with open(doc, "w", encoding="utf-8") as f:
+            f.write("第一版")
+        write_manifest(manifest, {doc: "1"})
+        cache = DocCache(dim=DIM, max_embeddings=1, max_file_bytes=64, manifest_path=manifest)
+        first = cache.read_file(doc)
+        assert cache.read_file(doc) is first  # 命中时返回同一份字符串
+        with open(doc, "w", encoding="utf-8") as f:
+            f.write("第二版")
+        assert cache.read_file(doc) is first  # md5 未变，仍使用缓存
+        write_manifest(manifest, {doc: "2"})
+        assert cache.read_file(doc) == "第二版"
+
+if __name__ == "__main__":
+    test_embedding_lru_and_invalidation()
+    test_top_k_scores_shared_rows()
+    test_top_k_matches_brute_force()
+    test_file_cache_shares_text_and_invalidates()
+    print("ok")
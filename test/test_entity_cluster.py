@@ -0,0 +1,69 @@
+# test_entity_cluster.py
+# 实体聚类（entity_cluster.cluster_entities）与原页面的稠密余弦距离矩阵 + DBSCAN 结果一致
+
+import json
+import os
+import sys
+import zlib
+
+import numpy as np
+from sklearn.cluster import DBSCAN
+from sklearn.metrics.pairwise import cosine_distances
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from entity_cluster import cluster_entities, merge_clusters  # noqa: E402
+
+def dense_labels(embeddings, eps, min_samples):
+    return DBSCAN(eps=eps, min_samples=min_samples, metric="precomputed").fit_predict(cosine_distances(embeddings))
+
+def bigram_embedding(text: str, dim: int = 256) -> np.ndarray:
+    # 无需 embedding 服务的确定性向量：字符 bigram 哈希
+    vec = np.zeros(dim)
+    for i in range(max(1, len(text) - 1)):
+        h = zlib.crc32(text[i:i + 2].encode("utf-8"))
+        vec[h % dim] += 1.0 if (h >> 16) & 1 else -1.0
+    return vec
+
+def test_matches_dense_on_entities_input():
+    with open(os.path.join(ROOT, "data_entity", "entities_input.json"), "r", encoding="utf-8") as f:
+        entities = json.load(f)
+    texts = [f"Name: {e['name']}; Type: {e['type']}; Attributes: "
+             + "; ".join(f"{k}:{v}" for k, v in e.get("attributes", {}).items()) for e in entities.values()]
+    embeddings = np.array([bigram_embedding(t) for t in texts])
+    for eps in (0.05, 0.1, 0.3, 0.5, 0.8):
+        for min_samples in (1, 2, 3):
+            expected = dense_labels(embeddings, eps, min_samples)
+            assert (cluster_entities(embeddings, eps, min_samples) == expected).all(), (eps, min_samples)
+
+def test_blocked_with_duplicates():
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((50, 32))
+    x = centers[rng.integers(0, 50, 600)] + 0.15 * rng.standard_normal((600, 32))
+    x = np.vstack([x, x[:10]])  # 完全相同的实体，距离为 0
+    for eps in (0.05, 0.1, 0.3):
+        expected = dense_labels(x, eps, 2)
+        assert (cluster_entities(x, eps, 2, block_bytes=32 * 1024) == expected).all(), eps
+
+def test_merge_clusters():
+    entities = {
+        1: {"name": "中国", "type": "country", "attributes": {"area": "960万平方公里"}},
+        2: {"name": "北京", "type": "city", "attributes": {"population": "21 million"}},
+        3: {"name": "China", "type": "country", "attributes": {"area": "9600000 sq km", "capital": "北京"}},
+        4: {"name": "上海", "type": "city"},
+    }
+    points = np.array([[0.0, 0.0], [5.0, 5.0], [2.0, 4.0], [1.0, 1.0]])
+    merged, centroids = merge_clusters([1, 2, 3, 4], entities, np.array([0, -1, 0, -1]), points)
+    # 簇在前，噪声点按输入顺序在后；属性按成员顺序覆盖
+    assert [m["cluster"] for m in merged.values()] == [[1, 3], [2], [4]]
+    assert merged[1]["name"] == "中国"
+    assert merged[1]["attributes"] == {"area": "9600000 sq km", "capital": "北京"}
+    assert merged[3]["attributes"] == {}
+    assert np.allclose(centroids, [[1.0, 2.0], [5.0, 5.0], [1.0, 1.0]])
+
+if __name__ == "__main__":
+    test_matches_dense_on_entities_input()
+    test_blocked_with_duplicates()
+    test_merge_clusters()
+    print("ok")
@@ -0,0 +1,67 @@
+# test_entity_resolve.py
+# 批量实体消歧（entity_resolve）：增量 JSON 解析、JSONL 输入与逐组写出（不依赖 embedding 服务）
+
+import io
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from entity_resolve import EMBEDDING_DIM, _iter_json_object, embed_texts, iter_entities, resolve, write_jsonl  # noqa: E402
+
+INPUT = os.path.join(ROOT, "data_entity", "entities_input.json")
+
+def test_incremental_parser_matches_json_load():
+    with open(INPUT, "r", encoding="utf-8") as f:
+        raw = f.read()
+    expected = json.loads(raw)
+    spaced = '{"1" : {"name": "a"} , "2" :{"name": "b"}}'  # 冒号、逗号前有空白
+    for chunk_chars in (1, 2, 3, 5, 64, 1 << 20):  # 块边界落在键、字符串、数字、冒号前后
+        assert dict(_iter_json_object(io.StringIO(raw), chunk_chars)) == expected
+        assert dict(_iter_json_object(io.StringIO(spaced), chunk_chars)) == json.loads(spaced)
+    for bad in ('{"1" {"name": "a"}}', '{"1" :: {"name": "a"}}', '{"1": 1 "2": 2}'):
+        try:
+            list(_iter_json_object(io.StringIO(bad), 2))
+        except json.JSONDecodeError:
+            continue
+        raise AssertionError(f"accepted invalid JSON: {bad}")
+    assert dict(_iter_json_object(io.StringIO(' { "a" : 12345 , "b": ["}", {"c": 1}] } '), 2)) == {
+        "a": 12345, "b": ["}", {"c": 1}]}
+    assert list(_iter_json_object(io.StringIO("{}"), 1)) == []
+
+def test_jsonl_input_and_output():
+    entities = dict(iter_entities(INPUT))
+    assert list(entities)[:3] == [1, 2, 3]
+    with tempfile.TemporaryDirectory() as tmp:
+        jsonl = os.path.join(tmp, "in.jsonl")
+        with open(jsonl, "w", encoding="utf-8") as f:
+            for eid, info in entities.items():
+                f.write(json.dumps({"id": eid, **info}, ensure_ascii=False) + "\n")
+        assert dict(iter_entities(jsonl)) == entities
+
+        # 1、2 两个实体向量相同，其余互相正交
+        ids = list(entities)[:4]
+        embeddings = np.eye(4, dtype=np.float32)
+        embeddings[1] = embeddings[0]
+        labels, merged = resolve(ids, entities, embeddings, eps=0.1, min_samples=2)
+        assert labels.tolist() == [0, 0, -1, -1]
+        out = os.path.join(tmp, "out.jsonl")
+        assert write_jsonl(out, merged) == 3
+        with open(out, "r", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f]
+        assert [(r["id"], r["cluster"]) for r in rows] == [(1, [1, 2]), (2, [3]), (3, [4])]
+        assert rows[0]["name"] == entities[1]["name"]
+
+def test_embed_no_texts():
+    assert embed_texts([]).shape == (0, EMBEDDING_DIM)
+
+if __name__ == "__main__":
+    test_incremental_parser_matches_json_load()
+    test_jsonl_input_and_output()
+    test_embed_no_texts()
+    print("ok")
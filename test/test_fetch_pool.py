@@ -0,0 +1,45 @@
+# test_fetch_pool.py
+# 界面附加数据的并发获取（fetch_pool.FetchBatch）：并发执行、按完成顺序产出、取消与超时
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from fetch_pool import FetchBatch, new_pool  # noqa: E402
+
+def test_concurrent_in_completion_order():
+    pool = new_pool(4)
+    batch = FetchBatch(pool)
+    for key, delay in [("slow", 0.3), ("fast", 0.05), ("error", 0.1)]:
+        batch.submit(key, lambda d, k: time.sleep(d) or (1 / 0 if k == "error" else k), delay, key)
+    t0 = time.perf_counter()
+    got = list(batch.as_completed())
+    assert time.perf_counter() - t0 < 0.5  # 并发：约等于最慢的一个
+    assert [k for k, _, _ in got] == ["fast", "error", "slow"]
+    assert got[0][1] == "fast" and isinstance(got[1][2], ZeroDivisionError)
+    pool.shutdown()
+
+def test_cancel_and_timeout():
+    pool = new_pool(1)
+    gate = threading.Event()
+    ran = []
+    old = FetchBatch(pool)
+    old.submit("blocking", gate.wait)
+    old.submit("queued", ran.append, "queued")
+    old.cancel()  # 新检索开始
+    gate.set()
+    assert list(old.as_completed()) == [] and ran == []
+
+    batch = FetchBatch(pool)
+    batch.submit("late", time.sleep, 0.5)
+    got = list(batch.as_completed(timeout=0.05))
+    assert got[0][0] == "late" and isinstance(got[0][2], TimeoutError)
+    pool.shutdown()
+
+if __name__ == "__main__":
+    test_concurrent_in_completion_order()
+    test_cancel_and_timeout()
+    print("ok")
@@ -19,8 +19,112 @@ def test_hybrid_search(query: str):
     assert response.status_code == 200
     print(response.json())
 
+def test_hybrid_search_group_by_doc(query: str):
+    limit = 3
+    response = requests.post(f"{BASE_URL}/hybrid_search/", json={"query": query, "limit": limit, "group_by_doc": True})
+    assert response.status_code == 200
+    paths = [r["path"] for r in response.json()["results"]]
+    assert len(paths) == len(set(paths)), "group_by_doc 结果中存在重复文档"
+    assert len(paths) <= limit
+    print(paths)
+
+def test_group_by_doc_honours_fields(query: str):
+    # 分组所需的 path 不应出现在只请求了 filename 的结果中
+    for endpoint in ("dense_search", "sparse_search", "hybrid_search"):
+        payload = {"query": query, "limit": 3, "group_by_doc": True, "fields": ["filename"]}
+        response = requests.post(f"{BASE_URL}/{endpoint}/", json=payload)
+        assert response.status_code == 200
+        assert all(set(r) == {"filename", "pk", "score"} for r in response.json()["results"]), endpoint
+
+def test_invalid_limit(query: str):
+    for limit in (0, -1, 16385):
+        response = requests.post(f"{BASE_URL}/dense_search/", json={"query": query, "limit": limit})
+        assert response.status_code == 422, (limit, response.status_code)
+
+def test_dense_search_with_filter(query: str):
+    payload = {"query": query, "limit": 5, "filter": {"filenames": ["guifan1.txt"], "path_prefix": "./data_corpus/"}}
+    response = requests.post(f"{BASE_URL}/dense_search/", json=payload)
+    assert response.status_code == 200
+    for r in response.json()["results"]:
+        assert r["filename"] == "guifan1.txt"
+    print(response.json())
+
+def test_rank_then_hydrate(query: str):
+    response = requests.post(f"{BASE_URL}/hybrid_search/", json={"query": query, "limit": 5, "fields": []})
+    assert response.status_code == 200
+    hits = response.json()["results"]
+    assert all(set(h) == {"pk", "score"} for h in hits)
+    pks = [h["pk"] for h in hits]
+    response = requests.post(f"{BASE_URL}/chunks/", json={"pks": pks, "fields": ["text", "path"]})
+    assert response.status_code == 200
+    chunks = response.json()["chunks"]
+    assert [c["pk"] for c in chunks] == pks
+    print(chunks)
+
+def test_doc_embeddings(query: str):
+    response = requests.post(f"{BASE_URL}/hybrid_search/", json={"query": query, "limit": 3, "group_by_doc": True})
+    paths = [r["path"] for r in response.json()["results"]]
+    response = requests.post(f"{BASE_URL}/doc_embeddings/", json={"paths": paths + ["./data_corpus/missing.txt"]})
+    assert response.status_code == 200
+    data = response.json()
+    assert set(data["embeddings"]) == set(paths)
+    assert data["missing"] == ["./data_corpus/missing.txt"]
+    assert all(len(v) == 1024 for v in data["embeddings"].values())
+    print({p: v[:4] for p, v in data["embeddings"].items()})
+
+def test_recommend(query: str):
+    response = requests.post(f"{BASE_URL}/hybrid_search/", json={"query": query, "limit": 3, "group_by_doc": True})
+    paths = [r["path"] for r in response.json()["results"]]
+    liked, disliked = paths[:1], paths[1:2]
+    response = requests.post(f"{BASE_URL}/recommend/", json={"liked": liked, "disliked": disliked, "limit": 5})
+    assert response.status_code == 200
+    recs = [r["path"] for r in response.json()["results"]]
+    assert not set(recs) & set(liked + disliked), "推荐结果中包含已标记的文档"
+    assert len(recs) == len(set(recs))
+    print(recs)
+
+def test_context(query: str):
+    response = requests.post(f"{BASE_URL}/dense_search/", json={"query": query, "limit": 1})
+    hit = response.json()["results"][0]
+    payload = {"path": hit["path"], "byte_start": hit["byte_start"], "byte_end": hit["byte_end"], "before": 200, "after": 200}
+    response = requests.post(f"{BASE_URL}/context/", json=payload)
+    assert response.status_code == 200
+    ctx = response.json()
+    assert ctx["text"][ctx["hit_start"]:ctx["hit_end"]] == hit["text"]
+    assert ctx["byte_end"] - ctx["byte_start"] <= hit["byte_end"] - hit["byte_start"] + 400
+    response = requests.post(f"{BASE_URL}/context/", json={**payload, "path": "./data_corpus/../start.sh"})
+    assert response.status_code == 404
+    print(ctx["text"])
+
+def test_snippets(query: str):
+    fields = ["path", "byte_start", "byte_end"]
+    response = requests.post(f"{BASE_URL}/hybrid_search/", json={"query": query, "limit": 3, "fields": fields, "snippets": True})
+    assert response.status_code == 200
+    for r in response.json()["results"]:
+        assert "text" not in r
+        snippet = r["snippet"]
+        assert len(snippet["text"]) <= 120
+        assert all(0 <= s < e <= len(snippet["text"]) for s, e in snippet["highlights"])
+        print([snippet["text"][s:e] for s, e in snippet["highlights"]], snippet["text"])
+
+def test_readiness():
+    assert requests.get(f"{BASE_URL}/healthz").status_code == 200
+    response = requests.get(f"{BASE_URL}/readyz")
+    assert response.status_code == 200, response.text
+    print(response.json())
+
 if __name__ == "__main__":
     query = "混沌未分天地乱，茫茫渺渺无人见。"
+    test_readiness()
     test_dense_search(query)
     test_sparse_search(query)
     test_hybrid_search(query)
+    test_hybrid_search_group_by_doc(query)
+    test_group_by_doc_honours_fields(query)
+    test_invalid_limit(query)
+    test_dense_search_with_filter(query)
+    test_rank_then_hydrate(query)
+    test_doc_embeddings(query)
+    test_recommend(query)
+    test_context(query)
+    test_snippets(query)
@@ -0,0 +1,44 @@
+# test_snippets.py
+# 检索结果摘要（snippets.make_snippet）：按查询 token 权重选窗口并返回高亮区间
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from snippets import make_snippet  # noqa: E402
+
+def char_token_map(text: str) -> dict:
+    # 每个字符一个 token，id 为其码位
+    spans = []
+    for i in range(len(text)):
+        spans += [i, i + 1]
+    return {"ids": [ord(c) for c in text], "spans": spans}
+
+def test_best_window_and_highlights():
+    text = "甲" * 200 + "道路工程" + "乙" * 200
+    weights = {ord(c): 1.0 for c in "道路"}
+    snippet = make_snippet(text, char_token_map(text), weights, width=40)
+    assert len(snippet["text"]) == 40
+    assert snippet["text"] == text[snippet["start"]:snippet["start"] + 40]
+    assert snippet["highlights"] == [[200 - snippet["start"], 202 - snippet["start"]]]  # 相邻 token 合并
+    assert [snippet["text"][s:e] for s, e in snippet["highlights"]] == ["道路"]
+
+def test_scores_the_displayed_window():
+    # 以“道”开头的窗口包含全部命中，但展示时向左留出 lead，会截掉后面的“路”；应选展示后命中最多的窗口
+    text = "甲" * 100 + "道" + "乙" * 34 + "路" * 5 + "丙" * 100
+    snippet = make_snippet(text, char_token_map(text), {ord("道"): 1.0, ord("路"): 1.0}, width=40)
+    assert [snippet["text"][s:e] for s, e in snippet["highlights"]] == ["路路路路路"]
+
+def test_fallbacks():
+    text = "无命中的文本" * 10
+    assert make_snippet(text, None, {1: 1.0}, width=10) == {"text": text[:10], "start": 0, "highlights": []}
+    assert make_snippet(text, char_token_map(text), {1: 1.0}, width=10)["highlights"] == []
+    short = make_snippet("道路", char_token_map("道路"), {ord("路"): 0.5}, width=10)
+    assert short == {"text": "道路", "start": 0, "highlights": [[1, 2]]}
+
+if __name__ == "__main__":
+    test_best_window_and_highlights()
+    test_scores_the_displayed_window()
+    test_fallbacks()
+    print("ok")
@@ -0,0 +1,126 @@
+# test_vector_store.py
+# 进程内向量存储（vector_store.MemoryStore），不依赖任何外部服务
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from vector_store import MemoryStore, ScalarFilter  # noqa: E402
+
+DIM = 8
+
+def make_rows(n: int = 40, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(n):
+        vec = rng.standard_normal(DIM).astype(np.float32)
+        rows.append({
+            "text": f"chunk {i}",
+            "dense_vector": (vec / np.linalg.norm(vec)).tolist(),
+            "sparse_vector": {str(t): float(w) for t, w in zip(rng.choice(50, 4, replace=False), rng.random(4))},
+            "filename": f"doc{i % 5}.txt",
+            "path": f"./data_corpus/doc{i % 5}.txt",
+            "date": 1700000000 + i,
+            "doc_family": "doc",
+        })
+    return rows
+
+def test_dense_search_matches_brute_force():
+    rows = make_rows()
+    store = MemoryStore(dim=DIM, block_size=7)
+    store.insert(rows)
+    q = rows[3]["dense_vector"]
+    hits = store.dense_search(q, 5, output_fields=["text"])
+    expected = np.argsort(-(np.array([r["dense_vector"] for r in rows]) @ np.array(q)))[:5]
+    assert [h["text"] for h in hits] == [rows[i]["text"] for i in expected]
+    assert hits[0]["text"] == "chunk 3"
+
+def test_sparse_search_inner_product():
+    rows = make_rows()
+    store = MemoryStore(dim=DIM)
+    store.insert(rows)
+    q = rows[7]["sparse_vector"]
+    hits = store.sparse_search(q, 3, output_fields=["text"])
+    scores = [sum(w * r["sparse_vector"].get(t, 0.0) for t, w in q.items()) for r in rows]
+    assert abs(hits[0]["score"] - max(scores)) < 1e-5
+    assert all(h["score"] > 0 for h in hits)
+
+def test_filter_and_group_by():
+    rows = make_rows()
+    store = MemoryStore(dim=DIM)
+    store.insert(rows)
+    q = rows[0]["dense_vector"]
+    hits = store.dense_search(q, 10, scalar_filter=ScalarFilter(filenames=["doc2.txt"]), output_fields=["filename"])
+    assert hits and all(h["filename"] == "doc2.txt" for h in hits)
+    hits = store.dense_search(q, 3, group_by="path", output_fields=["path"])
+    paths = [h["path"] for h in hits]
+    assert len(paths) == 3 and len(set(paths)) == 3
+    hits = store.dense_search(q, 50, scalar_filter=ScalarFilter(date_min=1700000010, date_max=1700000012),
+                              output_fields=["date"])
+    assert sorted(h["date"] for h in hits) == [1700000010, 1700000011, 1700000012]
+    excluded = ["./data_corpus/doc0.txt", "./data_corpus/doc3.txt"]
+    hits = store.dense_search(q, 50, scalar_filter=ScalarFilter(exclude_paths=excluded), output_fields=["path"])
+    assert len(hits) == 24 and not {h["path"] for h in hits} & set(excluded)
+    assert ScalarFilter(exclude_paths=excluded).to_expr() == f'path not in ["{excluded[0]}", "{excluded[1]}"]'
+
+def test_upsert_delete_and_persistence():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = MemoryStore(os.path.join(tmp, "hybrid_demo"), dim=DIM)
+        pks = store.insert(make_rows(10))
+        assert store.delete(pks[:2]) == 2
+        store.upsert([{**make_rows(1, seed=1)[0], "pk": pks[2], "text": "updated"}])
+        store.flush()
+
+        reopened = MemoryStore(os.path.join(tmp, "hybrid_demo"), dim=DIM)
+        assert reopened.query(pks[:3], ["text"]) == [{"text": "updated", "pk": pks[2]}]
+        assert len(reopened.dense_search(make_rows(1)[0]["dense_vector"], 100)) == 8
+        assert isinstance(reopened._snap.dense, np.memmap)
+
+def test_incremental_flush_and_concurrent_reload():
+    rows = make_rows(30)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "hybrid_demo")
+        store = MemoryStore(path, dim=DIM)
+        pks = []
+        for i in range(0, 30, 4):  # 多次插入，缓冲区扩容后旧快照不受影响
+            before = store._snap
+            pks += store.insert(rows[i:i + 4])
+            assert len(before.dense) == i
+            if i == 12:
+                store.flush()  # 无删除：只在 dense.f32 末尾追加
+        store.flush()
+        assert os.path.getsize(os.path.join(path, MemoryStore.DENSE_FILE)) == 30 * DIM * 4
+
+        reader = MemoryStore(path, dim=DIM)
+        np.testing.assert_allclose(reader._snap.dense, np.array([r["dense_vector"] for r in rows], dtype=np.float32))
+
+        # 读取过程中 meta.json 被替换时重读，得到的各文件属于同一版本
+        real_read, calls = reader._read_files, []
+
+        def racing_read():
+            result = real_read()
+            if not calls:
+                store.delete(pks[:5])
+                store.flush()
+                meta = os.path.join(path, MemoryStore.META_FILE)
+                os.utime(meta, ns=(os.stat(meta).st_atime_ns, os.stat(meta).st_mtime_ns + 1_000_000))
+            calls.append(1)
+            return result
+
+        reader._read_files = racing_read
+        reader._load()
+        assert len(calls) == 2
+        assert len(reader._snap.rows) == len(reader._snap.dense) == 25
+        assert reader.query(pks[5:6], ["text"]) == [{"text": "chunk 5", "pk": pks[5]}]
+
+if __name__ == "__main__":
+    test_dense_search_matches_brute_force()
+    test_sparse_search_inner_product()
+    test_filter_and_group_by()
+    test_upsert_delete_and_persistence()
+    test_incremental_flush_and_concurrent_reload()
+    print("ok")